@@ -0,0 +1,10 @@
+"""
+Benchmarks of datadez hot paths.
+
+Run them and save a baseline:
+    python -m benchmarks run --sizes 10k,1m --output baseline.json
+
+Compare a new run against it:
+    python -m benchmarks run --sizes 10k,1m --output current.json
+    python -m benchmarks compare baseline.json current.json --threshold 0.2
+"""
@@ -0,0 +1,53 @@
+from __future__ import unicode_literals, print_function
+
+import argparse
+import sys
+
+from benchmarks.cases import CASES
+from benchmarks.run import DEFAULT_THRESHOLD
+from benchmarks.run import compare
+from benchmarks.run import load
+from benchmarks.run import run
+from benchmarks.run import save
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Benchmarks of datadez hot paths")
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help="run benchmarks and save their results")
+    run_parser.add_argument('--sizes', default='10k', help="comma separated row counts (10k, 1m, 10m or integers)")
+    run_parser.add_argument('--cases', default=None, help="comma separated cases among %s" % ', '.join(sorted(CASES)))
+    run_parser.add_argument('--repeat', type=int, default=3, help="timed runs per case, the best one is kept")
+    run_parser.add_argument('--no-memory', action='store_true', help="don't measure peak memory")
+    run_parser.add_argument('--output', default='benchmarks.json', help="JSON results file")
+
+    compare_parser = subparsers.add_parser('compare', help="flag regressions of a run against a baseline")
+    compare_parser.add_argument('baseline', help="JSON results file of the baseline")
+    compare_parser.add_argument('current', help="JSON results file to check")
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help="tolerated relative increase (default %s)" % DEFAULT_THRESHOLD)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        results = run(sizes=args.sizes.split(','),
+                      cases=args.cases.split(',') if args.cases else None,
+                      repeat=args.repeat,
+                      memory=not args.no_memory)
+        save(results, args.output)
+        return 0
+    elif args.command == 'compare':
+        regressions = compare(load(args.baseline), load(args.current), threshold=args.threshold)
+        for key, metric, baseline_value, current_value in regressions:
+            print("REGRESSION %s %s: %s -> %s" % (key, metric, baseline_value, current_value))
+        if not regressions:
+            print("No regression over %d%%" % (100 * args.threshold))
+        return 1 if regressions else 0
+
+    parser.print_help()
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
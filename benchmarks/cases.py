@@ -0,0 +1,54 @@
+from __future__ import unicode_literals, print_function
+
+from datadez.dataviz.chord_diagram import chord_diagram
+from datadez.filter import filter_empty
+from datadez.filter import filter_small_occurrence
+from datadez.multilabel import multilabel_intersection_matrix
+from datadez.summarize import summarize
+from datadez.transform import vectorize_dataset
+
+from benchmarks.data import SCHEMA
+
+# Labels kept in the chord diagram: it is meant to be read, not to show every label
+CHORD_DIAGRAM_LABELS = 30
+
+
+def bench_summarize(dataset):
+    summarize(dataset, schema=SCHEMA)
+
+
+def bench_filter_small_occurrence(dataset):
+    filter_small_occurrence(dataset, ['mono-label', 'multi-label'], 10, schema=SCHEMA)
+
+
+def bench_filter_empty(dataset):
+    filter_empty(dataset, ['mono-label', 'multi-label'], schema=SCHEMA)
+
+
+def bench_vectorize_dataset(dataset):
+    vectorize_dataset(dataset, sparse=True, schema=SCHEMA)
+
+
+def bench_multilabel_intersection_matrix(dataset):
+    multilabel_intersection_matrix(dataset, 'multi-label', sparse=True)
+
+
+def prepare_chord_diagram(dataset):
+    labels, matrix = multilabel_intersection_matrix(dataset, 'multi-label')
+    return labels[:CHORD_DIAGRAM_LABELS], matrix[:CHORD_DIAGRAM_LABELS, :CHORD_DIAGRAM_LABELS]
+
+
+def bench_chord_diagram(prepared):
+    labels, matrix = prepared
+    chord_diagram(matrix, labels)
+
+
+# name -> (function, preparation of its input from the dataset, or None to pass the dataset)
+CASES = {
+    'summarize': (bench_summarize, None),
+    'filter_small_occurrence': (bench_filter_small_occurrence, None),
+    'filter_empty': (bench_filter_empty, None),
+    'vectorize_dataset': (bench_vectorize_dataset, None),
+    'multilabel_intersection_matrix': (bench_multilabel_intersection_matrix, None),
+    'chord_diagram': (bench_chord_diagram, prepare_chord_diagram),
+}
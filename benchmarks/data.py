@@ -0,0 +1,37 @@
+from __future__ import unicode_literals, print_function
+
+from collections import OrderedDict
+
+from datadez import synthetic
+from datadez.columns import MONO_LABEL_TYPE
+from datadez.columns import MULTI_LABEL_TYPE
+from datadez.columns import NUMERIC_TYPE
+from datadez.columns import TEXT_TYPE
+
+SCHEMA = {
+    'numeric': NUMERIC_TYPE,
+    'mono-label': MONO_LABEL_TYPE,
+    'multi-label': MULTI_LABEL_TYPE,
+    'text': TEXT_TYPE,
+}
+
+
+def make_dataset(rows, label_count=100, list_length=2, seed=0):
+    """
+    Dataset with a numeric, a mono-label, a multi-label and a text column,
+    labels following a Zipf distribution.
+
+    :param rows: row count
+    :param label_count: label count of the mono-label and multi-label columns
+    :param list_length: mean label count of the multi-label rows
+    :param seed: random seed
+    :return: pd.DataFrame
+    """
+    columns = OrderedDict([
+        ('numeric', {'type': NUMERIC_TYPE}),
+        ('mono-label', {'type': MONO_LABEL_TYPE, 'label_count': label_count}),
+        ('multi-label', {'type': MULTI_LABEL_TYPE, 'label_count': label_count, 'list_length': list_length}),
+        ('text', {'type': TEXT_TYPE, 'vocabulary_size': 1000, 'words_per_row': 4}),
+    ])
+
+    return synthetic.make_dataset(rows, columns, seed=seed)
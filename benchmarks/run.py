@@ -0,0 +1,192 @@
+from __future__ import unicode_literals, print_function
+
+import gc
+import json
+import multiprocessing
+import platform
+import timeit
+import traceback
+
+import numpy as np
+import pandas as pd
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+from benchmarks.cases import CASES
+from benchmarks.data import make_dataset
+
+SIZES = {
+    '10k': 10000,
+    '1m': 1000000,
+    '10m': 10000000,
+}
+
+# (label count, mean list length) of the mono-label and multi-label columns
+PROFILES = [
+    (100, 2),
+    (10000, 8),
+]
+
+DEFAULT_THRESHOLD = 0.2
+
+# Timings under this many seconds are too noisy to be compared
+MIN_SECONDS = 0.01
+
+
+def _parse_size(size):
+    if size in SIZES:
+        return SIZES[size]
+    return int(size)
+
+
+def measure_time(function, argument, repeat=3):
+    """
+    :return: best wall time of some runs, in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = timeit.default_timer()
+        function(argument)
+        timings.append(timeit.default_timer() - start)
+
+    return min(timings)
+
+
+def measure_peak_memory(function, argument):
+    """
+    :return: peak bytes allocated during a run (None if tracemalloc is unavailable)
+    """
+    if tracemalloc is None:
+        return None
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(argument)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': multiprocessing.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+def case_key(case_name, size, label_count, list_length):
+    return '%s/%s/labels=%s,length=%s' % (case_name, size, label_count, list_length)
+
+
+def run(sizes=('10k',), cases=None, profiles=PROFILES, repeat=3, memory=True, verbose=True):
+    """
+    Run benchmark cases on synthetic datasets.
+
+    Cases are measured twice: wall time without tracing, then peak memory
+    with tracemalloc (which slows pure Python code down).
+
+    :param sizes: row counts, or names of SIZES
+    :param cases: names of the cases to run, all of them by default
+    :param profiles: list of (label count, mean list length)
+    :param repeat: number of timed runs, the best one is kept
+    :param memory: If False, don't measure peak memory
+    :param verbose: print every result
+    :return: dict of results, see compare
+    """
+    case_names = sorted(CASES) if cases is None else cases
+    results = {}
+
+    for size in sizes:
+        for label_count, list_length in profiles:
+            dataset = make_dataset(_parse_size(size), label_count=label_count, list_length=list_length)
+
+            for case_name in case_names:
+                function, prepare = CASES[case_name]
+                key = case_key(case_name, size, label_count, list_length)
+                result = {'rows': len(dataset)}
+
+                try:
+                    argument = prepare(dataset) if prepare is not None else dataset
+                    result['seconds'] = measure_time(function, argument, repeat=repeat)
+                    if memory:
+                        result['peak_bytes'] = measure_peak_memory(function, argument)
+                except Exception as e:
+                    result['error'] = '%s: %s' % (type(e).__name__, e)
+                    if verbose:
+                        traceback.print_exc()
+
+                results[key] = result
+                if verbose:
+                    print(format_result(key, result))
+
+    return {'environment': environment(), 'results': results}
+
+
+def format_result(key, result):
+    if 'error' in result:
+        return '%-70s ERROR %s' % (key, result['error'])
+
+    peak_bytes = result.get('peak_bytes')
+    memory = '%10.1f MB' % (peak_bytes / 1e6) if peak_bytes is not None else '%13s' % '-'
+
+    return '%-70s %10.4f s %s' % (key, result['seconds'], memory)
+
+
+def _ratio(current, baseline):
+    if current is None or baseline is None:
+        return None
+    return float(current) / baseline if baseline else float('inf') if current else 1.
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD, min_seconds=MIN_SECONDS):
+    """
+    Flag cases of current slower or bigger than baseline by more than threshold.
+
+    :param baseline: results of run (or loaded from its JSON file)
+    :param current: results of run
+    :param threshold: tolerated relative increase, 0.2 for 20%
+    :param min_seconds: timings of baseline under this are not compared
+    :return: list of (case key, metric, baseline value, current value)
+    """
+    regressions = []
+
+    for key, baseline_result in sorted(baseline['results'].items()):
+        current_result = current['results'].get(key)
+        if current_result is None or 'error' in baseline_result:
+            continue
+        elif 'error' in current_result:
+            regressions.append((key, 'error', None, current_result['error']))
+            continue
+
+        for metric in ('seconds', 'peak_bytes'):
+            baseline_value = baseline_result.get(metric)
+            current_value = current_result.get(metric)
+            if metric == 'seconds' and baseline_value is not None and baseline_value < min_seconds:
+                continue
+
+            ratio = _ratio(current_value, baseline_value)
+            if ratio is not None and ratio > 1 + threshold:
+                regressions.append((key, metric, baseline_value, current_value))
+
+    return regressions
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,300 @@
+from __future__ import unicode_literals, print_function
+
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from datadez.columnar import MultiLabelColumn
+from datadez.columns import MONO_LABEL_TYPE
+from datadez.columns import MULTI_LABEL_TYPE
+from datadez.columns import NUMERIC_TYPE
+
+
+class Moments(object):
+    """
+    Mergeable count / sum / sum of squared deviations of a stream of values.
+    Values can also be retracted.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.
+        self.squares = 0.
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(max(self.squares / self.count, 0.)) if self.count else np.nan
+
+    @classmethod
+    def of(cls, values):
+        values = np.asarray(values, dtype=float)
+
+        moments = cls()
+        moments.count = len(values)
+        moments.total = values.sum()
+        moments.squares = ((values - values.mean()) ** 2).sum() if len(values) else 0.
+
+        return moments
+
+    def update(self, values):
+        return self.merge(Moments.of(values))
+
+    def retract(self, values):
+        return self.subtract(Moments.of(values))
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+
+        # Pairwise update of the sum of squared deviations (Chan et al.)
+        count = self.count + other.count
+        delta = other.mean - self.mean if self.count else 0.
+        self.squares += other.squares + delta ** 2 * self.count * other.count / count
+        self.total += other.total
+        self.count = count
+
+        return self
+
+    def subtract(self, other):
+        if other.count == 0:
+            return self
+        elif other.count > self.count:
+            raise ValueError("Can't retract more values than were added")
+        elif other.count == self.count:
+            self.__init__()
+            return self
+
+        # Inverse of merge: remaining values merged with other give self
+        count = self.count - other.count
+        delta = other.mean - (self.total - other.total) / count
+        self.squares -= other.squares + delta ** 2 * count * other.count / self.count
+        self.total -= other.total
+        self.count = count
+
+        return self
+
+
+class LabelCounter(object):
+    """
+    Mergeable label -> occurrence counter. Null labels are all counted under np.nan.
+
+    Stats over occurrences (label count, sum, sum of squares, min, max) are
+    maintained on every change: reading them is cheap, and an update costs
+    time proportional to the number of labels it touches.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.squares = 0
+
+        # occurrence -> number of labels having it, and lazy heaps of its keys
+        self._histogram = {}
+        self._max_heap = []
+        self._min_heap = []
+
+    def _move(self, old_count, new_count):
+        if old_count:
+            self._histogram[old_count] -= 1
+            if not self._histogram[old_count]:
+                del self._histogram[old_count]
+
+        if new_count:
+            if new_count not in self._histogram:
+                self._histogram[new_count] = 0
+                heapq.heappush(self._max_heap, -new_count)
+                heapq.heappush(self._min_heap, new_count)
+            self._histogram[new_count] += 1
+
+        if len(self._max_heap) > 2 * len(self._histogram) + 16:
+            # Too many stale keys: rebuild both heaps from the live occurrences (amortized O(1))
+            self._max_heap = [-count for count in self._histogram]
+            self._min_heap = list(self._histogram)
+            heapq.heapify(self._max_heap)
+            heapq.heapify(self._min_heap)
+
+    def add(self, labels, counts):
+        """
+        :param labels: labels
+        :param counts: occurrences to add to every label, negative to retract some
+        """
+        for label, count in zip(labels, counts):
+            old_count = self.counts.get(label, 0)
+            new_count = old_count + count
+
+            if new_count < 0:
+                raise ValueError("Can't retract label %s more than it has been counted" % label)
+            elif new_count:
+                self.counts[label] = new_count
+            else:
+                self.counts.pop(label, None)
+
+            self._move(old_count, new_count)
+            self.total += count
+            self.squares += new_count * new_count - old_count * old_count
+
+        return self
+
+    def update(self, column, sign=1):
+        occurrences = column.value_counts(dropna=True)
+        occurrences = occurrences[occurrences > 0]
+        self.add(occurrences.index.tolist(), (sign * occurrences.values).tolist())
+
+        null_count = int(column.isnull().sum())
+        if null_count:
+            self.add([np.nan], [sign * null_count])
+
+        return self
+
+    def retract(self, column):
+        return self.update(column, sign=-1)
+
+    def merge(self, other):
+        return self.add(other.counts.keys(), other.counts.values())
+
+    @property
+    def max(self):
+        while self._max_heap and -self._max_heap[0] not in self._histogram:
+            heapq.heappop(self._max_heap)
+        return -self._max_heap[0] if self._max_heap else None
+
+    @property
+    def min(self):
+        while self._min_heap and self._min_heap[0] not in self._histogram:
+            heapq.heappop(self._min_heap)
+        return self._min_heap[0] if self._min_heap else None
+
+    def summary(self):
+        """
+        Same stats as occurrence_summary.
+        """
+        labels = len(self.counts)
+        if not labels:
+            return {
+                'labels': 0,
+                'occurrence_max': None,
+                'occurrence_min': None,
+                'occurrence_mean': np.nan,
+                'occurrence_std_dev': np.nan,
+                'imbalance_ratio': np.nan,
+            }
+
+        mean_count = float(self.total) / labels
+        variance = float(self.squares) / labels - mean_count ** 2
+
+        return {
+            'labels': labels,
+            'occurrence_max': self.max,
+            'occurrence_min': self.min,
+            'occurrence_mean': mean_count,
+            'occurrence_std_dev': np.sqrt(max(variance, 0.)),
+            'imbalance_ratio': float(self.max) / self.min,
+        }
+
+
+class NumericAccumulator(object):
+    """
+    Incremental and streaming counterpart of numeric_summary.
+    """
+
+    def __init__(self):
+        self.moments = Moments()
+
+    def update(self, column):
+        self.moments.update(column.dropna())
+        return self
+
+    def retract(self, column):
+        self.moments.retract(column.dropna())
+        return self
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        return self
+
+    def summary(self):
+        return {
+            'column_type': NUMERIC_TYPE,
+            'mean': self.moments.mean,
+            'std': self.moments.std,
+        }
+
+
+class MonoLabelAccumulator(object):
+    """
+    Incremental and streaming counterpart of mono_label_summary.
+    """
+
+    def __init__(self):
+        self.labels = LabelCounter()
+
+    def update(self, column):
+        self.labels.update(column)
+        return self
+
+    def retract(self, column):
+        self.labels.retract(column)
+        return self
+
+    def merge(self, other):
+        self.labels.merge(other.labels)
+        return self
+
+    def summary(self):
+        summary = {'column_type': MONO_LABEL_TYPE}
+        summary.update(self.labels.summary())
+
+        return summary
+
+
+class MultiLabelAccumulator(object):
+    """
+    Incremental and streaming counterpart of multi_label_summary.
+    """
+
+    def __init__(self, ordered=False):
+        """
+        :param ordered: If True, ['A', 'B'] and ['B', 'A'] are different partitions
+        """
+        self.ordered = ordered
+        self.labels = LabelCounter()
+        self.cardinalities = Moments()
+        self.partitions = LabelCounter()
+
+    def update(self, column, sign=1):
+        if not isinstance(column, MultiLabelColumn):
+            column = MultiLabelColumn.from_series(column)
+
+        self.labels.add(column.labels.tolist(), (sign * column.occurrences()).tolist())
+        self.partitions.update(pd.Series(column.partition_keys(self.ordered)), sign=sign)
+        if sign > 0:
+            self.cardinalities.update(column.cardinalities())
+        else:
+            self.cardinalities.retract(column.cardinalities())
+
+        return self
+
+    def retract(self, column):
+        return self.update(column, sign=-1)
+
+    def merge(self, other):
+        self.labels.merge(other.labels)
+        self.cardinalities.merge(other.cardinalities)
+        self.partitions.merge(other.partitions)
+        return self
+
+    def summary(self):
+        summary = {'column_type': MULTI_LABEL_TYPE}
+        summary.update(self.labels.summary())
+        summary.update({
+            'cardinality_mean': self.cardinalities.mean,
+            'cardinality_std_dev': self.cardinalities.std,
+            'partitions': self.partitions.summary()
+        })
+
+        return summary
@@ -0,0 +1,254 @@
+from __future__ import unicode_literals, print_function
+
+import heapq
+
+import numpy as np
+
+from datadez.columnar import MultiLabelColumn
+from datadez.columnar import offset_positions
+from datadez.columns import MONO_LABEL_TYPE, MULTI_LABEL_TYPE
+from datadez.columns import get_column_type
+from datadez.profiling import stage
+
+
+def _random_state(random_state):
+    if isinstance(random_state, np.random.RandomState):
+        return random_state
+
+    return np.random.RandomState(random_state)
+
+
+def _label_column(dataset, column_name, schema):
+    column_type = get_column_type(dataset, column_name, schema)
+    column = dataset[column_name]
+
+    if column_type == MONO_LABEL_TYPE:
+        return MultiLabelColumn.from_mono_label(column)
+    elif column_type == MULTI_LABEL_TYPE:
+        return column if isinstance(column, MultiLabelColumn) else MultiLabelColumn.from_series(column)
+
+    raise NotImplementedError("Can't balance column '%s' of type %s" % (column_name, column_type))
+
+
+def _entry_rows(column):
+    return np.repeat(np.arange(len(column)), column.cardinalities())
+
+
+def _label_rows(column, entry_rows):
+    """
+    :return: rows of every label, label after label, and offsets of every label in them
+    """
+    order = np.argsort(column.codes, kind='mergesort')
+    label_offsets = np.concatenate([[0], np.cumsum(column.occurrences())])
+
+    return entry_rows[order], label_offsets
+
+
+def _check_ratio(max_imbalance_ratio):
+    if max_imbalance_ratio < 1:
+        raise ValueError("max_imbalance_ratio should be at least 1, got %s" % max_imbalance_ratio)
+
+
+def undersample(dataset, column_name, max_imbalance_ratio=1., schema=None, random_state=None):
+    """
+    Randomly remove rows of frequent labels, until every label occurs at most
+    max_imbalance_ratio times as much as the rarest one.
+
+    A multi-label row is only removed if all its labels are too frequent, so
+    labels co-occurring with rare ones may stay above the target. Rows without
+    label are kept.
+
+    Rows to remove are picked in rounds, on label codes: in every round, each
+    too frequent label accepts the rows of lowest random priority among the
+    removable rows holding it, up to its excess, and rows accepted by all their
+    labels are removed.
+
+    :param dataset: dataset to balance
+    :param column_name: mono-label or multi-label column to balance
+    :param max_imbalance_ratio: wanted max ratio between the most and the least frequent label occurrences
+    :param schema: column types (see infer_schema), detected if not given
+    :param random_state: seed or np.random.RandomState
+    :return: balanced dataset, rows in their original order
+    """
+    _check_ratio(max_imbalance_ratio)
+    random_state = _random_state(random_state)
+
+    column = _label_column(dataset, column_name, schema)
+    row_count = len(column)
+    entry_rows = _entry_rows(column)
+    cardinalities = column.cardinalities()
+
+    occurrences = column.occurrences()
+    if not occurrences.any():
+        return dataset.iloc[np.arange(row_count)]
+
+    cap = int(np.floor(max_imbalance_ratio * occurrences[occurrences > 0].min()))
+
+    priorities = random_state.permutation(row_count)
+    row_alive = np.ones(row_count, dtype=bool)
+    rounds = 0
+
+    with stage('undersample', column_name, rows=row_count, labels=len(column.labels)) as current_stage:
+        while True:
+            excess = occurrences - cap
+
+            # Alive rows whose labels are all too frequent
+            kept_entries = excess[column.codes] <= 0
+            removable = row_alive & (cardinalities > 0) & (np.bincount(entry_rows, weights=kept_entries,
+                                                                        minlength=row_count) == 0)
+            candidates = np.flatnonzero(removable)
+            if not len(candidates):
+                break
+            rounds += 1
+
+            # Rank of every candidate among the candidates holding each of its labels, by priority
+            entries = offset_positions(column.offsets, candidates)
+            codes = column.codes[entries]
+            candidate_ids = np.repeat(np.arange(len(candidates)), cardinalities[candidates])
+            order = np.lexsort((priorities[candidates][candidate_ids], codes))
+            group_starts = np.searchsorted(codes[order], codes[order], side='left')
+            ranks = np.empty(len(order), dtype=np.int64)
+            ranks[order] = np.arange(len(order)) - group_starts
+
+            refused = ranks >= excess[codes]
+            accepted = np.bincount(candidate_ids, weights=refused, minlength=len(candidates)) == 0
+
+            # The candidate of lowest priority is accepted by all its labels: every round removes rows
+            # (unless it holds a label twice)
+            removed = candidates[accepted]
+            if not len(removed):
+                break
+            row_alive[removed] = False
+            occurrences = occurrences - np.bincount(column.codes[offset_positions(column.offsets, removed)],
+                                                    minlength=len(occurrences))
+
+        current_stage.set(rounds=rounds, removed=int(row_count - row_alive.sum()))
+
+    return dataset.iloc[np.flatnonzero(row_alive)]
+
+
+def oversample(dataset, column_name, max_imbalance_ratio=1., schema=None, random_state=None):
+    """
+    Randomly duplicate rows of rare labels, until every label occurs at least
+    1 / max_imbalance_ratio times as much as the most frequent one.
+
+    For every label under the target, as many rows holding it as it misses are
+    drawn, all labels at once. The target is set from the original most
+    frequent label: duplicated multi-label rows also add up to the labels
+    co-occurring with rare ones, which may then exceed it.
+
+    :param dataset: dataset to balance
+    :param column_name: mono-label or multi-label column to balance
+    :param max_imbalance_ratio: wanted max ratio between the most and the least frequent label occurrences
+    :param schema: column types (see infer_schema), detected if not given
+    :param random_state: seed or np.random.RandomState
+    :return: balanced dataset, original rows followed by the duplicated ones (with duplicated index values)
+    """
+    _check_ratio(max_imbalance_ratio)
+    random_state = _random_state(random_state)
+
+    column = _label_column(dataset, column_name, schema)
+    row_count = len(column)
+    label_rows, label_offsets = _label_rows(column, _entry_rows(column))
+
+    occurrences = column.occurrences()
+    if not occurrences.any():
+        return dataset.iloc[np.arange(row_count)]
+
+    target = int(np.ceil(occurrences.max() / float(max_imbalance_ratio)))
+
+    with stage('oversample', column_name, rows=row_count, labels=len(column.labels)) as current_stage:
+        labels = np.flatnonzero((occurrences > 0) & (occurrences < target))
+        deficits = target - occurrences[labels]
+
+        # Rows drawn uniformly among the rows of every label
+        sizes = np.repeat(occurrences[labels], deficits)
+        draws = np.repeat(label_offsets[labels], deficits) + (random_state.random_sample(len(sizes)) * sizes)
+        duplicates = label_rows[draws.astype(np.int64)]
+
+        current_stage.set(duplicated=len(duplicates))
+
+    return dataset.iloc[np.concatenate([np.arange(row_count), duplicates])]
+
+
+def _split_count(count, shares, random_state):
+    # Number of rows going to the second subset, given the (non negative) demand of both subsets
+    share = shares[1] / shares.sum() if shares.sum() > 0 else 0.5
+    expected = count * share
+
+    return int(np.floor(expected) + (random_state.random_sample() < expected - np.floor(expected)))
+
+
+def stratified_split(dataset, column_name, test_size=0.2, schema=None, random_state=None):
+    """
+    Train / test split keeping the proportion of every label in both subsets,
+    by iterative stratification (Sechidis et al., 2011).
+
+    Labels are visited from the rarest to the most frequent: the unassigned
+    rows holding a label are split between both subsets according to what
+    each subset still misses of that label, and what both subsets miss of the
+    other labels of these rows is updated. A heap, where labels are pushed
+    again with their new count and stale entries are skipped, gives the next
+    rarest label (by unassigned rows), so the cost is proportional to
+    the number of (row, label) entries, not rows x labels. Rows without label
+    fill up the subsets at the end.
+
+    :param dataset: dataset to split
+    :param column_name: mono-label or multi-label column to stratify on
+    :param test_size: proportion (float in (0, 1)) or number (int) of test rows
+    :param schema: column types (see infer_schema), detected if not given
+    :param random_state: seed or np.random.RandomState
+    :return: train dataset, test dataset, rows in their original order
+    """
+    random_state = _random_state(random_state)
+
+    column = _label_column(dataset, column_name, schema)
+    row_count = len(column)
+    label_rows, label_offsets = _label_rows(column, _entry_rows(column))
+
+    test_count = test_size if isinstance(test_size, (int, np.integer)) else int(round(test_size * row_count))
+    if not 0 <= test_count <= row_count:
+        raise ValueError("test_size should be a proportion or a number of rows of the dataset, got %s" % test_size)
+
+    # What every subset (train, test) misses, of rows and of every label
+    proportions = np.array([row_count - test_count, test_count], dtype=float) / max(row_count, 1)
+    missing_rows = proportions * row_count
+    remaining = column.occurrences()
+    missing_labels = np.outer(proportions, remaining)
+
+    subsets = np.full(row_count, -1, dtype=np.int8)
+    heap = [(count, label) for label, count in enumerate(remaining.tolist()) if count]
+    heapq.heapify(heap)
+
+    with stage('stratified_split', column_name, rows=row_count, labels=len(column.labels)):
+        while heap:
+            count, label = heapq.heappop(heap)
+            if count != remaining[label]:
+                # Stale entry: the label has been pushed again with its current count
+                continue
+
+            rows = np.unique(label_rows[label_offsets[label]:label_offsets[label + 1]])
+            rows = rows[subsets[rows] < 0]
+            random_state.shuffle(rows)
+
+            test_rows = _split_count(len(rows), np.maximum(missing_labels[:, label], 0), random_state)
+            for subset, subset_rows in ((1, rows[:test_rows]), (0, rows[test_rows:])):
+                subsets[subset_rows] = subset
+                codes = column.codes[offset_positions(column.offsets, subset_rows)]
+                np.subtract.at(missing_labels[subset], codes, 1)
+                np.subtract.at(remaining, codes, 1)
+                missing_rows[subset] -= len(subset_rows)
+
+            # Co-occurring labels got rarer: push them with their new count
+            for code in np.unique(column.codes[offset_positions(column.offsets, rows)]).tolist():
+                if remaining[code]:
+                    heapq.heappush(heap, (int(remaining[code]), code))
+
+        # Rows without label
+        rows = np.flatnonzero(subsets < 0)
+        random_state.shuffle(rows)
+        test_rows = min(max(int(round(missing_rows[1])), 0), len(rows))
+        subsets[rows[:test_rows]] = 1
+        subsets[rows[test_rows:]] = 0
+
+    return dataset.iloc[np.flatnonzero(subsets == 0)], dataset.iloc[np.flatnonzero(subsets == 1)]
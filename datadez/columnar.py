@@ -0,0 +1,212 @@
+from __future__ import unicode_literals, print_function
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from datadez.hashing import hash_labels
+from datadez.hashing import mix64
+
+_INT32_MAX = np.iinfo(np.int32).max
+
+
+def _index_dtype(size):
+    return np.int32 if size <= _INT32_MAX else np.int64
+
+
+def _object_array(values):
+    if isinstance(values, (pd.Index, np.ndarray)):
+        return np.asarray(values, dtype=object)
+    return pd.Series(list(values), dtype=object).values
+
+
+def offset_positions(offsets, ids):
+    """
+    Positions of the items of some groups, in a layout where group i holds
+    positions offsets[i]:offsets[i + 1] (like the entries of a row in codes).
+
+    :param offsets: array of shape (group count + 1,)
+    :param ids: groups
+    :return: positions of the items of every group, group after group
+    """
+    starts = offsets[ids]
+    lengths = offsets[ids + 1] - starts
+    ends = np.cumsum(lengths)
+
+    return np.repeat(starts - (ends - lengths), lengths) + np.arange(ends[-1] if len(ends) else 0)
+
+
+class MultiLabelColumn(object):
+    """
+    Columnar representation of a multi-label column.
+
+    Instead of one Python list per row, labels are stored as integer codes:
+    labels of row i are labels[codes[offsets[i]:offsets[i + 1]]].
+    """
+
+    def __init__(self, offsets, codes, labels, index=None, name=None):
+        """
+        :param offsets: array of shape (row count + 1,), start of each row inside codes
+        :param codes: array of label codes, one per (row, label) entry
+        :param labels: label dictionary, code -> label
+        :param index: index of the rows (default to a RangeIndex)
+        :param name: name of the column
+        """
+        self.offsets = np.asarray(offsets, dtype=_index_dtype(len(codes)))
+        self.codes = np.asarray(codes, dtype=_index_dtype(len(labels)))
+        self.labels = _object_array(labels)
+        self.index = index if index is not None else pd.RangeIndex(len(self.offsets) - 1)
+        self.name = name
+
+    @classmethod
+    def from_series(cls, series):
+        """
+        Build a columnar multi-label column from a series of iterables.
+        Null entries are considered as empty label lists.
+
+        :param series: series of lists (or tuples, sets)
+        :return: MultiLabelColumn
+        """
+        rows = series.tolist()
+        if series.isnull().any():
+            rows = [() if empty else labels for labels, empty in zip(rows, series.isnull())]
+
+        cardinalities = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+        offsets = np.concatenate([[0], np.cumsum(cardinalities)])
+
+        # Label dictionary is ordered by first appearance
+        flat_labels = pd.Series(list(itertools.chain.from_iterable(rows)), dtype=object)
+        codes, labels = pd.factorize(flat_labels)
+
+        return cls(offsets, codes, labels, index=series.index, name=series.name)
+
+    @classmethod
+    def from_mono_label(cls, series):
+        """
+        Columnar view of a mono-label column: one label per row, none for
+        null entries. Categorical columns keep their categories as label dictionary.
+
+        :param series: mono-label series
+        :return: MultiLabelColumn
+        """
+        if isinstance(series.dtype, pd.api.types.CategoricalDtype):
+            codes, labels = np.asarray(series.cat.codes), series.cat.categories
+        else:
+            codes, labels = pd.factorize(series)
+
+        known = codes >= 0
+
+        return cls(np.concatenate([[0], np.cumsum(known)]), codes[known], labels, index=series.index, name=series.name)
+
+    def to_series(self):
+        """
+        Back to a series of lists, one new list per row.
+
+        :return: pd.Series of lists
+        """
+        flat_labels = self.labels[self.codes].tolist()
+        bounds = self.offsets.tolist()
+        rows = [flat_labels[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+        return pd.Series(rows, index=self.index, name=self.name, dtype=object)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.codes.nbytes + self.labels.nbytes
+
+    def slice(self, start, stop):
+        """
+        Rows [start, stop) of the column, sharing the label dictionary.
+
+        :return: MultiLabelColumn
+        """
+        stop = min(stop, len(self))
+        offsets = self.offsets[start:stop + 1]
+
+        return MultiLabelColumn(offsets - offsets[0],
+                                self.codes[offsets[0]:offsets[-1]],
+                                self.labels,
+                                index=self.index[start:stop],
+                                name=self.name)
+
+    def take(self, indices, index=None):
+        """
+        Rows at some positions (repeated positions allowed), sharing the label dictionary.
+
+        :param indices: positions of the rows to take
+        :param index: index of the new rows (default to the index of the taken rows)
+        :return: MultiLabelColumn
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        cardinalities = self.cardinalities()[indices]
+        offsets = np.concatenate([[0], np.cumsum(cardinalities)])
+
+        # Position in codes of every entry of the new rows
+        shifts = np.repeat(self.offsets[:-1][indices] - offsets[:-1], cardinalities)
+        positions = np.arange(offsets[-1]) + shifts
+
+        return MultiLabelColumn(offsets,
+                                self.codes[positions],
+                                self.labels,
+                                index=index if index is not None else self.index[indices],
+                                name=self.name)
+
+    def cardinalities(self):
+        """
+        :return: label count of every row
+        """
+        return np.diff(self.offsets)
+
+    def occurrences(self):
+        """
+        :return: occurrence of every label of the dictionary, indexed by code
+        """
+        return np.bincount(self.codes, minlength=len(self.labels))
+
+    def partition_keys(self, ordered=False):
+        """
+        64-bit key of the label set of every row: rows holding the same labels
+        get the same key, whatever the label dictionary of the column.
+
+        :param ordered: If True, ['A', 'B'] and ['B', 'A'] are different partitions
+        :return: np.array of uint64
+        """
+        cardinalities = self.cardinalities()
+        entry_hashes = hash_labels(self.labels)[self.codes]
+
+        if ordered:
+            positions = np.arange(len(self.codes)) - np.repeat(self.offsets[:-1], cardinalities)
+            entry_hashes = mix64(entry_hashes, seed=positions.astype(np.uint64))
+        else:
+            entry_hashes = mix64(entry_hashes)
+
+        # Sum of entry hashes over each row (wrapping around 2 ** 64): order insensitive
+        cumulative_hashes = np.concatenate([np.zeros(1, dtype=np.uint64), np.cumsum(entry_hashes, dtype=np.uint64)])
+        with np.errstate(over='ignore'):
+            keys = cumulative_hashes[self.offsets[1:]] - cumulative_hashes[self.offsets[:-1]]
+
+        return mix64(keys ^ cardinalities.astype(np.uint64), seed=1)
+
+    def filter_labels(self, keep):
+        """
+        Remove some labels from every row.
+
+        :param keep: boolean array indexed by code, True for labels to keep
+        :return: new MultiLabelColumn, with a label dictionary restricted to kept labels
+        """
+        keep = np.asarray(keep, dtype=bool)
+        kept_entries = keep[self.codes]
+
+        # Code remapping toward the compacted label dictionary
+        new_codes = np.cumsum(keep) - 1
+        kept_before = np.concatenate([[0], np.cumsum(kept_entries)])
+
+        return MultiLabelColumn(kept_before[self.offsets],
+                                new_codes[self.codes[kept_entries]],
+                                self.labels[keep],
+                                index=self.index,
+                                name=self.name)
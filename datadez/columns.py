@@ -3,52 +3,165 @@ from __future__ import unicode_literals, print_function
 from past.builtins import basestring
 
 import numbers
-from collections import defaultdict
 
 import numpy as np
 import pandas as pd
 
+from datadez.columnar import MultiLabelColumn
+from datadez.profiling import stage
+
 NUMERIC_TYPE = 'numeric'
 MONO_LABEL_TYPE = 'mono-label'
 MULTI_LABEL_TYPE = 'multi-label'
 TEXT_TYPE = 'text'
 
+DETECTION_SAMPLE_SIZE = 1000
+
+# Min share of the (non empty) sampled strings holding whitespace for a column to be text:
+# a few multi-word labels ('new york') don't make a mono-label column text
+TEXT_MIN_SHARE = 0.5
+
+
+def is_categorical(column):
+    return isinstance(getattr(column, 'dtype', None), pd.api.types.CategoricalDtype)
+
+
+def count_codes(codes, label_count):
+    """
+    :param codes: label codes, -1 for null entries
+    :param label_count: number of labels
+    :return: occurrence of every code, number of null entries
+    """
+    null_count = np.count_nonzero(codes < 0)
+    if null_count:
+        codes = codes[codes >= 0]
+
+    return np.bincount(codes, minlength=label_count), null_count
+
 
 def get_mono_label_occurrence(column):
-    return column.value_counts(dropna=False)
+    """
+    :param column: mono-label column
+    :return: occurrence of every label occurring in the column (null entries
+        counted under NaN), sorted by decreasing occurrence
+    """
+    if not is_categorical(column):
+        return column.value_counts(dropna=False)
 
+    # Categorical columns are counted on their codes
+    occurrences, null_count = count_codes(np.asarray(column.cat.codes), len(column.cat.categories))
 
-def get_multi_label_occurrence(column):
-    counter = defaultdict(int)
-    cardinalities = []
+    occurrences = pd.Series(occurrences, index=pd.Index(column.cat.categories, dtype=object))
+    occurrences = occurrences[occurrences > 0]
+    if null_count:
+        occurrences = pd.concat([occurrences, pd.Series([null_count], index=pd.Index([np.nan], dtype=object))])
+
+    return occurrences.sort_values(ascending=False, kind='mergesort')
 
-    for labels in column:
-        cardinalities.append(len(labels))
-        for label in labels:
-            counter[label] += 1
 
-    counter = pd.Series(counter)
+def get_multi_label_occurrence(column):
+    if not isinstance(column, MultiLabelColumn):
+        column = MultiLabelColumn.from_series(column)
+
+    counter = pd.Series(column.occurrences(), index=column.labels)
+    cardinalities = column.cardinalities()
 
     return counter, cardinalities
 
 
-def detect_column_type(column):
+def _detect_values_type(values):
+    # values are a bounded sample of non null entries (Parquet list cells are read as arrays)
+    types = values.map(type)
+
+    if types.map(lambda entry_type: issubclass(entry_type, (list, set, tuple, np.ndarray))).any():
+        return MULTI_LABEL_TYPE
+
+    is_string = types.map(lambda entry_type: issubclass(entry_type, basestring))
+    if is_string.any():
+        strings = values[is_string]
+        strings = strings[strings.str.len() > 0]
+        is_text = strings.str.contains(r'\s', regex=True)
+        return TEXT_TYPE if len(is_text) and is_text.mean() >= TEXT_MIN_SHARE else MONO_LABEL_TYPE
+
+    if types.map(lambda entry_type: issubclass(entry_type, numbers.Number)).any():
+        return NUMERIC_TYPE
+
+    return None
+
+
+def detect_column_type(column, sample_size=DETECTION_SAMPLE_SIZE):
+    """
+    Detect the type of a column: numeric, mono-label, multi-label or text.
+
+    Numeric and categorical columns are detected from their dtype. Object columns
+    are detected by inspecting a bounded random sample of their non null entries.
+
+    :param column: column to inspect
+    :param sample_size: max number of entries inspected
+    :return: column type, None if it can't be detected (empty column, unsupported dtype)
+    """
     assert len(column) > 0
 
-    current_entry = 0
-    column_type = None
-    while column_type is None and current_entry < len(column):
-        entry = column.iloc[current_entry]
+    with stage('detect_type', column.name, rows=len(column)):
+        return _detect_column_type(column, sample_size)
+
+
+def _detect_column_type(column, sample_size):
+    if isinstance(column, MultiLabelColumn):
+        return MULTI_LABEL_TYPE
+
+    dtype = column.dtype
+    if isinstance(dtype, pd.api.types.CategoricalDtype):
+        categories = pd.Series(dtype.categories)
+        return _detect_values_type(categories.iloc[:sample_size]) if len(categories) else None
+    elif pd.api.types.is_numeric_dtype(dtype):
+        return NUMERIC_TYPE if column.notnull().any() else None
+    elif not pd.api.types.is_object_dtype(dtype) and not pd.api.types.is_string_dtype(dtype):
+        return None
+
+    values = column.dropna()
+    if len(values) == 0:
+        return None
+    elif len(values) > sample_size:
+        values = values.sample(sample_size, random_state=0)
+
+    return _detect_values_type(values)
+
+
+def infer_schema(dataset, sample_size=DETECTION_SAMPLE_SIZE):
+    """
+    Detect the type of every column of a dataset, once.
+
+    The schema can then be given to summarize, filter_small_occurrence,
+    filter_empty or vectorize_dataset to skip type detection.
+
+    :param dataset: dataset to inspect
+    :param sample_size: max number of entries inspected per column
+    :return: schema, a dict column name -> column type
+    """
+    return {column: detect_column_type(dataset[column], sample_size) if len(dataset[column]) else None
+            for column in dataset}
+
+
+def get_column_type(dataset, column_name, schema=None):
+    """
+    Column type, read from the schema if given, detected otherwise.
+    """
+    if schema is not None and column_name in schema:
+        return schema[column_name]
+
+    return detect_column_type(dataset[column_name])
 
-        if isinstance(entry, basestring) and " " in entry:
-            column_type = TEXT_TYPE
-        elif isinstance(entry, basestring):
-            column_type = MONO_LABEL_TYPE
-        elif isinstance(entry, (list, set, tuple)):
-            column_type = MULTI_LABEL_TYPE
-        elif not np.isnan(entry) and isinstance(entry, numbers.Number):
-            column_type = NUMERIC_TYPE
 
-        current_entry += 1
+def pack_column(column, column_type):
+    """
+    Compact representation of a column, cheaper to send to worker processes
+    than pickled Python objects: multi-label columns become MultiLabelColumn,
+    object mono-label columns become categorical.
+    """
+    if column_type == MULTI_LABEL_TYPE and not isinstance(column, MultiLabelColumn):
+        return MultiLabelColumn.from_series(column)
+    elif column_type == MONO_LABEL_TYPE and pd.api.types.is_object_dtype(column.dtype):
+        return column.astype('category')
 
-    return column_type
+    return column
@@ -14,6 +14,14 @@ GAP = 2 * PI * 0.005
 
 COLOR_SCHEME = ["#64B5F6", "#E57373", "#AED581", "#FFB74D", "#90A4AE"]
 
+# Distance to the origin of the Bezier control point of ribbons, and of self relations
+RIBBON_RADIUS = 0.2
+SELF_RELATION_RADIUS = 0.9
+
+# Geometry is computed on arrays, one entry per ideogram or per ribbon. Arcs of
+# various lengths are sampled in a single flat array of angles, arc i covering
+# angles[offsets[i]:offsets[i + 1]].
+
 
 def check_data(data_matrix):
     h, w = data_matrix.shape
@@ -23,110 +31,133 @@ def check_data(data_matrix):
 
 
 def modulo_a_b(x, a, b):
-    # maps a real number onto the unit circle identified with
+    # maps real numbers onto the unit circle identified with
     # the interval [a,b), b-a=2*PI
     if a >= b:
         raise ValueError('Incorrect interval ends')
-    y = (x - a) % (b - a)
-    return y + b if y < 0 else y + a
+    return np.remainder(np.asarray(x, dtype=float) - a, b - a) + a
 
 
 def test_2_pi(x):
-    return 0 <= x < 2 * PI
+    x = np.asarray(x)
+    return (0 <= x) & (x < 2 * PI)
 
 
 def get_ideogram_ends(ideogram_len, gap):
-    ideo_ends = []
-    left = 0
-    for k in range(len(ideogram_len)):
-        right = left + ideogram_len[k]
-        ideo_ends.append([left, right])
-        left = right + gap
-    return ideo_ends
-
-
-def make_ideogram_arc(radius, phi, a=50):
-    # radius is the circle radius
-    # phi is the list of ends angle coordinates of an arc
+    # Ideograms follow each other, separated by a gap: ends are the running sum of
+    # ideogram_len[0], gap, ideogram_len[1], gap...
+    steps = np.empty(2 * len(ideogram_len))
+    steps[0::2] = ideogram_len
+    steps[1::2] = gap
+    ends = np.cumsum(steps)
+
+    return np.column_stack([np.concatenate([[0.], ends[1:-1:2]]), ends[0::2]])
+
+
+def sample_arcs(starts, stops, counts):
+    """
+    Angles of several arcs, each one sampled like np.linspace(start, stop, count) would.
+
+    :param starts: start angle of every arc
+    :param stops: stop angle of every arc
+    :param counts: number of points of every arc (at least 2)
+    :return: flat array of angles, offsets of the arcs inside it
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    arcs = np.repeat(np.arange(len(counts)), counts)
+    positions = (np.arange(offsets[-1]) - offsets[arcs]).astype(float)
+
+    divisions = (counts - 1).astype(float)
+    deltas = stops - starts
+    steps = deltas / divisions
+
+    # Same operations as np.linspace, including its handling of null (denormal) steps
+    angles = positions * steps[arcs]
+    null_steps = (steps == 0)[arcs]
+    angles[null_steps] = positions[null_steps] / divisions[arcs][null_steps] * deltas[arcs][null_steps]
+    angles += starts[arcs]
+    angles[offsets[1:] - 1] = stops
+
+    return angles, offsets
+
+
+def make_ideogram_arcs(ideo_ends, a=50, max_points=None):
+    # ideo_ends is the (n, 2) array of ends angle coordinates of the arcs
     # a is a parameter that controls the number of points to be evaluated on an arc
-    if not test_2_pi(phi[0]) or not test_2_pi(phi[1]):
-        phi = [modulo_a_b(t, 0, 2 * PI) for t in phi]
-    length = (phi[1] - phi[0]) % 2 * PI
-    nr = 5 if length <= PI / 4 else int(a * length / PI)
+    # max_points caps this number of points
+    phi = np.asarray(ideo_ends, dtype=float)
+    in_range = test_2_pi(phi).all(axis=1)
+    phi = np.where(in_range[:, np.newaxis], phi, modulo_a_b(phi, 0, 2 * PI))
+
+    length = np.remainder(phi[:, 1] - phi[:, 0], 2) * PI
+    counts = np.where(length <= PI / 4, 5, (a * length / PI).astype(np.int64))
+    if max_points is not None:
+        counts = np.minimum(counts, max_points)
+
+    increasing = phi[:, 0] < phi[:, 1]
+    phi = np.where(increasing[:, np.newaxis], phi, modulo_a_b(phi, -PI, PI))
 
-    if phi[0] < phi[1]:
-        theta = np.linspace(phi[0], phi[1], nr)
-    else:
-        phi = [modulo_a_b(t, -PI, PI) for t in phi]
-        theta = np.linspace(phi[0], phi[1], nr)
-    return radius * np.exp(1j * theta)
+    return sample_arcs(phi[:, 0], phi[:, 1], counts)
 
 
 def make_ribbon_ends(mapped_data, ideo_ends, idx_sort):
-    length = mapped_data.shape[0]
-    ribbon_boundary = np.zeros((length, length + 1))
-    for k in range(length):
-        start = ideo_ends[k][0]
-        ribbon_boundary[k][0] = start
-        for j in range(1, length + 1):
-            J = idx_sort[k][j - 1]
-            ribbon_boundary[k][j] = start + mapped_data[k][J]
-            start = ribbon_boundary[k][j]
-    return [[(ribbon_boundary[k][j], ribbon_boundary[k][j + 1]) for j in range(length)] for k in range(length)]
-
-
-def control_pts(angle, radius):
-    # angle is a  3-list containing angular coordinates of the control points b0, b1, b2
-    # radius is the distance from b1 to the  origin O(0,0)
+    # Ribbons of ideogram k are laid out by increasing size from its start:
+    # boundaries[k, j], boundaries[k, j + 1] are the ends of its j-th smallest ribbon
+    sorted_data = mapped_data[np.arange(len(mapped_data))[:, np.newaxis], idx_sort]
+    starts = np.asarray(ideo_ends, dtype=float)[:, :1]
+
+    return np.cumsum(np.hstack([starts, sorted_data]), axis=1)
 
-    if len(angle) != 3:
-        raise ValueError('angle must have len =3')
-    b_cplx = np.array([np.exp(1j * angle[k]) for k in range(3)])
-    b_cplx[1] = radius * b_cplx[1]
-    return zip(b_cplx.real, b_cplx.imag)
 
+def control_pts(angles, radius):
+    # angles is a (n, 3) array containing angular coordinates of the control points b0, b1, b2
+    # radius is the distance from b1 to the  origin O(0,0)
+    # returns the (n, 3) complex coordinates of the control points
+    if angles.shape[1] != 3:
+        raise ValueError('angles must have 3 columns')
+    b_cplx = np.exp(1j * angles)
+    b_cplx[:, 1] = radius * b_cplx[:, 1]
+    return b_cplx
 
-def ctrl_rib_chords(l, r, radius):
-    # this function returns a 2-list containing control poligons of the two quadratic Bezier
-    # curves that are opposite sides in a ribbon
-    # l (r) the list of angular variables of the ribbon arc ends defining
-    # the ribbon starting (ending) arc
-    # radius is a common parameter for both control polygons
-    if len(l) != 2 or len(r) != 2:
-        raise ValueError('the arc ends must be elements in a list of len 2')
-    return [control_pts([l[j], (l[j] + r[j]) / 2, r[j]], radius) for j in range(2)]
+
+def _format_points(points, point_format):
+    return [point_format % point for point in zip(points.real.tolist(), points.imag.tolist())]
 
 
 def make_q_bezier(b):
-    # defines the Plotly SVG path for a quadratic Bezier curve defined by the list of its control points
-    if len(b) != 3:
+    # defines the Plotly SVG paths for quadratic Bezier curves defined by the (n, 3) array
+    # of their control points
+    if b.shape[1] != 3:
         raise ValueError('control poligon must have 3 points')
-    A, B, C = b
-    return 'M ' + str(A[0]) + ',' + str(A[1]) + ' ' + 'Q ' + \
-           str(B[0]) + ', ' + str(B[1]) + ' ' + \
-           str(C[0]) + ', ' + str(C[1])
-
-
-def make_ribbon_arc(theta0, theta1):
-    if test_2_pi(theta0) and test_2_pi(theta1):
-        if theta0 < theta1:
-            theta0 = modulo_a_b(theta0, -PI, PI)
-            theta1 = modulo_a_b(theta1, -PI, PI)
-            if theta0 * theta1 > 0:
-                raise ValueError('incorrect angle coordinates for ribbon')
-
-        nr = int(40 * (theta0 - theta1) / PI)
-        if nr <= 2: nr = 3
-        theta = np.linspace(theta0, theta1, nr)
-        pts = np.exp(1j * theta)  # points on arc in polar complex form
-
-        string_arc = ''
-        for k in range(len(theta)):
-            string_arc += 'L ' + str(pts.real[k]) + ', ' + str(pts.imag[k]) + ' '
-        return string_arc
-    else:
+    starts = _format_points(b[:, 0], 'M %s,%s ')
+    controls = _format_points(b[:, 1], 'Q %s, %s ')
+    ends = _format_points(b[:, 2], '%s, %s')
+    return [start + control + end for start, control, end in zip(starts, controls, ends)]
+
+
+def _join_arcs(point_strings, offsets):
+    return [''.join(point_strings[start:stop]) for start, stop in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+def make_ribbon_arcs(theta0, theta1, max_points=None):
+    # SVG path of the arcs of ribbons, from theta0 to theta1, sampled with at most max_points
+    if not np.all(test_2_pi(theta0) & test_2_pi(theta1)):
         raise ValueError('the angle coordinates for an arc side of a ribbon must be in [0, 2*pi]')
 
+    wrapped = theta0 < theta1
+    theta0 = np.where(wrapped, modulo_a_b(theta0, -PI, PI), theta0)
+    theta1 = np.where(wrapped, modulo_a_b(theta1, -PI, PI), theta1)
+    if np.any(wrapped & (theta0 * theta1 > 0)):
+        raise ValueError('incorrect angle coordinates for ribbon')
+
+    counts = np.maximum((40 * (theta0 - theta1) / PI).astype(np.int64), 3)
+    if max_points is not None:
+        counts = np.minimum(counts, max_points)
+    theta, offsets = sample_arcs(theta0, theta1, counts)
+
+    return _join_arcs(_format_points(np.exp(1j * theta), 'L %s, %s '), offsets)
+
 
 def make_layout(title, plot_size):
     axis = dict(showline=False,  # hide axis line, grid, ticklabels and  title
@@ -144,8 +175,8 @@ def make_layout(title, plot_size):
                   height=plot_size,
                   margin=Margin(t=25, b=25, l=25, r=25),
                   hovermode='closest',
-                  shapes=[]  # to this list one appends below the dicts defining the ribbon,
-                  # respectively the ideogram shapes
+                  shapes=[]  # set at the end to the dicts defining the ideogram,
+                  # respectively the ribbon shapes
                   )
 
 
@@ -153,7 +184,7 @@ def make_ideo_shape(path, line_color, fill_color):
     # line_color is the color of the shape boundary
     # fill_collor is the color assigned to an ideogram
     return dict(
-        line=Line(
+        line=dict(
             color=line_color,
             width=0.45
         ),
@@ -165,184 +196,184 @@ def make_ideo_shape(path, line_color, fill_color):
     )
 
 
-def make_ribbon(l, r, line_color, fill_color, radius=0.2):
-    # l=[l[0], l[1]], r=[r[0], r[1]]  represent the opposite arcs in the ribbon
-    # line_color is the color of the shape boundary
-    # fill_color is the fill color for the ribbon shape
-    poligon = ctrl_rib_chords(l, r, radius)
-    b, c = poligon
+def make_ribbon_paths(l, r, radius=RIBBON_RADIUS, max_points=None):
+    # l=(n, 2), r=(n, 2) arrays representing the opposite arcs of ribbons
+    b = make_q_bezier(control_pts(np.column_stack([l[:, 0], (l[:, 0] + r[:, 0]) / 2, r[:, 0]]), radius))
+    c = control_pts(np.column_stack([l[:, 1], (l[:, 1] + r[:, 1]) / 2, r[:, 1]]), radius)
+    c = make_q_bezier(c[:, ::-1])
 
-    b = list(b)
-    c = list(c)
+    r_arcs = make_ribbon_arcs(r[:, 0], r[:, 1], max_points)
+    l_arcs = make_ribbon_arcs(l[:, 1], l[:, 0], max_points)
 
-    return dict(
-        line=Line(
-            color=line_color, width=0.5
-        ),
-        path=make_q_bezier(b) + make_ribbon_arc(r[0], r[1]) +
-             make_q_bezier(c[::-1]) + make_ribbon_arc(l[1], l[0]),
-        type='path',
-        fillcolor=fill_color,
-        layer='below'
-    )
+    return [b_path + r_arc + c_path + l_arc for b_path, r_arc, c_path, l_arc in zip(b, r_arcs, c, l_arcs)]
 
 
-def make_self_rel(l, line_color, fill_color, radius):
+def make_self_rel_paths(l, radius, max_points=None):
     # radius is the radius of Bezier control point b_1
-    b = control_pts([l[0], (l[0] + l[1]) / 2, l[1]], radius)
+    b = make_q_bezier(control_pts(np.column_stack([l[:, 0], (l[:, 0] + l[:, 1]) / 2, l[:, 1]]), radius))
+
+    return [b_path + l_arc for b_path, l_arc in zip(b, make_ribbon_arcs(l[:, 1], l[:, 0], max_points))]
 
-    b = list(b)
 
+def make_ribbon(path, line_color, fill_color):
+    # line_color is the color of the shape boundary
+    # fill_color is the fill color for the ribbon shape
     return dict(
-        line=Line(
+        line=dict(
             color=line_color, width=0.5
         ),
-        path=make_q_bezier(b) + make_ribbon_arc(l[1], l[0]),
+        path=path,
         type='path',
         fillcolor=fill_color,
         layer='below'
     )
 
 
-def map_data(data_matrix, row_value, ideogram_length):
-    mapped = np.zeros(data_matrix.shape)
-    for j in range(data_matrix.shape[0]):
-        mapped[:, j] = ideogram_length * data_matrix[:, j] / row_value
-    return mapped
+def make_marker(z, color, text):
+    # Traces are plain dicts: they are validated once, when the figure is built
+    return dict(type='scatter',
+                x=[z.real],
+                y=[z.imag],
+                mode='markers',
+                marker=dict(size=0.5, color=color),
+                text=text,
+                hoverinfo='text'
+                )
 
 
-def invPerm(perm):
-    # function that returns the inverse of a permutation, perm
-    inv = [0] * len(perm)
-    for i, s in enumerate(perm):
-        inv[s] = i
-    return inv
+def map_data(data_matrix, row_value, ideogram_length):
+    row_value = np.asarray(row_value)
+    return ideogram_length[:, np.newaxis] * data_matrix / row_value[:, np.newaxis]
 
 
-def _plot_ideogram(layout, row_sum, labels, colors, ideo_ends):
+def _plot_ideogram(shapes, row_sum, labels, colors, ideo_ends, max_arc_points):
     ideograms = []
 
-    for k in range(len(ideo_ends)):
-        z = make_ideogram_arc(1.1, ideo_ends[k])
-        zi = make_ideogram_arc(1.0, ideo_ends[k])
-        m = len(z)
-        n = len(zi)
-        ideograms.append(Scatter(x=z.real,
-                                 y=z.imag,
-                                 mode='lines',
-                                 line=Line(color=colors[k], shape='spline', width=0.25),
-                                 text='label: ' + labels[k] + '<br>' + 'occurrence: {:d}'.format(row_sum[k]),
-                                 hoverinfo='text'
-                                 )
-                         )
+    theta, offsets = make_ideogram_arcs(ideo_ends, max_points=max_arc_points)
+    z = 1.1 * np.exp(1j * theta)
+    zi = 1.0 * np.exp(1j * theta)
 
-        path = 'M '
-        for s in range(m):
-            path += str(z.real[s]) + ', ' + str(z.imag[s]) + ' L '
+    outer_points = _format_points(z, '%s, %s L ')
+    inner_points = _format_points(zi, '%s, %s L ')
 
-        Zi = np.array(zi.tolist()[::-1])
+    for k in range(len(ideo_ends)):
+        start, stop = offsets[k], offsets[k + 1]
+        ideograms.append(dict(type='scatter',
+                              x=z.real[start:stop],
+                              y=z.imag[start:stop],
+                              mode='lines',
+                              line=dict(color=colors[k], shape='spline', width=0.25),
+                              text='label: ' + labels[k] + '<br>' + 'occurrence: {:d}'.format(row_sum[k]),
+                              hoverinfo='text'
+                              )
+                         )
 
-        for s in range(m):
-            path += str(Zi.real[s]) + ', ' + str(Zi.imag[s]) + ' L '
-        path += str(z.real[0]) + ' ,' + str(z.imag[0])
+        # Outer arc, then inner arc backward, back to the start
+        path = 'M ' + ''.join(outer_points[start:stop]) + ''.join(inner_points[start:stop][::-1]) + \
+               str(z.real[start]) + ' ,' + str(z.imag[start])
 
-        layout['shapes'].append(make_ideo_shape(path, 'rgb(150,150,150)', colors[k]))
+        shapes.append(make_ideo_shape(path, 'rgb(150,150,150)', colors[k]))
 
     return ideograms
 
 
-def _plot_ribbon(layout, row_sum, labels, colors, ideogram_length, ideo_ends, matrix):
+def _plot_ribbon(shapes, row_sum, labels, colors, ideogram_length, ideo_ends, matrix, min_weight, max_arc_points):
     ribbon_info = []
 
-    radii_sribb = [0.9]  # these value are set after a few trials
-
-    # Colors
-    ribbon_color = [len(labels) * [colors[k]] for k in range(len(labels))]
-
     # Map ideogram and ribbons, sort by occurrence
     mapped_data = map_data(matrix, row_sum, ideogram_length)
     idx_sort = np.argsort(mapped_data, axis=1)
 
-    ribbon_ends = make_ribbon_ends(mapped_data, ideo_ends, idx_sort)
-
-    for k in range(len(labels)):
-        sigma = idx_sort[k]
-        sigma_inv = invPerm(sigma)
-        for j in range(k, len(labels)):
-            if matrix[k][j] == 0 and matrix[j][k] == 0:
-                continue
-
-            eta = idx_sort[j]
-            eta_inv = invPerm(eta)
-            l = ribbon_ends[k][sigma_inv[j]]
-
-            if j == k:
-                layout['shapes'].append(make_self_rel(l, 'rgb(175,175,175)',
-                                                      colors[k],
-                                                      radius=radii_sribb[k % len(radii_sribb)]))
-                z = 0.9 * np.exp(1j * (l[0] + l[1]) / 2)
-                # the text below will be displayed when hovering the mouse over the ribbon
-                text = 'label %s appeared in %s samples' % (labels[k], matrix[k][k]),
-                ribbon_info.append(Scatter(x=[z.real],
-                                           y=[z.imag],
-                                           mode='markers',
-                                           marker=Marker(size=0.5, color=colors[k]),
-                                           text=text,
-                                           hoverinfo='text'
-                                           )
-                                   )
-            else:
-                r = ribbon_ends[j][eta_inv[k]]
-                zi = 0.9 * np.exp(1j * (l[0] + l[1]) / 2)
-                zf = 0.9 * np.exp(1j * (r[0] + r[1]) / 2)
-
-                # texti and textf are the strings that will be displayed when hovering the mouse
-                # over the two ribbon ends
-                texti = '%s x %s: %s times' % (labels[k], labels[j], matrix[k][j])
-                textf = '%s x %s: %s times' % (labels[j], labels[k], matrix[j][k])
-
-                ribbon_info.append(Scatter(x=[zi.real],
-                                           y=[zi.imag],
-                                           mode='markers',
-                                           marker=Marker(size=0.5, color=ribbon_color[k][j]),
-                                           text=texti,
-                                           hoverinfo='text'
-                                           )
-                                   ),
-                ribbon_info.append(Scatter(x=[zf.real],
-                                           y=[zf.imag],
-                                           mode='markers',
-                                           marker=Marker(size=0.5, color=ribbon_color[k][j]),
-                                           text=textf,
-                                           hoverinfo='text'
-                                           )
-                                   )
-
-                # IMPORTANT!!!  Reverse these arc ends because otherwise you get
-                r = (r[1], r[0])
-                # a twisted ribbon
-                # append the ribbon shape
-                layout['shapes'].append(make_ribbon(l, r, 'rgb(175,175,175)', ribbon_color[k][j]))
+    ribbon_boundaries = make_ribbon_ends(mapped_data, ideo_ends, idx_sort)
+
+    # rank[k, j]: position of ribbon (k, j) among the ribbons of ideogram k
+    rank = np.argsort(idx_sort, axis=1)
+
+    # One ribbon per related pair k <= j, in row-major order. Light ribbons are not
+    # drawn, the room they would take in ideograms is kept.
+    related = (matrix != 0) | (matrix.T != 0)
+    if min_weight:
+        related &= np.maximum(matrix, matrix.T) >= min_weight
+    k_index, j_index = np.nonzero(np.triu(related))
+    rank_kj = rank[k_index, j_index]
+    rank_jk = rank[j_index, k_index]
+
+    l = np.column_stack([ribbon_boundaries[k_index, rank_kj], ribbon_boundaries[k_index, rank_kj + 1]])
+    r = np.column_stack([ribbon_boundaries[j_index, rank_jk], ribbon_boundaries[j_index, rank_jk + 1]])
+
+    # Markers in the middle of ribbon ends, displaying text when hovering the mouse
+    zi = 0.9 * np.exp(1j * ((l[:, 0] + l[:, 1]) / 2))
+    zf = 0.9 * np.exp(1j * ((r[:, 0] + r[:, 1]) / 2))
+
+    self_relations = k_index == j_index
+    paths = np.empty(len(k_index), dtype=object)
+    paths[self_relations] = make_self_rel_paths(l[self_relations], radius=SELF_RELATION_RADIUS,
+                                                max_points=max_arc_points)
+
+    # IMPORTANT!!!  Reverse the r arc ends because otherwise you get a twisted ribbon
+    paths[~self_relations] = make_ribbon_paths(l[~self_relations], r[~self_relations][:, ::-1],
+                                               max_points=max_arc_points)
+
+    for ribbon, (k, j) in enumerate(zip(k_index.tolist(), j_index.tolist())):
+        if k == j:
+            # the text below will be displayed when hovering the mouse over the ribbon
+            text = 'label %s appeared in %s samples' % (labels[k], matrix[k][k])
+            ribbon_info.append(make_marker(zi[ribbon], colors[k], [text]))
+        else:
+            # texti and textf are the strings that will be displayed when hovering the mouse
+            # over the two ribbon ends
+            texti = '%s x %s: %s times' % (labels[k], labels[j], matrix[k][j])
+            textf = '%s x %s: %s times' % (labels[j], labels[k], matrix[j][k])
+
+            ribbon_info.append(make_marker(zi[ribbon], colors[k], texti))
+            ribbon_info.append(make_marker(zf[ribbon], colors[k], textf))
+
+        shapes.append(make_ribbon(paths[ribbon], 'rgb(175,175,175)', colors[k]))
 
     return ribbon_info
 
 
-def chord_diagram(matrix, labels):
+def chord_diagram(matrix, labels, min_weight=0, max_arc_points=None):
+    """
+    Plotly chord diagram of a label intersection matrix.
+
+    The figure payload grows with the number of labels, of related label
+    pairs (ribbons) and of points sampled on arcs: reduce the matrix first
+    (see multilabel_intersection_matrix top_k) to plot many labels.
+
+    :param matrix: symmetric (label, label) matrix
+    :param labels: label names
+    :param min_weight: ribbons of pairs of labels found together less often are not drawn
+    :param max_arc_points: max number of points sampled on every arc (at least 3)
+    :return: plotly Figure
+    """
+    if max_arc_points is not None and max_arc_points < 3:
+        raise ValueError('max_arc_points must be at least 3')
+
+    matrix = np.asarray(matrix)
     label_count = check_data(matrix)
 
     # Useful vars
     layout = make_layout('Chord diagram', 600)
-    row_sum = [np.sum(matrix[k, :]) for k in range(label_count)]
+    row_sum = matrix.sum(axis=1)
 
     # colors = polylinear_gradient(COLOR_SCHEME, len(ideogram_length))
     colors = polylinear_gradient(COLOR_SCHEME, label_count)
     ideo_colors = ['rgba(%s, %s, %s, 0.75)' % (r, g, b) for (r, g, b) in zip(colors['r'], colors['g'], colors['b'])]
 
-    ideogram_length = 2 * PI * np.asarray(row_sum) / sum(row_sum) - GAP * np.ones(len(labels))
-    ideo_ends = get_ideogram_ends(ideogram_length, GAP)
-
-    ideograms = _plot_ideogram(layout, row_sum, labels, ideo_colors, ideo_ends)
-    ribbon_info = _plot_ribbon(layout, row_sum, labels, ideo_colors, ideogram_length, ideo_ends, matrix)
+    gap = GAP
+    ideogram_length = 2 * PI * row_sum / row_sum.sum() - gap * np.ones(len(labels))
+    if np.any(ideogram_length < 0):
+        # Some labels are too small to afford a gap: share what gaps leave proportionally
+        gap = min(GAP, PI / label_count)
+        ideogram_length = (2 * PI - label_count * gap) * row_sum / row_sum.sum()
+    ideo_ends = get_ideogram_ends(ideogram_length, gap)
+
+    shapes = []
+    ideograms = _plot_ideogram(shapes, row_sum, labels, ideo_colors, ideo_ends, max_arc_points)
+    ribbon_info = _plot_ribbon(shapes, row_sum, labels, ideo_colors, ideogram_length, ideo_ends, matrix,
+                               min_weight, max_arc_points)
+    layout['shapes'] = shapes
 
     data = Data(ribbon_info + ideograms)
     figure = Figure(data=data, layout=layout)
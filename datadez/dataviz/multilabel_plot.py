@@ -4,11 +4,24 @@ from datadez.multilabel import multilabel_intersection_matrix
 from datadez.dataviz.chord_diagram import chord_diagram
 
 
-def intersection_matrix(dataset, column):
+def intersection_matrix(dataset, column, top_k=None, min_weight=0, max_arc_points=None, other_label='other'):
     """
     Compute and plot intersection matrix for a multilabel column.
+
+    For columns with many labels, the level of detail can be bounded: the
+    matrix is reduced to the top_k labels (others being merged into
+    other_label) before any geometry is built, light ribbons are dropped and
+    arcs are sampled with fewer points.
+
+    :param dataset: dataset where data are stored
+    :param column: multi-label column to plot
+    :param top_k: If set, number of most frequent labels to plot
+    :param min_weight: ribbons of pairs of labels found together less often are not drawn
+    :param max_arc_points: max number of points sampled on every arc (at least 3)
+    :param other_label: name of the label less frequent labels are merged into
+    :return: plotly Figure
     """
-    labels, matrix = multilabel_intersection_matrix(dataset, column)
-    figure = chord_diagram(matrix, labels)
+    labels, matrix = multilabel_intersection_matrix(dataset, column, top_k=top_k, other_label=other_label)
+    figure = chord_diagram(matrix, labels, min_weight=min_weight, max_arc_points=max_arc_points)
 
     return figure
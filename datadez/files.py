@@ -0,0 +1,182 @@
+from __future__ import unicode_literals, print_function
+
+import os
+
+import pandas as pd
+
+from datadez.columns import DETECTION_SAMPLE_SIZE
+from datadez.columns import MULTI_LABEL_TYPE
+
+CSV_FORMAT = 'csv'
+PARQUET_FORMAT = 'parquet'
+
+FILE_FORMATS = {
+    '.csv': CSV_FORMAT,
+    '.parquet': PARQUET_FORMAT,
+    '.pq': PARQUET_FORMAT,
+}
+
+DEFAULT_CHUNK_SIZE = 100000
+
+
+def get_file_format(path, file_format=None):
+    """
+    :param path: file path
+    :param file_format: 'csv' or 'parquet', guessed from the file extension if not given
+    :return: file format
+    """
+    if file_format is None:
+        file_format = FILE_FORMATS.get(os.path.splitext(path)[1].lower())
+
+    if file_format not in (CSV_FORMAT, PARQUET_FORMAT):
+        raise ValueError("Unknown file format of '%s', expecting '%s' or '%s'" % (path, CSV_FORMAT, PARQUET_FORMAT))
+
+    return file_format
+
+
+def _split_labels(label_separator):
+    def split(cell):
+        return cell.split(label_separator) if cell else []
+
+    return split
+
+
+def read_chunks(path, chunksize=DEFAULT_CHUNK_SIZE, multi_label_columns=(), label_separator='|', file_format=None,
+                **kwargs):
+    """
+    Read a CSV or Parquet file chunk by chunk.
+
+    In CSV files, labels of multi-label cells are joined with label_separator
+    (see flatten_multi_label): they are split back into lists.
+
+    :param path: file path
+    :param chunksize: number of rows read at once
+    :param multi_label_columns: (csv) multi-label columns
+    :param label_separator: (csv) separator of the labels of multi-label cells
+    :param file_format: 'csv' or 'parquet' (needs pyarrow), guessed from the file extension if not given
+    :param kwargs: (csv) any other pd.read_csv parameter
+    :return: generator of dataframes
+    """
+    if get_file_format(path, file_format) == CSV_FORMAT:
+        converters = dict(kwargs.pop('converters', {}))
+        converters.update({column: _split_labels(label_separator) for column in multi_label_columns})
+
+        for chunk in pd.read_csv(path, chunksize=chunksize, converters=converters, **kwargs):
+            yield chunk
+    else:
+        import pyarrow.parquet
+
+        for batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+
+
+def flatten_multi_label(chunk, multi_label_columns, label_separator='|'):
+    """
+    Join the labels of multi-label cells with label_separator, to write them in a CSV file.
+
+    :return: shallow copy of chunk
+    """
+    chunk = chunk.copy(deep=False)
+
+    for column in multi_label_columns:
+        chunk[column] = chunk[column].map(label_separator.join, na_action='ignore')
+
+    return chunk
+
+
+def encode_csv(chunk, multi_label_columns=(), label_separator='|', header=True):
+    """
+    :return: CSV text of a chunk, to be appended to a CSV file
+    """
+    return flatten_multi_label(chunk, multi_label_columns, label_separator).to_csv(index=False, header=header)
+
+
+class ChunkWriter(object):
+    """
+    Write a dataframe to a CSV or Parquet file chunk by chunk.
+    """
+
+    def __init__(self, path, multi_label_columns=(), label_separator='|', file_format=None, label_columns=None):
+        """
+        :param path: output file path
+        :param multi_label_columns: (csv) multi-label columns, whose labels are joined with label_separator
+        :param label_separator: (csv) separator of the labels of multi-label cells
+        :param file_format: 'csv' or 'parquet' (needs pyarrow), guessed from the file extension if not given
+        :param label_columns: (parquet) dict column name -> (column type, labels) of mono-label and
+            multi-label columns, whose Parquet type is derived from their labels rather than from the
+            first chunk (where they may be all empty)
+        """
+        self.path = path
+        self.file_format = get_file_format(path, file_format)
+        self.multi_label_columns = multi_label_columns
+        self.label_separator = label_separator
+        self.label_columns = label_columns or {}
+        self.rows = 0
+
+        self._file = None
+        self._parquet_writer = None
+        self._parquet_schema = None
+
+    def _make_parquet_schema(self, table):
+        import pyarrow
+
+        schema = table.schema
+        for name, (column_type, labels) in self.label_columns.items():
+            # Null entries may be counted as a NaN label
+            labels = pd.Index(labels).dropna()[:DETECTION_SAMPLE_SIZE]
+            label_type = pyarrow.array(labels.tolist()).type if len(labels) else None
+            if label_type is None or pyarrow.types.is_null(label_type):
+                label_type = pyarrow.string()
+
+            field_type = pyarrow.list_(label_type) if column_type == MULTI_LABEL_TYPE else label_type
+            schema = schema.set(schema.get_field_index(name), pyarrow.field(name, field_type))
+
+        return schema
+
+    def write(self, chunk):
+        """
+        :param chunk: dataframe, next rows
+        """
+        if self.file_format == CSV_FORMAT:
+            header = self._file is None
+            self.write_csv(encode_csv(chunk, self.multi_label_columns, self.label_separator, header), len(chunk))
+        else:
+            import pyarrow
+            import pyarrow.parquet
+
+            table = pyarrow.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_schema = self._make_parquet_schema(table)
+                self._parquet_writer = pyarrow.parquet.ParquetWriter(self.path, self._parquet_schema)
+
+            # Columns of a chunk may be all empty (float NaN, list<null>): every chunk gets the same schema
+            self._parquet_writer.write_table(table.cast(self._parquet_schema))
+            self.rows += len(chunk)
+
+    def write_csv(self, text, rows):
+        """
+        :param text: CSV text of the next rows (see encode_csv), with a header for the first ones
+        :param rows: number of rows of text
+        """
+        if self._file is None:
+            self._file = open(self.path, 'w')
+
+        self._file.write(text)
+        self.rows += rows
+
+    def close(self):
+        if self._file is None and self.file_format == CSV_FORMAT:
+            # No rows: empty file
+            self._file = open(self.path, 'w')
+
+        if self._file is not None:
+            self._file.close()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -1,77 +1,437 @@
 from __future__ import unicode_literals, print_function
 
-from copy import deepcopy
-
 import numpy as np
+import pandas as pd
 
+from datadez.columnar import MultiLabelColumn
+from datadez.columnar import offset_positions
 from datadez.columns import MONO_LABEL_TYPE, MULTI_LABEL_TYPE
-from datadez.columns import detect_column_type
+from datadez.columns import count_codes
+from datadez.columns import get_column_type
 from datadez.columns import get_mono_label_occurrence
 from datadez.columns import get_multi_label_occurrence
+from datadez.columns import is_categorical
+from datadez.files import CSV_FORMAT
+from datadez.files import DEFAULT_CHUNK_SIZE
+from datadez.files import ChunkWriter
+from datadez.files import encode_csv
+from datadez.files import get_file_format
+from datadez.files import read_chunks
+from datadez.parallel import get_shared
+from datadez.parallel import imap_jobs
+from datadez.profiling import stage
+
+
+def _recode_categorical(column, keep_label):
+    codes = np.asarray(column.cat.codes)
+
+    # Per code lookup table of the labels to keep, null entries (code -1) read its last cell
+    keep_label = np.append(keep_label, False)
+
+    # Removed labels get code -1, categories are shared with the input
+    filtered_codes = np.where(keep_label[codes], codes, -1).astype(codes.dtype, copy=False)
+
+    return pd.Series(pd.Categorical.from_codes(filtered_codes, column.cat.categories, ordered=column.cat.ordered),
+                     index=column.index, name=column.name)
 
 
 def _filter_mono_label_small_occurrence(dataset, column_name, min_occurrence):
-    occurrences = get_mono_label_occurrence(dataset[column_name])
-    labels_to_delete = occurrences[occurrences < min_occurrence].keys()
+    column = dataset[column_name]
 
-    mask = dataset[column_name].isin(labels_to_delete)
+    if is_categorical(column):
+        occurrences, _ = count_codes(np.asarray(column.cat.codes), len(column.cat.categories))
+        filtered_column = _recode_categorical(column, occurrences >= min_occurrence)
+    else:
+        occurrences = get_mono_label_occurrence(column)
+        filtered_column = column.mask(column.isin(occurrences.index[occurrences < min_occurrence]))
 
-    # Should check why, with no deepcopy, pandas is throwing a warning...
-    filtered_column = deepcopy(dataset[column_name])
-    filtered_column.loc[mask] = np.nan
     dataset[column_name] = filtered_column
 
     return dataset
 
 
 def _filter_multi_label_small_occurrence(dataset, column_name, min_occurrence):
-    occurrences, _ = get_multi_label_occurrence(dataset[column_name])
-    labels_to_delete = occurrences[occurrences < min_occurrence].keys()
+    column = dataset[column_name]
+    columnar = column if isinstance(column, MultiLabelColumn) else MultiLabelColumn.from_series(column)
+
+    # Labels are filtered by code, in a single gather over all rows
+    filtered_column = columnar.filter_labels(columnar.occurrences() >= min_occurrence)
 
-    for labels in dataset[column_name]:
-        labels[:] = [label for label in labels if label not in labels_to_delete]
+    if isinstance(column, MultiLabelColumn):
+        dataset[column_name] = filtered_column
+    else:
+        dataset[column_name] = filtered_column.to_series()
 
     return dataset
 
 
-def filter_small_occurrence(dataset, column_name, min_occurrence):
-    column_type = detect_column_type(dataset[column_name])
+def _keep_mono_labels(column, kept_labels):
+    # Entries whose label is not kept become NaN
+    if is_categorical(column):
+        return _recode_categorical(column, column.cat.categories.isin(kept_labels))
 
-    if column_type == MONO_LABEL_TYPE:
-        dataset = _filter_mono_label_small_occurrence(dataset, column_name, min_occurrence)
-    elif column_type == MULTI_LABEL_TYPE:
-        dataset = _filter_multi_label_small_occurrence(dataset, column_name, min_occurrence)
-    else:
-        raise NotImplementedError
+    return column.where(column.isin(kept_labels))
 
-    return dataset
 
+def _keep_multi_labels(column, kept_labels):
+    columnar = column if isinstance(column, MultiLabelColumn) else MultiLabelColumn.from_series(column)
+    filtered_column = columnar.filter_labels(pd.Index(columnar.labels).isin(kept_labels))
 
-def _drop_nan(dataset, column_name):
-    return dataset.dropna(subset=[column_name])
+    return filtered_column if isinstance(column, MultiLabelColumn) else filtered_column.to_series()
 
 
-def _filter_empty_mono_label(dataset, column_name):
-    dataset = _drop_nan(dataset, column_name)
+def _shallow_copy(dataset):
+    return dict(dataset) if isinstance(dataset, dict) else dataset.copy(deep=False)
+
+
+def filter_small_occurrence(dataset, column_name, min_occurrence, schema=None):
+    """
+    Remove labels not occurring much in one or several columns.
+
+    Mono-label entries whose label is too rare become NaN, rare labels are
+    removed from multi-label entries. Input lists are left untouched: the
+    returned dataset holds new columns.
+
+    Categorical mono-label columns are counted and filtered on their integer
+    codes, several times faster than object columns, and stay categorical.
+
+    Occurrences of a column don't depend on the others: the dataset is
+    shallow-copied once, then every column is counted and filtered on its own.
+
+    :param dataset: dataset to filter
+    :param column_name: column to filter (a tuple being a column name), or list of columns
+    :param min_occurrence: minimum label occurrence, or dict column name -> minimum occurrence
+    :param schema: column types (see infer_schema), detected if not given
+
+    :return: filtered dataset
+    """
+    column_names = column_name if isinstance(column_name, list) else [column_name]
+
+    dataset = _shallow_copy(dataset)
+    for name in column_names:
+        column_type = get_column_type(dataset, name, schema)
+        threshold = min_occurrence[name] if isinstance(min_occurrence, dict) else min_occurrence
+
+        with stage('filter_small_occurrence', name, rows=len(dataset[name]), min_occurrence=threshold):
+            if column_type == MONO_LABEL_TYPE:
+                dataset = _filter_mono_label_small_occurrence(dataset, name, threshold)
+            elif column_type == MULTI_LABEL_TYPE:
+                dataset = _filter_multi_label_small_occurrence(dataset, name, threshold)
+            else:
+                raise NotImplementedError
+
     return dataset
 
 
-def _filter_empty_multi_label(dataset, column_name):
-    dataset = _drop_nan(dataset, column_name)
-    dataset = dataset[dataset[column_name].apply(len) > 0]
+def _chunk_occurrence(column, column_type):
+    if column_type == MONO_LABEL_TYPE:
+        return get_mono_label_occurrence(column)
+
+    occurrences, _ = get_multi_label_occurrence(column)
+    return occurrences[occurrences > 0]
+
+
+def _filter_chunk(task):
+    chunk, csv_options = task
+    column_types, kept_labels = get_shared('column_types'), get_shared('kept_labels')
+
+    chunk = chunk.copy(deep=False)
+    for column_name, kept in kept_labels.items():
+        if column_types[column_name] == MONO_LABEL_TYPE:
+            chunk[column_name] = _keep_mono_labels(chunk[column_name], kept)
+        else:
+            chunk[column_name] = _keep_multi_labels(chunk[column_name], kept)
+
+    if csv_options is None:
+        return chunk
+
+    # CSV text is encoded by the worker, the writer only appends it
+    multi_label_columns, label_separator, header = csv_options
+    return encode_csv(chunk, multi_label_columns, label_separator, header), len(chunk)
+
+
+def filter_small_occurrence_file(input_path, output_path, column_name, min_occurrence, schema=None,
+                                 chunksize=DEFAULT_CHUNK_SIZE, n_jobs=1, label_separator='|', **kwargs):
+    """
+    filter_small_occurrence for CSV or Parquet files bigger than memory, in two
+    passes over the input file: label occurrences are counted chunk by chunk,
+    then every chunk is filtered and written to the output file. Memory is
+    bounded by the label dictionaries and a few chunks, whatever the row count.
+
+    In CSV files, labels of multi-label cells are joined with label_separator,
+    and multi-label columns must be given in the schema.
+
+    :param input_path: CSV or Parquet (needs pyarrow) file to filter
+    :param output_path: CSV or Parquet file to write
+    :param column_name: column to filter (a tuple being a column name), or list of columns
+    :param min_occurrence: minimum label occurrence, or dict column name -> minimum occurrence
+    :param schema: column types (see infer_schema), detected on the first chunk if not given
+    :param chunksize: number of rows read at once
+    :param n_jobs: number of worker processes filtering chunks in the second pass, -1 for all CPUs
+    :param label_separator: (csv) separator of the labels of multi-label cells
+    :param kwargs: (csv input) any other pd.read_csv parameter
+
+    :return: dict column name -> occurrence of every label (counted in the first pass)
+    """
+    column_names = column_name if isinstance(column_name, list) else [column_name]
+    multi_label_columns = [name for name, column_type in (schema or {}).items() if column_type == MULTI_LABEL_TYPE]
+
+    def chunks():
+        return read_chunks(input_path, chunksize, multi_label_columns, label_separator, **kwargs)
+
+    column_types = {}
+    occurrences = {}
+    with stage('count_pass') as current_stage:
+        rows = 0
+        for chunk in chunks():
+            for name in column_names:
+                if name not in column_types:
+                    column_types[name] = get_column_type(chunk, name, schema)
+                    if column_types[name] not in (MONO_LABEL_TYPE, MULTI_LABEL_TYPE):
+                        raise NotImplementedError
+                    occurrences[name] = pd.Series(dtype=np.int64)
+
+                chunk_occurrences = _chunk_occurrence(chunk[name], column_types[name])
+                occurrences[name] = occurrences[name].add(chunk_occurrences, fill_value=0).astype(np.int64)
+            rows += len(chunk)
+        current_stage.set(rows=rows)
+
+    kept_labels = {}
+    for name in column_types:
+        occurrences[name] = occurrences[name].sort_values(ascending=False, kind='mergesort')
+
+        threshold = min_occurrence[name] if isinstance(min_occurrence, dict) else min_occurrence
+        kept_labels[name] = occurrences[name].index[occurrences[name] >= threshold]
+
+    multi_label_columns = sorted(set(multi_label_columns) |
+                                 {name for name, column_type in column_types.items()
+                                  if column_type == MULTI_LABEL_TYPE})
+    label_columns = {name: (column_types[name], kept_labels[name]) for name in column_types}
+    csv_output = get_file_format(output_path) == CSV_FORMAT
+
+    def tasks():
+        for chunk_number, chunk in enumerate(chunks()):
+            csv_options = (multi_label_columns, label_separator, chunk_number == 0) if csv_output else None
+            yield chunk, csv_options
+
+    # Label dictionaries are sent once per worker, not with every chunk
+    shared = {'column_types': column_types, 'kept_labels': kept_labels}
+
+    with stage('rewrite_pass', rows=rows):
+        with ChunkWriter(output_path, multi_label_columns, label_separator, label_columns=label_columns) as writer:
+            for filtered in imap_jobs(_filter_chunk, tasks(), n_jobs=n_jobs, shared=shared):
+                if csv_output:
+                    writer.write_csv(*filtered)
+                else:
+                    writer.write(filtered)
+
+    return occurrences
+
+
+def _non_empty_mono_label(column):
+    return np.asarray(column.notnull())
+
+
+def _non_empty_multi_label(column):
+    if isinstance(column, MultiLabelColumn):
+        return column.cardinalities() > 0
+
+    # Null entries get a NaN length
+    return np.asarray(column.str.len() > 0)
+
+
+def filter_empty(dataset, column_names, schema=None, inplace=False):
+    """
+    Remove rows having an empty entry (NaN, empty list) in any of the given columns.
+
+    A single keep-mask is computed over all the columns, then applied once.
+
+    :param dataset: dataset to filter
+    :param column_names: columns to look at
+    :param schema: column types (see infer_schema), detected if not given
+    :param inplace: If True, drop rows from the given dataset instead of returning a filtered copy
+
+    :return: filtered dataset
+    """
+    with stage('filter_empty', rows=len(dataset), columns=len(column_names)) as current_stage:
+        keep = np.ones(len(dataset), dtype=bool)
+
+        for column_name in column_names:
+            column_type = get_column_type(dataset, column_name, schema)
+
+            if column_type == MONO_LABEL_TYPE:
+                keep &= _non_empty_mono_label(dataset[column_name])
+            elif column_type == MULTI_LABEL_TYPE:
+                keep &= _non_empty_multi_label(dataset[column_name])
+            else:
+                raise NotImplementedError
+
+        current_stage.set(removed=int(len(keep) - np.count_nonzero(keep)))
+
+        if not inplace:
+            return dataset[keep]
+
+        if not dataset.index.is_unique:
+            raise ValueError("Can't filter empty rows inplace on a dataset with duplicated index values")
+
+        dataset.drop(index=dataset.index[~keep], inplace=True)
+
     return dataset
 
 
-def filter_empty(dataset, column_names):
-    for column_name in column_names:
-        column = dataset[column_name]
-        column_type = detect_column_type(column)
+class _PeeledColumn(object):
+    """
+    (row, label code) entries of a label column, reachable by row and by
+    label, with the occurrence of every label and the label count of every
+    row over the entries still alive.
+    """
+
+    def __init__(self, column, column_type, row_count):
+        self.column = column
+        self.column_type = column_type
 
         if column_type == MONO_LABEL_TYPE:
-            dataset = _filter_empty_mono_label(dataset, column_name)
+            if is_categorical(column):
+                self.row_codes, labels = np.asarray(column.cat.codes), column.cat.categories
+            else:
+                self.row_codes, labels = pd.factorize(column)
+            known = self.row_codes >= 0
+            self.row_offsets = np.concatenate([[0], np.cumsum(known)])
+            self.codes = self.row_codes[known]
         elif column_type == MULTI_LABEL_TYPE:
-            dataset = _filter_empty_multi_label(dataset, column_name)
+            self.columnar = column if isinstance(column, MultiLabelColumn) else MultiLabelColumn.from_series(column)
+            labels = self.columnar.labels
+            self.row_offsets = self.columnar.offsets.astype(np.int64)
+            self.codes = self.columnar.codes
         else:
             raise NotImplementedError
 
-    return dataset
+        self.label_count = len(labels)
+        self.rows = np.repeat(np.arange(row_count), np.diff(self.row_offsets))
+        self.alive = np.ones(len(self.codes), dtype=bool)
+
+        # Entries sorted by label
+        self.label_order = np.argsort(self.codes, kind='mergesort')
+        self.occurrences = np.bincount(self.codes, minlength=self.label_count)
+        self.label_offsets = np.concatenate([[0], np.cumsum(self.occurrences)])
+        self.label_alive = np.ones(self.label_count, dtype=bool)
+
+        self.row_labels = np.diff(self.row_offsets)
+
+    def remove_labels(self, codes):
+        """
+        :return: rows that lost a label
+        """
+        entries = self.label_order[offset_positions(self.label_offsets, codes)]
+        entries = entries[self.alive[entries]]
+        self.alive[entries] = False
+
+        rows = self.rows[entries]
+        self.row_labels -= np.bincount(rows, minlength=len(self.row_labels))
+
+        return rows
+
+    def remove_rows(self, rows):
+        entries = offset_positions(self.row_offsets, rows)
+        entries = entries[self.alive[entries]]
+        self.alive[entries] = False
+
+        self.occurrences -= np.bincount(self.codes[entries], minlength=self.label_count)
+
+    def filtered(self, kept_rows):
+        """
+        :param kept_rows: positions of the rows to keep
+        :return: kept rows of the column, without the removed labels
+        """
+        if self.column_type == MULTI_LABEL_TYPE:
+            filtered_column = self.columnar.filter_labels(self.label_alive).take(kept_rows)
+            return filtered_column if isinstance(self.column, MultiLabelColumn) else filtered_column.to_series()
+
+        column = self.column.iloc[kept_rows]
+        if is_categorical(column):
+            return _recode_categorical(column, self.label_alive)
+
+        return column.where(np.append(self.label_alive, False)[self.row_codes[kept_rows]])
+
+
+def _peel(dataset, thresholds, empty_columns, column_types):
+    row_count = len(dataset)
+    columns = {name: _PeeledColumn(dataset[name], column_types[name], row_count)
+               for name in set(thresholds) | set(empty_columns)}
+
+    row_alive = np.ones(row_count, dtype=bool)
+
+    def empty(rows):
+        is_empty = np.zeros(len(rows), dtype=bool)
+        for name in empty_columns:
+            is_empty |= columns[name].row_labels[rows] == 0
+        return rows[is_empty & row_alive[rows]]
+
+    dead_rows = empty(np.arange(row_count))
+    rounds = 0
+
+    while True:
+        # Labels under their minimum occurrence, among the ones still alive
+        dead_labels = {}
+        for name, threshold in thresholds.items():
+            column = columns[name]
+            dead_labels[name] = np.flatnonzero(column.label_alive & (column.occurrences < threshold))
+            column.label_alive[dead_labels[name]] = False
+
+        if not len(dead_rows) and not any(len(codes) for codes in dead_labels.values()):
+            break
+        rounds += 1
+
+        # Only rows that just lost a label can become empty
+        touched_rows = [dead_rows]
+        for name, codes in dead_labels.items():
+            rows = columns[name].remove_labels(codes)
+            if name in empty_columns:
+                touched_rows.append(rows)
+        dead_rows = empty(np.unique(np.concatenate(touched_rows)))
+
+        # Occurrences only decrease for the labels of the just removed rows
+        row_alive[dead_rows] = False
+        for column in columns.values():
+            column.remove_rows(dead_rows)
+
+        dead_rows = np.array([], dtype=np.int64)
+
+    return row_alive, columns, rounds
+
+
+def filter_until_stable(dataset, thresholds, drop_empty=True, schema=None):
+    """
+    Remove rare labels and empty rows until no label is under its minimum
+    occurrence: the fixed point of running filter_small_occurrence then
+    filter_empty again and again, as removing rows makes other labels rarer.
+
+    Label occurrences and row label counts are kept up to date as labels and
+    rows are removed: every round only revisits the entries of the labels and
+    rows removed by the previous one, instead of counting everything again.
+
+    :param dataset: dataset to filter
+    :param thresholds: dict column name -> minimum label occurrence
+    :param drop_empty: True to drop rows having an empty entry in any of the thresholds
+        columns, a list of columns to look at instead, or False to drop no row
+    :param schema: column types (see infer_schema), detected if not given
+
+    :return: filtered dataset
+    """
+    if drop_empty is True:
+        empty_columns = list(thresholds)
+    else:
+        empty_columns = list(drop_empty) if drop_empty else []
+
+    column_types = {name: get_column_type(dataset, name, schema) for name in set(thresholds) | set(empty_columns)}
+
+    with stage('filter_until_stable', rows=len(dataset), columns=len(column_types)) as current_stage:
+        row_alive, columns, rounds = _peel(dataset, thresholds, empty_columns, column_types)
+        current_stage.set(rounds=rounds)
+
+        kept_rows = np.flatnonzero(row_alive)
+        filtered = dataset.iloc[kept_rows].copy(deep=False)
+        for name in thresholds:
+            filtered[name] = columns[name].filtered(kept_rows)
+
+    return filtered
@@ -0,0 +1,47 @@
+from __future__ import unicode_literals, print_function
+
+import numpy as np
+import pandas as pd
+
+_MIX_1 = np.uint64(0xbf58476d1ce4e5b9)
+_MIX_2 = np.uint64(0x94d049bb133111eb)
+_GOLDEN = np.uint64(0x9e3779b97f4a7c15)
+
+
+def hash_labels(labels):
+    """
+    Stable 64-bit hash of every label: equal labels get equal hashes,
+    whatever the chunk or process they have been seen in.
+
+    :param labels: array-like of labels
+    :return: np.array of uint64
+    """
+    if not isinstance(labels, (np.ndarray, pd.Index, pd.Series)):
+        labels = pd.Series(list(labels), dtype=object)
+
+    labels = np.asarray(labels)
+    if labels.dtype.kind in 'biuf':
+        return pd.util.hash_array(labels)
+
+    labels = labels.astype(object)
+    try:
+        return pd.util.hash_array(labels, categorize=False)
+    except (TypeError, ValueError):
+        # Mixed types or unhashable labels (tuples...): hash their representation
+        return pd.util.hash_array(np.array([str(label) for label in labels], dtype=object), categorize=False)
+
+
+def mix64(hashes, seed=0):
+    """
+    splitmix64 finalizer, to derive independent hashes from existing ones.
+
+    :param hashes: np.array of uint64
+    :param seed: int, different seeds give independent outputs
+    :return: np.array of uint64
+    """
+    with np.errstate(over='ignore'):
+        hashes = np.asarray(hashes, dtype=np.uint64) + _GOLDEN * np.uint64(seed + 1)
+        hashes = (hashes ^ (hashes >> np.uint64(30))) * _MIX_1
+        hashes = (hashes ^ (hashes >> np.uint64(27))) * _MIX_2
+
+    return hashes ^ (hashes >> np.uint64(31))
@@ -1,37 +1,65 @@
 from __future__ import unicode_literals, print_function
 
-import operator
-
 import numpy as np
+import scipy.sparse
 
-from datadez.columns import get_multi_label_occurrence
+from datadez.columnar import MultiLabelColumn
 
 
-def multilabel_intersection_matrix(df, column_name):
+def multilabel_intersection_matrix(df, column_name, dtype=int, sparse=False, top_k=None, other_label='other'):
     """
     Read a multilabel column, output the label intersection matrix:
     For every pair of label, we compute the number of sample where
     these two are both present.
 
-    :param df: input dataframe
+    The matrix is computed as X.T * X, X being the (sample, label) sparse
+    matrix holding how many times each label appears in each sample.
+
+    With top_k, only the k most frequent labels are kept, the others being
+    merged into a last 'other' label: the matrix size is bounded whatever
+    the number of labels of the column. 'other' counts samples holding any
+    merged label.
+
+    :param df: input dataframe (or any mapping of columns, MultiLabelColumn included)
     :param column_name: colmun to look for (should contain an iterable)
-    :return: np.array of shape (label count, label count)
+    :param dtype: dtype of the output matrix
+    :param sparse: If True, return a scipy.sparse CSR matrix instead of a np.array
+    :param top_k: If set, number of labels to keep, less frequent ones are merged
+    :param other_label: name of the label less frequent labels are merged into
+    :return: labels sorted by decreasing occurrence, np.array of shape (label count, label count)
     """
-    # First, get labels occurrence
-    occurrences, _ = get_multi_label_occurrence(df[column_name])
+    column = df[column_name]
+    if not isinstance(column, MultiLabelColumn):
+        column = MultiLabelColumn.from_series(column)
+
+    # First, get labels occurrence, and sort labels by decreasing occurrence
+    occurrences = column.occurrences()
+    order = np.argsort(-occurrences, kind='mergesort')
+    label_ids = np.empty_like(order)
+    label_ids[order] = np.arange(len(order))
+
+    labels = column.labels[order].tolist()
+
+    merged = top_k is not None and len(labels) > top_k
+    if merged:
+        label_ids = np.minimum(label_ids, top_k)
+        labels = labels[:top_k] + [other_label]
 
-    labels = sorted(occurrences.items(), key=operator.itemgetter(1), reverse=True)
-    label_to_id = {label[0]: i for i, label in enumerate(labels)}
-    labels = [label[0] for label in labels]
+    # Build the (sample, label) indicator matrix
+    # (offsets are copied, summing duplicates rewrites indptr in place)
+    indicator = scipy.sparse.csr_matrix((np.ones(len(column.codes), dtype=dtype),
+                                         label_ids[column.codes],
+                                         column.offsets.copy()),
+                                        shape=(len(column), len(labels)))
+    indicator.sum_duplicates()
 
-    intersection_matrix = np.zeros((len(labels), len(labels)), dtype=int)
+    if merged:
+        # A sample holds 'other' once, whatever the number of its merged labels
+        indicator.data[indicator.indices == top_k] = 1
 
-    for sample in df[column_name]:
-        for label_1 in sample:
-            label_1_id = label_to_id[label_1]
-            for label_2 in sample:
-                label_2_id = label_to_id[label_2]
+    intersection_matrix = indicator.T.tocsr().dot(indicator)
 
-                intersection_matrix[label_1_id][label_2_id] += 1
+    if not sparse:
+        intersection_matrix = intersection_matrix.toarray()
 
     return labels, intersection_matrix
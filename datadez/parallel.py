@@ -0,0 +1,156 @@
+from __future__ import unicode_literals, print_function
+
+import multiprocessing
+import sys
+
+from collections import deque
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
+
+PROCESS_BACKEND = 'process'
+THREAD_BACKEND = 'thread'
+
+# Objects shared with the workers of the running pool (see map_jobs)
+_shared = {}
+
+
+def effective_n_jobs(n_jobs):
+    """
+    Number of workers to use: n_jobs < 0 means 'all CPUs but (-n_jobs - 1)'.
+    """
+    if n_jobs is None:
+        return 1
+    elif n_jobs < 0:
+        return max(multiprocessing.cpu_count() + 1 + n_jobs, 1)
+
+    return max(n_jobs, 1)
+
+
+def shares_memory(backend):
+    """
+    :return: True if workers of backend read the objects of the current process
+        without them being pickled: threads, or processes started by fork
+    """
+    if backend == THREAD_BACKEND:
+        return True
+
+    get_start_method = getattr(multiprocessing, 'get_start_method', None)
+    if get_start_method is None:  # Python 2
+        return sys.platform != 'win32'
+
+    return get_start_method() == 'fork'
+
+
+def get_shared(name):
+    """
+    :return: object shared with the workers under name (see map_jobs)
+    """
+    return _shared[name]
+
+
+def _set_shared(shared):
+    _shared.clear()
+    _shared.update(shared)
+
+
+@contextmanager
+def _sharing(shared):
+    # Objects shared with the current process: run in it, or by its threads
+    if shared is None:
+        yield
+        return
+
+    previous = dict(_shared)
+    _set_shared(shared)
+    try:
+        yield
+    finally:
+        _set_shared(previous)
+
+
+def _make_pool(n_jobs, backend, shared=None):
+    if backend == PROCESS_BACKEND:
+        # Worker processes get shared objects once, when they start
+        initializer, initargs = (_set_shared, (shared,)) if shared is not None else (None, ())
+        return multiprocessing.Pool(n_jobs, initializer, initargs)
+    elif backend == THREAD_BACKEND:
+        return ThreadPool(n_jobs)
+
+    raise ValueError("Unknown backend '%s', expecting '%s' or '%s'" % (backend, PROCESS_BACKEND, THREAD_BACKEND))
+
+
+def map_jobs(function, iterable, n_jobs=1, backend=PROCESS_BACKEND, shared=None):
+    """
+    Ordered map of a function over some items, in a pool of workers.
+
+    With the process backend, function must be picklable (defined at module
+    level), as well as the items and the results.
+
+    Objects every item needs (a whole dataset, a label dictionary...) are best
+    given as shared: they are sent once per worker, when it starts, instead of
+    once per item, and not pickled at all by forked processes (see shares_memory).
+    function reads them with get_shared.
+
+    :param function: function to apply
+    :param iterable: items
+    :param n_jobs: number of workers, 1 to run in the current process, -1 for all CPUs
+    :param backend: 'process' or 'thread'
+    :param shared: dict name -> object, objects shared with the workers
+    :return: list of results, in items order
+    """
+    items = list(iterable)
+    n_jobs = min(effective_n_jobs(n_jobs), len(items))
+
+    if n_jobs <= 1:
+        with _sharing(shared):
+            return [function(item) for item in items]
+
+    pool = _make_pool(n_jobs, backend, shared)
+    try:
+        with _sharing(shared if backend == THREAD_BACKEND else None):
+            return pool.map(function, items, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def imap_jobs(function, iterable, n_jobs=1, backend=PROCESS_BACKEND, max_pending=None, shared=None):
+    """
+    Lazy and ordered map of a function over some items, in a pool of workers.
+
+    Unlike map_jobs, items are read from iterable as results are consumed:
+    at most max_pending items are held at once, so items can be chunks of a
+    dataset bigger than memory.
+
+    :param function: function to apply
+    :param iterable: items
+    :param n_jobs: number of workers, 1 to run in the current process, -1 for all CPUs
+    :param backend: 'process' or 'thread'
+    :param max_pending: max number of items sent to workers and not consumed yet, default to 2 * n_jobs
+    :param shared: dict name -> object, objects shared with the workers (see map_jobs)
+    :return: generator of results, in items order
+    """
+    n_jobs = effective_n_jobs(n_jobs)
+
+    if n_jobs <= 1:
+        with _sharing(shared):
+            for item in iterable:
+                yield function(item)
+        return
+
+    max_pending = max_pending or 2 * n_jobs
+    pending = deque()
+
+    pool = _make_pool(n_jobs, backend, shared)
+    try:
+        with _sharing(shared if backend == THREAD_BACKEND else None):
+            for item in iterable:
+                pending.append(pool.apply_async(function, (item,)))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().get()
+
+            while pending:
+                yield pending.popleft().get()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,238 @@
+from __future__ import unicode_literals, print_function
+
+import json
+import os
+import threading
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+# Callbacks called with every finished stage event
+_subscribers = []
+
+# Stack of the running stages of every thread
+_local = threading.local()
+
+
+def subscribe(callback):
+    """
+    Call callback(event) every time a stage ends. An event is a dict with keys
+    name, column, start, duration (seconds), pid, thread, counts (rows, labels...)
+    and peak_bytes (None unless tracemalloc is tracing).
+
+    :param callback: function taking an event dict
+    :return: callback
+    """
+    _subscribers.append(callback)
+    return callback
+
+
+def unsubscribe(callback):
+    _subscribers.remove(callback)
+
+
+def is_enabled():
+    return bool(_subscribers)
+
+
+class _NullStage(object):
+    """
+    What stage returns when nobody is subscribed: does nothing.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set(self, **counts):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def _memory_tracing():
+    return tracemalloc is not None and hasattr(tracemalloc, 'reset_peak') and tracemalloc.is_tracing()
+
+
+class _Stage(object):
+    def __init__(self, name, column, counts):
+        self.name = name
+        self.column = column
+        self.counts = counts
+        self.start = None
+        self.start_bytes = None
+        self.peak = 0
+
+    def set(self, **counts):
+        """
+        Record some counts (rows, labels...) of the stage.
+        """
+        self.counts.update(counts)
+
+    def __enter__(self):
+        stack = _local.__dict__.setdefault('stack', [])
+
+        if _memory_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # The peak is about to be reset: running stages keep what they have seen so far
+            for running_stage in stack:
+                running_stage.peak = max(running_stage.peak, peak)
+            tracemalloc.reset_peak()
+            self.start_bytes = current
+
+        stack.append(self)
+        self.start = timeit.default_timer()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = timeit.default_timer() - self.start
+        _local.stack.pop()
+
+        peak_bytes = None
+        if self.start_bytes is not None and _memory_tracing():
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            peak_bytes = self.peak - self.start_bytes
+            if _local.stack:
+                _local.stack[-1].peak = max(_local.stack[-1].peak, self.peak)
+
+        event = {
+            'name': self.name,
+            'column': self.column,
+            'start': self.start,
+            'duration': duration,
+            'pid': os.getpid(),
+            'thread': threading.current_thread().ident,
+            'counts': self.counts,
+            'peak_bytes': peak_bytes,
+        }
+        for callback in list(_subscribers):
+            callback(event)
+
+        return False
+
+
+def stage(name, column=None, **counts):
+    """
+    Context manager timing a stage of a datadez call, for subscribers:
+        with stage('detect_type', column='B', rows=len(dataset)) as current_stage:
+            ...
+            current_stage.set(labels=label_count)
+
+    When nobody is subscribed, nothing is measured.
+
+    Stages run in worker processes (n_jobs > 1 with the process backend) are
+    not reported, stages run in worker threads are.
+
+    :param name: stage name
+    :param column: column the stage works on, if any
+    :param counts: counts of the stage (rows, labels...)
+    """
+    if not _subscribers:
+        return _NULL_STAGE
+
+    return _Stage(name, column, counts)
+
+
+class Profiler(object):
+    """
+    Collect the stages of the datadez calls made inside a with block:
+        with Profiler(memory=True) as profiler:
+            summarize(dataset)
+        profiler.save_chrome_trace('summarize.trace.json')
+    """
+
+    def __init__(self, memory=False):
+        """
+        :param memory: If True, trace allocations to get the peak allocated bytes of
+            every stage (slows down pure Python code, needs Python >= 3.9)
+        """
+        self.memory = memory
+        self.events = []
+        self.start = None
+        self._started_tracing = False
+
+    def record(self, event):
+        self.events.append(event)
+
+    def __enter__(self):
+        if self.memory and tracemalloc is not None and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        self.start = timeit.default_timer()
+        subscribe(self.record)
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        unsubscribe(self.record)
+
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+        return False
+
+    def totals(self):
+        """
+        :return: dict stage name -> {'calls', 'seconds'}, time spent in every kind of stage
+        """
+        totals = {}
+        for event in self.events:
+            total = totals.setdefault(event['name'], {'calls': 0, 'seconds': 0.})
+            total['calls'] += 1
+            total['seconds'] += event['duration']
+
+        return totals
+
+    def to_dict(self):
+        """
+        :return: JSON serializable dict of events (start relative to the profiler start) and totals
+        """
+        events = []
+        for event in self.events:
+            event = dict(event)
+            event['start'] -= self.start
+            events.append(event)
+
+        return {'events': events, 'totals': self.totals()}
+
+    def to_chrome_trace(self):
+        """
+        :return: dict in Chrome trace event format, to open in chrome://tracing or Perfetto
+        """
+        trace_events = []
+        for event in self.events:
+            args = dict(event['counts'])
+            if event['column'] is not None:
+                args['column'] = event['column']
+            if event['peak_bytes'] is not None:
+                args['peak_bytes'] = event['peak_bytes']
+
+            trace_events.append({
+                'name': event['name'] if event['column'] is None else '%s %s' % (event['name'], event['column']),
+                'cat': 'datadez',
+                'ph': 'X',
+                'ts': 1e6 * (event['start'] - self.start),
+                'dur': 1e6 * event['duration'],
+                'pid': event['pid'],
+                'tid': event['thread'],
+                'args': args,
+            })
+
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def save_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+
+    def save_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
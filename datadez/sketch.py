@@ -0,0 +1,185 @@
+from __future__ import unicode_literals, print_function
+
+import numpy as np
+import pandas as pd
+
+from datadez.hashing import hash_labels
+
+_LOW_32_BITS = np.uint64(0xFFFFFFFF)
+
+
+def _bit_length(values):
+    # Exact for uint64: both 32 bits halves are exactly represented as float64
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & _LOW_32_BITS).astype(np.float64)
+
+    high_length = 33 + np.floor(np.log2(np.maximum(high, 1)))
+    low_length = 1 + np.floor(np.log2(np.maximum(low, 1)))
+
+    return np.where(high > 0, high_length, np.where(low > 0, low_length, 0)).astype(np.int64)
+
+
+class HyperLogLog(object):
+    """
+    Distinct count estimate in fixed memory (2 ** precision one byte registers).
+    """
+
+    def __init__(self, relative_error=0.01):
+        """
+        :param relative_error: wanted standard error of the estimate, relative to the distinct count
+        """
+        precision = int(np.ceil(np.log2((1.04 / relative_error) ** 2)))
+        self.precision = min(max(precision, 4), 18)
+        self.registers = np.zeros(2 ** self.precision, dtype=np.uint8)
+
+    @property
+    def relative_error(self):
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def update(self, hashes):
+        """
+        :param hashes: np.array of uint64 hashes of the seen items
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        precision = np.uint64(self.precision)
+
+        # First bits select a register, the rank of the first 1 bit of the others is recorded
+        registers = (hashes >> (np.uint64(64) - precision)).astype(np.intp)
+        ranks = 64 - _bit_length((hashes << precision) >> precision) - self.precision + 1
+
+        np.maximum.at(self.registers, registers, ranks.astype(np.uint8))
+
+        return self
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Can't merge HyperLogLog of different precisions")
+
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2. ** -self.registers.astype(np.float64))
+
+        # Small range correction: linear counting
+        empty_registers = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and empty_registers:
+            estimate = m * np.log(float(m) / empty_registers)
+
+        return estimate
+
+
+class SpaceSaving(object):
+    """
+    Heavy hitters in fixed memory: the `capacity` most frequent labels are monitored.
+
+    Monitored counts overestimate the real ones by at most their error, which
+    is itself bounded by total / capacity. Summaries are mergeable.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.errors = pd.Series(dtype=np.int64)
+        self.total = 0
+        self.evicted = False
+
+    @property
+    def exact(self):
+        return not self.evicted
+
+    @property
+    def floor(self):
+        # Upper bound of the count of any label not monitored
+        return int(self.counts.min()) if self.evicted else 0
+
+    @property
+    def error_bound(self):
+        return float(self.total) / self.capacity if self.evicted else 0.
+
+    def update(self, labels, counts):
+        """
+        :param labels: distinct labels of a batch
+        :param counts: exact count of every label of the batch
+        """
+        batch = pd.Series(np.asarray(counts, dtype=np.int64), index=labels)
+        self._merge(batch, pd.Series(0, index=batch.index, dtype=np.int64), 0, int(batch.sum()))
+
+        return self
+
+    def merge(self, other):
+        self._merge(other.counts, other.errors, other.floor, other.total)
+        self.evicted = self.evicted or other.evicted
+
+        return self
+
+    def _merge(self, counts, errors, floor, total):
+        labels = self.counts.index.union(counts.index, sort=False)
+
+        merged_counts = self.counts.reindex(labels, fill_value=self.floor) + counts.reindex(labels, fill_value=floor)
+        merged_errors = self.errors.reindex(labels, fill_value=self.floor) + errors.reindex(labels, fill_value=floor)
+
+        if len(merged_counts) > self.capacity:
+            merged_counts = merged_counts.nlargest(self.capacity)
+            merged_errors = merged_errors.reindex(merged_counts.index)
+            self.evicted = True
+
+        self.counts = merged_counts
+        self.errors = merged_errors
+        self.total += total
+
+    def top(self, n=None):
+        """
+        :param n: number of labels to return, every monitored one by default
+        :return: pd.Series of estimated counts, sorted by decreasing count
+        """
+        counts = self.counts.sort_values(ascending=False)
+        return counts if n is None else counts.iloc[:n]
+
+
+class LabelSketch(object):
+    """
+    Distinct count and heavy hitters of a label stream, in fixed memory.
+    """
+
+    def __init__(self, distinct_error=0.01, occurrence_error=0.001):
+        """
+        :param distinct_error: relative standard error of the distinct label count
+        :param occurrence_error: max overestimation of heavy hitters counts, relative to the stream length
+        """
+        self.distinct = HyperLogLog(distinct_error)
+        self.heavy_hitters = SpaceSaving(int(np.ceil(1. / occurrence_error)))
+
+    @property
+    def total(self):
+        return self.heavy_hitters.total
+
+    def update(self, labels, counts):
+        """
+        :param labels: distinct labels of a batch
+        :param counts: exact count of every label of the batch
+        """
+        self.distinct.update(hash_labels(labels))
+        self.heavy_hitters.update(labels, counts)
+
+        return self
+
+    def update_column(self, column, batch_size=65536):
+        """
+        Feed a mono-label column (null values included) batch by batch.
+        """
+        for start in range(0, len(column), batch_size):
+            occurrences = column.iloc[start:start + batch_size].value_counts(dropna=False)
+            occurrences = occurrences[occurrences > 0]
+            self.update(occurrences.index, occurrences.values)
+
+        return self
+
+    def merge(self, other):
+        self.distinct.merge(other.distinct)
+        self.heavy_hitters.merge(other.heavy_hitters)
+
+        return self
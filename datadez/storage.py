@@ -0,0 +1,175 @@
+from __future__ import unicode_literals, print_function
+
+import json
+import os
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse
+
+from datadez.vectorize import SparseVectors
+
+CSR_FORMAT = 'csr'
+DENSE_FORMAT = 'dense'
+
+METADATA_FILE = 'matrix.json'
+
+# Dense counterpart of SparseVectors, whose matrix may be a np.memmap
+DenseVectors = namedtuple('DenseVectors', ['matrix', 'columns'])
+
+_INT32_MAX = np.iinfo(np.int32).max
+
+
+def _index_dtype(max_value):
+    return np.int32 if max_value <= _INT32_MAX else np.int64
+
+
+def _columns_to_json(columns):
+    return [list(column) if isinstance(column, tuple) else column for column in columns]
+
+
+def _columns_from_json(columns):
+    if columns and all(isinstance(column, list) for column in columns):
+        return pd.MultiIndex.from_tuples([tuple(column) for column in columns])
+
+    return pd.Index(columns)
+
+
+class MatrixWriter(object):
+    """
+    Write a matrix to disk chunk of rows by chunk of rows, as raw binary files
+    that can be memory-mapped when reading it back (see load_matrix):
+      - csr format: data.bin, indices.bin and indptr.bin arrays of a CSR matrix,
+      - dense format: matrix.bin, rows in C order.
+    A matrix.json file holds the shape, dtypes and column names.
+
+    Only the current chunk is held in memory.
+    """
+
+    def __init__(self, directory, columns, file_format=CSR_FORMAT, dtype=np.float64):
+        """
+        :param directory: output directory, created if needed
+        :param columns: column names (pd.Index or pd.MultiIndex)
+        :param file_format: 'csr' or 'dense'
+        :param dtype: dtype of the values
+        """
+        if file_format not in (CSR_FORMAT, DENSE_FORMAT):
+            raise ValueError("Unknown format '%s', expecting '%s' or '%s'" % (file_format, CSR_FORMAT, DENSE_FORMAT))
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.directory = directory
+        self.columns = columns
+        self.file_format = file_format
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self.nnz = 0
+
+        # indptr is written as int64, and narrowed on close if the matrix is small enough
+        self.indices_dtype = np.dtype(_index_dtype(len(columns)))
+        self.indptr_dtype = np.dtype(np.int64)
+
+        self._files = {}
+        names = ['data', 'indices', 'indptr'] if file_format == CSR_FORMAT else ['matrix']
+        for name in names:
+            self._files[name] = open(os.path.join(directory, name + '.bin'), 'wb')
+
+        if file_format == CSR_FORMAT:
+            np.zeros(1, dtype=self.indptr_dtype).tofile(self._files['indptr'])
+
+    def write(self, matrix):
+        """
+        :param matrix: next rows, a sparse matrix or a 2D array of len(columns) columns
+        """
+        if matrix.shape[1] != len(self.columns):
+            raise ValueError("Expecting %d columns, got %d" % (len(self.columns), matrix.shape[1]))
+
+        if self.file_format == DENSE_FORMAT:
+            matrix = matrix.toarray() if scipy.sparse.issparse(matrix) else matrix
+            np.ascontiguousarray(matrix, dtype=self.dtype).tofile(self._files['matrix'])
+        else:
+            matrix = scipy.sparse.csr_matrix(matrix)
+            matrix.sum_duplicates()
+
+            matrix.data.astype(self.dtype, copy=False).tofile(self._files['data'])
+            matrix.indices.astype(self.indices_dtype, copy=False).tofile(self._files['indices'])
+            (matrix.indptr[1:] + self.nnz).astype(self.indptr_dtype).tofile(self._files['indptr'])
+            self.nnz += matrix.nnz
+
+        self.rows += matrix.shape[0]
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+        if self.file_format == CSR_FORMAT and self.indices_dtype == np.int32 and self.nnz <= _INT32_MAX:
+            # Same index dtypes as scipy would pick, so the loaded arrays are not copied
+            path = os.path.join(self.directory, 'indptr.bin')
+            np.fromfile(path, dtype=self.indptr_dtype).astype(np.int32).tofile(path)
+            self.indptr_dtype = np.dtype(np.int32)
+
+        metadata = {
+            'format': self.file_format,
+            'shape': [self.rows, len(self.columns)],
+            'dtype': self.dtype.str,
+            'columns': _columns_to_json(self.columns),
+        }
+        if self.file_format == CSR_FORMAT:
+            metadata.update({
+                'nnz': self.nnz,
+                'indices_dtype': self.indices_dtype.str,
+                'indptr_dtype': self.indptr_dtype.str,
+            })
+
+        with open(os.path.join(self.directory, METADATA_FILE), 'w') as f:
+            json.dump(metadata, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # No metadata: a partly written matrix can't be loaded
+            for f in self._files.values():
+                f.close()
+
+        return False
+
+
+def _read_array(directory, name, dtype, shape, mmap_mode):
+    path = os.path.join(directory, name + '.bin')
+
+    # np.memmap can't map empty files
+    if mmap_mode is None or not np.prod(shape):
+        return np.fromfile(path, dtype=dtype).reshape(shape)
+
+    return np.memmap(path, dtype=dtype, mode=mmap_mode, shape=shape)
+
+
+def load_matrix(directory, mmap_mode='r'):
+    """
+    Load a matrix written by a MatrixWriter.
+
+    :param directory: directory the matrix was written to
+    :param mmap_mode: np.memmap mode ('r', 'r+', 'c'), None to read it in memory
+    :return: SparseVectors (CSR matrix on top of the mapped arrays) or DenseVectors
+    """
+    with open(os.path.join(directory, METADATA_FILE)) as f:
+        metadata = json.load(f)
+
+    shape = tuple(metadata['shape'])
+    columns = _columns_from_json(metadata['columns'])
+
+    if metadata['format'] == DENSE_FORMAT:
+        return DenseVectors(_read_array(directory, 'matrix', metadata['dtype'], shape, mmap_mode), columns)
+
+    data = _read_array(directory, 'data', metadata['dtype'], (metadata['nnz'],), mmap_mode)
+    indices = _read_array(directory, 'indices', metadata['indices_dtype'], (metadata['nnz'],), mmap_mode)
+    indptr = _read_array(directory, 'indptr', metadata['indptr_dtype'], (shape[0] + 1,), mmap_mode)
+
+    return SparseVectors(scipy.sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False), columns)
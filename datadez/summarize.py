@@ -1,7 +1,24 @@
 from __future__ import unicode_literals, print_function
 
+import numpy as np
+import pandas as pd
+
+from datadez.accumulators import MonoLabelAccumulator
+from datadez.accumulators import MultiLabelAccumulator
+from datadez.accumulators import NumericAccumulator
 from datadez.columns import NUMERIC_TYPE, MONO_LABEL_TYPE, MULTI_LABEL_TYPE
 from datadez.columns import detect_column_type
+from datadez.columns import get_column_type
+from datadez.columns import pack_column
+from datadez.files import CSV_FORMAT
+from datadez.files import DEFAULT_CHUNK_SIZE
+from datadez.files import read_chunks
+from datadez.parallel import PROCESS_BACKEND
+from datadez.parallel import effective_n_jobs
+from datadez.parallel import get_shared
+from datadez.parallel import map_jobs
+from datadez.parallel import shares_memory
+from datadez.profiling import stage
 from datadez.summary import mono_label_summary
 from datadez.summary import multi_label_summary
 from datadez.summary import numeric_summary
@@ -12,18 +29,204 @@ COLUMN_TYPE_SUMMARIZER = {
     MULTI_LABEL_TYPE: multi_label_summary,
 }
 
+COLUMN_TYPE_ACCUMULATOR = {
+    NUMERIC_TYPE: NumericAccumulator,
+    MONO_LABEL_TYPE: MonoLabelAccumulator,
+    MULTI_LABEL_TYPE: MultiLabelAccumulator,
+}
+
+
+def _summarize_column(task):
+    column_type, column_name, column, ordered = task
+
+    if column_type in COLUMN_TYPE_SUMMARIZER.keys():
+        if column is None:
+            column = get_shared('dataset')[column_name]
+        with stage('summarize_column', column.name, rows=len(column)):
+            if column_type == MULTI_LABEL_TYPE:
+                return multi_label_summary(column, ordered=ordered)
+            return COLUMN_TYPE_SUMMARIZER[column_type](column)
+
+    return None
+
+
+def summarize(dataset, schema=None, n_jobs=1, backend=PROCESS_BACKEND, ordered=False):
+    """
+    Summarize every column of a dataset.
+
+    Columns are independent, they can be summarized by a pool of workers.
+    Results do not depend on the number of workers.
+
+    Threads and forked worker processes read the columns of the dataset
+    directly. Other worker processes are sent packed columns (see pack_column),
+    cheaper to pickle than Python objects.
+
+    :param dataset: dataset to summarize
+    :param schema: column types (see infer_schema), detected if not given
+    :param n_jobs: number of workers, -1 for all CPUs
+    :param backend: 'process' or 'thread' pool of workers
+    :param ordered: If True, ['A', 'B'] and ['B', 'A'] are different partitions of multi-label columns
 
-def summarize(dataset):
-    summaries = {}
+    :return: dict of column summaries
+    """
+    pack = effective_n_jobs(n_jobs) > 1 and not shares_memory(backend)
 
-    for column in dataset:
-        column_type = detect_column_type(dataset[column])
+    columns = list(dataset)
+    with stage('summarize', rows=len(dataset), columns=len(columns)):
+        tasks = []
+        for column in columns:
+            column_type = get_column_type(dataset, column, schema)
 
-        if column_type in COLUMN_TYPE_SUMMARIZER.keys():
-            summary = COLUMN_TYPE_SUMMARIZER[column_type](dataset[column])
+            if pack and column_type in COLUMN_TYPE_SUMMARIZER.keys():
+                with stage('pack', column, rows=len(dataset)):
+                    tasks.append((column_type, column, pack_column(dataset[column], column_type), ordered))
+            else:
+                tasks.append((column_type, column, None, ordered))
+
+        summaries = map_jobs(_summarize_column, tasks, n_jobs=n_jobs, backend=backend,
+                             shared={'dataset': dataset} if not pack else None)
+
+    return dict(zip(columns, summaries))
+
+
+class IncrementalSummary(object):
+    """
+    Dataset summary kept up to date as rows are appended or removed.
+
+    Every column has an accumulator (see datadez.accumulators): updating or
+    retracting rows costs time proportional to these rows, and summary
+    returns the same dict as summarize on the current rows.
+
+    Column types are detected on the first rows where the column is not empty.
+    Until then, the null entries of the column are only counted, and they are
+    given to its accumulator once its type is known.
+    """
+
+    def __init__(self, schema=None, ordered=False):
+        """
+        :param schema: column types (see infer_schema), detected if not given
+        :param ordered: If True, ['A', 'B'] and ['B', 'A'] are different partitions of multi-label columns
+        """
+        self.schema = schema
+        self.ordered = ordered
+        self.column_types = {}
+        self.accumulators = {}
+
+        # column -> null entries seen before its type is detected
+        self._pending_nulls = {}
+
+    def _detect(self, rows, column):
+        if self.schema is not None and column in self.schema:
+            self.column_types[column] = self.schema[column]
+        elif len(rows):
+            self.column_types[column] = detect_column_type(rows[column])
         else:
-            summary = None
+            self.column_types[column] = None
+
+        accumulator_cls = COLUMN_TYPE_ACCUMULATOR.get(self.column_types[column])
+        if accumulator_cls is not None:
+            if self.column_types[column] == MULTI_LABEL_TYPE:
+                self.accumulators[column] = accumulator_cls(ordered=self.ordered)
+            else:
+                self.accumulators[column] = accumulator_cls()
+
+            null_count = self._pending_nulls.pop(column, 0)
+            if null_count:
+                self.accumulators[column].update(pd.Series(np.full(null_count, np.nan, dtype=object)))
+
+    def _count_nulls(self, rows, column, sign):
+        null_count = self._pending_nulls.get(column, 0) + sign * int(rows[column].isnull().sum())
+        if null_count < 0:
+            raise ValueError("Can't retract null entries of column '%s' more than they have been counted" % column)
+
+        self._pending_nulls[column] = null_count
+
+    def update(self, rows):
+        """
+        :param rows: dataframe of new rows
+        :return: self
+        """
+        for column in rows:
+            if self.column_types.get(column) is None:
+                self._detect(rows, column)
+
+            if column in self.accumulators:
+                self.accumulators[column].update(rows[column])
+            elif self.column_types[column] is None:
+                self._count_nulls(rows, column, 1)
+
+        return self
+
+    def retract(self, rows):
+        """
+        :param rows: dataframe of rows, previously given to update, that have been removed
+        :return: self
+        """
+        for column in rows:
+            if column in self.accumulators:
+                self.accumulators[column].retract(rows[column])
+            elif self.column_types.get(column) is None:
+                self._count_nulls(rows, column, -1)
+
+        return self
+
+    def summary(self):
+        """
+        :return: dict of column summaries
+        """
+        summaries = {}
+        for column in self.column_types:
+            accumulator = self.accumulators.get(column)
+            summaries[column] = accumulator.summary() if accumulator is not None else None
+
+        return summaries
+
+
+def summarize_chunks(chunks, schema=None, ordered=False):
+    """
+    Summarize a dataset given as an iterable of dataframes, without holding it in memory.
+
+    Every chunk updates mergeable per-column accumulators, that are turned into
+    the same summaries as the ones computed by summarize. A column empty in the
+    first chunks gets its type from the first chunk where it is not, and its
+    null entries of the previous chunks are counted.
+
+    :param chunks: iterable of dataframes, sharing the same columns
+    :param schema: column types (see infer_schema), detected if not given
+    :param ordered: If True, ['A', 'B'] and ['B', 'A'] are different partitions of multi-label columns
+
+    :return: dict of column summaries
+    """
+    incremental_summary = IncrementalSummary(schema, ordered=ordered)
+
+    for chunk in chunks:
+        incremental_summary.update(chunk)
+
+    return incremental_summary.summary()
+
+
+def summarize_csv(path, chunksize=DEFAULT_CHUNK_SIZE, schema=None, multi_label_columns=None, label_separator='|',
+                  ordered=False, **kwargs):
+    """
+    Summarize a CSV file chunk by chunk.
+
+    Labels of multi-label cells are joined with label_separator (see
+    datadez.files.flatten_multi_label).
+
+    :param path: path of the CSV file
+    :param chunksize: number of rows read at once
+    :param schema: column types (see infer_schema), detected if not given
+    :param multi_label_columns: multi-label columns, default to the multi-label columns of schema
+    :param label_separator: separator of the labels of multi-label cells
+    :param ordered: If True, ['A', 'B'] and ['B', 'A'] are different partitions of multi-label columns
+    :param kwargs: any other pd.read_csv parameter (converters, usecols, ...)
+
+    :return: dict of column summaries
+    """
+    if multi_label_columns is None:
+        multi_label_columns = [column for column, column_type in (schema or {}).items()
+                               if column_type == MULTI_LABEL_TYPE]
 
-        summaries[column] = summary
+    chunks = read_chunks(path, chunksize, multi_label_columns, label_separator, file_format=CSV_FORMAT, **kwargs)
 
-    return summaries
+    return summarize_chunks(chunks, schema=schema, ordered=ordered)
@@ -4,12 +4,18 @@ from __future__ import unicode_literals, print_function
 from builtins import dict
 
 import numpy as np
+import pandas as pd
 
+from datadez.columnar import MultiLabelColumn
 from datadez.columns import MONO_LABEL_TYPE
 from datadez.columns import MULTI_LABEL_TYPE
 from datadez.columns import NUMERIC_TYPE
 from datadez.columns import get_mono_label_occurrence
 from datadez.columns import get_multi_label_occurrence
+from datadez.profiling import stage
+from datadez.sketch import LabelSketch
+
+APPROXIMATE_BATCH_SIZE = 65536
 
 
 def numeric_summary(column):
@@ -23,17 +29,20 @@ def numeric_summary(column):
     }
 
 
-def mono_label_summary(column):
-    label_occurrences = get_mono_label_occurrence(column).to_dict()
-    occurrences = [v for v in label_occurrences.values()]
+def occurrence_summary(occurrences):
+    """
+    Stats about label occurrences, shared by mono-label and multi-label summaries.
+
+    :param occurrences: occurrence of every label
+    :return: dict of stats
+    """
     max_count = max(occurrences)
     min_count = min(occurrences)
     mean_count = np.mean(occurrences)
     std_count = np.std(occurrences)
 
     return {
-        'column_type': MONO_LABEL_TYPE,
-        'labels': len(label_occurrences),
+        'labels': len(occurrences),
         'occurrence_max': max_count,
         'occurrence_min': min_count,
         'occurrence_mean': mean_count,
@@ -42,31 +51,167 @@ def mono_label_summary(column):
     }
 
 
-def multi_label_summary(column):
-    occurrences, cardinalities = get_multi_label_occurrence(column)
+def approximate_occurrence_summary(sketch):
+    """
+    Same stats as occurrence_summary, estimated from a LabelSketch.
+
+    When the sketch had to evict labels, the label count comes from its distinct
+    count estimate, the std dev assumes labels out of the heavy hitters are evenly
+    spread, and occurrence_min falls back to its lower bound (1). The error bounds
+    are reported under the 'approximation' key.
+
+    :param sketch: LabelSketch
+    :return: dict of stats
+    """
+    heavy_hitters = sketch.heavy_hitters
+    counts = heavy_hitters.counts.values
+
+    if heavy_hitters.exact:
+        summary = occurrence_summary(counts)
+    else:
+        labels = max(sketch.distinct.estimate(), len(counts))
+        mean_count = float(sketch.total) / labels
+
+        tail_total = max(sketch.total - counts.sum(), 0)
+        tail_labels = max(labels - len(counts), 1)
+        second_moment = np.sum(counts.astype(np.float64) ** 2) + float(tail_total) ** 2 / tail_labels
+
+        max_count = counts.max()
+        min_count = 1
+
+        summary = {
+            'labels': int(round(labels)),
+            'occurrence_max': max_count,
+            'occurrence_min': min_count,
+            'occurrence_mean': mean_count,
+            'occurrence_std_dev': np.sqrt(max(second_moment / labels - mean_count ** 2, 0.)),
+            'imbalance_ratio': max_count / min_count,
+        }
+
+    summary['approximation'] = {
+        'exact': heavy_hitters.exact,
+        'labels_relative_error': 0. if heavy_hitters.exact else sketch.distinct.relative_error,
+        'occurrence_error': heavy_hitters.error_bound,
+    }
+
+    return summary
+
+
+def mono_label_summary(column, approximate=False, distinct_error=0.01, occurrence_error=0.001):
+    """
+    :param column: mono-label column
+    :param approximate: If True, compute stats in fixed memory from sketches
+    :param distinct_error: (approximate mode) relative standard error of the label count
+    :param occurrence_error: (approximate mode) max error on occurrences, relative to the column length
+    :return: dict of stats
+    """
+    summary = {'column_type': MONO_LABEL_TYPE}
+
+    if approximate:
+        with stage('count_occurrences', column.name, rows=len(column)) as current_stage:
+            sketch = LabelSketch(distinct_error, occurrence_error)
+            sketch.update_column(column, batch_size=APPROXIMATE_BATCH_SIZE)
+            current_stage.set(labels=len(sketch.heavy_hitters.counts))
+        summary.update(approximate_occurrence_summary(sketch))
+    else:
+        with stage('count_occurrences', column.name, rows=len(column)) as current_stage:
+            label_occurrences = get_mono_label_occurrence(column).to_dict()
+            current_stage.set(labels=len(label_occurrences))
+        occurrences = [v for v in label_occurrences.values()]
+        summary.update(occurrence_summary(occurrences))
+
+    return summary
+
+
+def _approximate_multi_label_summary(column, ordered, distinct_error, occurrence_error):
+    labels = LabelSketch(distinct_error, occurrence_error)
+    partitions = LabelSketch(distinct_error, occurrence_error)
+    cardinality_count, cardinality_sum, cardinality_squares = 0, 0., 0.
+
+    for start in range(0, len(column), APPROXIMATE_BATCH_SIZE):
+        if isinstance(column, MultiLabelColumn):
+            batch = column.slice(start, start + APPROXIMATE_BATCH_SIZE)
+        else:
+            batch = MultiLabelColumn.from_series(column.iloc[start:start + APPROXIMATE_BATCH_SIZE])
+
+        occurrences = batch.occurrences()
+        labels.update(batch.labels[occurrences > 0], occurrences[occurrences > 0])
+        partitions.update_column(pd.Series(batch.partition_keys(ordered)))
+
+        cardinalities = batch.cardinalities().astype(np.float64)
+        cardinality_count += len(cardinalities)
+        cardinality_sum += cardinalities.sum()
+        cardinality_squares += np.sum(cardinalities ** 2)
+
+    mean_cardinality = cardinality_sum / cardinality_count
+    std_cardinality = np.sqrt(max(cardinality_squares / cardinality_count - mean_cardinality ** 2, 0.))
+
+    summary = {'column_type': MULTI_LABEL_TYPE}
+    summary.update(approximate_occurrence_summary(labels))
+    summary.update({
+        'cardinality_mean': mean_cardinality,
+        'cardinality_std_dev': std_cardinality,
+        'partitions': approximate_occurrence_summary(partitions)
+    })
+
+    return summary
+
+
+def partition_occurrence(column, ordered=False):
+    """
+    Occurrence of every partition (set of labels found together in a row).
+
+    :param column: multi-label column (series of lists or MultiLabelColumn)
+    :param ordered: If True, ['A', 'B'] and ['B', 'A'] are different partitions
+    :return: pd.Series of occurrences, indexed by partition key
+    """
+    if not isinstance(column, MultiLabelColumn):
+        column = MultiLabelColumn.from_series(column)
+
+    return pd.Series(column.partition_keys(ordered)).value_counts()
+
+
+def multi_label_summary(column, approximate=False, distinct_error=0.01, occurrence_error=0.001, ordered=False):
+    """
+    Partitions stats consider each set of labels found together in a row as
+    a label of its own.
+
+    :param column: multi-label column (series of lists or MultiLabelColumn)
+    :param approximate: If True, compute label and partition stats in fixed memory from sketches
+    :param distinct_error: (approximate mode) relative standard error of label and partition counts
+    :param occurrence_error: (approximate mode) max error on occurrences, relative to the stream length
+    :param ordered: If True, ['A', 'B'] and ['B', 'A'] are different partitions
+    :return: dict of stats
+    """
+    if approximate:
+        with stage('count_occurrences', column.name, rows=len(column)):
+            return _approximate_multi_label_summary(column, ordered, distinct_error, occurrence_error)
+
+    if not isinstance(column, MultiLabelColumn):
+        with stage('pack', column.name, rows=len(column)):
+            column = MultiLabelColumn.from_series(column)
+
+    with stage('count_occurrences', column.name, rows=len(column)) as current_stage:
+        occurrences, cardinalities = get_multi_label_occurrence(column)
+        current_stage.set(labels=len(occurrences))
     occurrences = [v for v in occurrences.to_dict().values()]
-    max_count = max(occurrences)
-    min_count = min(occurrences)
-    mean_count = np.mean(occurrences)
-    std_count = np.std(occurrences)
 
     mean_cardinality = np.mean(cardinalities)
     std_cardinality = np.std(cardinalities)
 
-    # Get some stats on label grouping, considering the column
-    # as a mono-label column
-    subset_summary = mono_label_summary(column.astype(str))
-    del (subset_summary['column_type'])
+    # Get some stats on label grouping, considering every set of labels
+    # as a label of a mono-label column
+    with stage('count_partitions', column.name, rows=len(column)) as current_stage:
+        partitions = partition_occurrence(column, ordered)
+        current_stage.set(labels=len(partitions))
+    subset_summary = occurrence_summary(partitions.values)
 
-    return {
-        'column_type': MULTI_LABEL_TYPE,
-        'labels': len(occurrences),
-        'occurrence_max': max_count,
-        'occurrence_min': min_count,
-        'occurrence_mean': mean_count,
-        'occurrence_std_dev': std_count,
-        'imbalance_ratio': max_count / min_count,
+    summary = {'column_type': MULTI_LABEL_TYPE}
+    summary.update(occurrence_summary(occurrences))
+    summary.update({
         'cardinality_mean': mean_cardinality,
         'cardinality_std_dev': std_cardinality,
         'partitions': subset_summary
-    }
+    })
+
+    return summary
@@ -0,0 +1,322 @@
+from __future__ import unicode_literals, print_function
+
+import os
+import string
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from datadez.columnar import MultiLabelColumn
+from datadez.columns import MONO_LABEL_TYPE
+from datadez.columns import MULTI_LABEL_TYPE
+from datadez.columns import NUMERIC_TYPE
+from datadez.columns import TEXT_TYPE
+from datadez.files import CSV_FORMAT
+from datadez.files import PARQUET_FORMAT
+from datadez.files import flatten_multi_label
+
+ZIPF_DISTRIBUTION = 'zipf'
+UNIFORM_DISTRIBUTION = 'uniform'
+
+POISSON_LENGTH = 'poisson'
+GEOMETRIC_LENGTH = 'geometric'
+UNIFORM_LENGTH = 'uniform'
+
+DEFAULT_COLUMNS = OrderedDict([
+    ('numeric', {'type': NUMERIC_TYPE}),
+    ('mono-label', {'type': MONO_LABEL_TYPE, 'label_count': 100}),
+    ('multi-label', {'type': MULTI_LABEL_TYPE, 'label_count': 1000, 'list_length': 3}),
+    ('text', {'type': TEXT_TYPE, 'vocabulary_size': 1000, 'words_per_row': 8}),
+])
+
+
+def label_probabilities(label_count, distribution=ZIPF_DISTRIBUTION, exponent=1.1):
+    """
+    Probability of every label, most frequent first.
+
+    :param label_count: number of distinct labels
+    :param distribution: 'zipf' (frequency of the k-th label proportional to 1 / k ** exponent),
+        'uniform', or an array of label weights
+    :param exponent: exponent of the zipf distribution
+    :return: np.array of probabilities, summing to 1
+    """
+    if distribution == ZIPF_DISTRIBUTION:
+        weights = 1. / np.arange(1, label_count + 1) ** exponent
+    elif distribution == UNIFORM_DISTRIBUTION:
+        weights = np.ones(label_count)
+    elif isinstance(distribution, (list, tuple, np.ndarray)):
+        weights = np.asarray(distribution, dtype=float)
+        if len(weights) != label_count:
+            raise ValueError("Expecting %d label weights, got %d" % (label_count, len(weights)))
+    else:
+        raise ValueError("Unknown label distribution '%s'" % distribution)
+
+    return weights / weights.sum()
+
+
+def _object_array(values):
+    return np.asarray(values, dtype=object)
+
+
+def make_labels(label_count, prefix='label_'):
+    return np.array(['%s%d' % (prefix, i) for i in range(label_count)], dtype=object)
+
+
+def _null_mask(rows, null_rate, random_state):
+    if not null_rate:
+        return None
+    return random_state.random_sample(rows) < null_rate
+
+
+def _list_lengths(rows, list_length, length_distribution, max_length, random_state):
+    if length_distribution == POISSON_LENGTH:
+        lengths = random_state.poisson(list_length, rows)
+    elif length_distribution == GEOMETRIC_LENGTH:
+        # Skewed lengths: many short lists, a few long ones
+        lengths = random_state.geometric(1. / (list_length + 1), rows) - 1
+    elif length_distribution == UNIFORM_LENGTH:
+        lengths = random_state.randint(0, 2 * list_length + 1, rows)
+    else:
+        raise ValueError("Unknown list length distribution '%s'" % length_distribution)
+
+    if max_length is not None:
+        lengths = np.minimum(lengths, max_length)
+
+    return lengths
+
+
+def _unique_per_row(rows, codes):
+    """
+    :return: boolean mask of the first occurrence of every code inside its row
+    """
+    order = np.lexsort((np.arange(len(codes)), codes, rows))
+    duplicated = np.zeros(len(codes), dtype=bool)
+    duplicated[order[1:]] = (rows[order[1:]] == rows[order[:-1]]) & (codes[order[1:]] == codes[order[:-1]])
+
+    return ~duplicated
+
+
+def numeric_column(rows, random_state, mean=0., std=1., null_rate=0.):
+    """
+    :return: np.array of normally distributed floats
+    """
+    values = random_state.normal(mean, std, rows)
+
+    nulls = _null_mask(rows, null_rate, random_state)
+    if nulls is not None:
+        values[nulls] = np.nan
+
+    return values
+
+
+def mono_label_column(rows, random_state, label_count=100, distribution=ZIPF_DISTRIBUTION, exponent=1.1,
+                      null_rate=0., labels=None):
+    """
+    :param labels: label names, most frequent first (default to make_labels(label_count))
+    :return: np.array of labels (object)
+    """
+    labels = make_labels(label_count) if labels is None else _object_array(labels)
+    codes = random_state.choice(len(labels), rows, p=label_probabilities(len(labels), distribution, exponent))
+    values = labels[codes]
+
+    nulls = _null_mask(rows, null_rate, random_state)
+    if nulls is not None:
+        values[nulls] = np.nan
+
+    return values
+
+
+def multi_label_column(rows, random_state, label_count=1000, distribution=ZIPF_DISTRIBUTION, exponent=1.1,
+                       list_length=3, length_distribution=POISSON_LENGTH, max_length=None, null_rate=0.,
+                       labels=None):
+    """
+    Labels of a row are distinct, and null rows are empty.
+
+    :param list_length: mean list length, before duplicate labels of a row are dropped
+    :param length_distribution: 'poisson', 'geometric' (skewed) or 'uniform'
+    :param max_length: upper bound of list lengths
+    :param labels: label names, most frequent first (default to make_labels(label_count))
+    :return: MultiLabelColumn
+    """
+    labels = make_labels(label_count) if labels is None else _object_array(labels)
+    lengths = _list_lengths(rows, list_length, length_distribution, max_length, random_state)
+
+    nulls = _null_mask(rows, null_rate, random_state)
+    if nulls is not None:
+        lengths[nulls] = 0
+
+    row_of_entries = np.repeat(np.arange(rows), lengths)
+    codes = random_state.choice(len(labels), len(row_of_entries), p=label_probabilities(len(labels), distribution,
+                                                                                          exponent))
+
+    kept = _unique_per_row(row_of_entries, codes)
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(row_of_entries[kept], minlength=rows))])
+
+    return MultiLabelColumn(offsets, codes[kept], labels)
+
+
+def make_vocabulary(vocabulary_size, random_state, min_length=2, max_length=10):
+    """
+    :return: np.array of distinct lowercase words
+    """
+    letters = np.array(list(string.ascii_lowercase))
+    words = set()
+
+    while len(words) < vocabulary_size:
+        for length in random_state.randint(min_length, max_length + 1, vocabulary_size - len(words)):
+            words.add(''.join(letters[random_state.randint(len(letters), size=length)]))
+
+    # Sorted first for reproducibility, then shuffled: frequency rank is unrelated to spelling
+    return random_state.permutation(np.array(sorted(words), dtype=object))
+
+
+def text_column(rows, random_state, vocabulary_size=1000, distribution=ZIPF_DISTRIBUTION, exponent=1.1,
+                words_per_row=8, null_rate=0., vocabulary=None):
+    """
+    :param words_per_row: mean word count of a row (at least one word)
+    :param vocabulary: words, most frequent first (default to make_vocabulary(vocabulary_size))
+    :return: np.array of space separated words (object)
+    """
+    vocabulary = make_vocabulary(vocabulary_size, random_state) if vocabulary is None else _object_array(vocabulary)
+    lengths = 1 + random_state.poisson(max(words_per_row - 1, 0), rows)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+    words = vocabulary[random_state.choice(len(vocabulary), offsets[-1],
+                                           p=label_probabilities(len(vocabulary), distribution, exponent))]
+
+    # Every word but the last one of its row is followed by a space
+    separators = np.full(len(words), ' ', dtype=object)
+    separators[offsets[1:] - 1] = ''
+    values = np.add.reduceat(words + separators, offsets[:-1]) if rows else np.array([], dtype=object)
+
+    nulls = _null_mask(rows, null_rate, random_state)
+    if nulls is not None:
+        values[nulls] = np.nan
+
+    return values
+
+
+COLUMN_TYPE_GENERATOR = {
+    NUMERIC_TYPE: numeric_column,
+    MONO_LABEL_TYPE: mono_label_column,
+    MULTI_LABEL_TYPE: multi_label_column,
+    TEXT_TYPE: text_column,
+}
+
+
+def _resolve_columns(columns, seed):
+    """
+    Draw what must be shared by every chunk (text vocabularies) once.
+    """
+    resolved = OrderedDict()
+
+    for column_name, spec in columns.items():
+        spec = dict(spec)
+        if spec['type'] not in COLUMN_TYPE_GENERATOR:
+            raise ValueError("Unknown column type '%s' for column '%s'" % (spec['type'], column_name))
+
+        if spec['type'] == TEXT_TYPE and spec.get('vocabulary') is None:
+            random_state = np.random.RandomState(seed)
+            spec['vocabulary'] = make_vocabulary(spec.pop('vocabulary_size', 1000), random_state)
+        resolved[column_name] = spec
+
+    return resolved
+
+
+def _make_dataframe(rows, columns, random_state, start=0, columnar=False):
+    data = OrderedDict()
+
+    for column_name, spec in columns.items():
+        spec = dict(spec)
+        values = COLUMN_TYPE_GENERATOR[spec.pop('type')](rows, random_state, **spec)
+
+        if isinstance(values, MultiLabelColumn):
+            values.index = pd.RangeIndex(start, start + rows)
+            values.name = column_name
+            if not columnar:
+                values = values.to_series()
+
+        data[column_name] = values
+
+    if columnar:
+        return data
+
+    return pd.DataFrame(data, index=pd.RangeIndex(start, start + rows), columns=list(columns))
+
+
+def make_dataset(rows, columns=None, seed=None, columnar=False):
+    """
+    Synthetic dataset, sampled by batch with numpy.
+
+    Columns are described by a dict, column name -> spec. A spec is a dict with a
+    'type' key (numeric, mono-label, multi-label or text), other keys being
+    parameters of the matching numeric_column, mono_label_column,
+    multi_label_column or text_column function:
+        {'tags': {'type': 'multi-label', 'label_count': 10000, 'exponent': 1.2,
+                  'list_length': 5, 'length_distribution': 'geometric', 'null_rate': 0.1}}
+
+    :param rows: row count
+    :param columns: column specs, DEFAULT_COLUMNS by default
+    :param seed: random seed
+    :param columnar: If True, return a dict of columns, multi-label ones being MultiLabelColumn
+    :return: pd.DataFrame (or dict of columns)
+    """
+    columns = _resolve_columns(DEFAULT_COLUMNS if columns is None else columns, seed)
+
+    return _make_dataframe(rows, columns, np.random.RandomState(seed), columnar=columnar)
+
+
+def iter_chunks(rows, chunksize, columns=None, seed=0):
+    """
+    Same as make_dataset, chunk by chunk: the dataset never has to fit in memory.
+    Every chunk gets its own random stream, and its index follows the previous chunk one.
+
+    :return: generator of pd.DataFrame
+    """
+    columns = _resolve_columns(DEFAULT_COLUMNS if columns is None else columns, seed)
+
+    for chunk_number, start in enumerate(range(0, rows, chunksize)):
+        random_state = np.random.RandomState([seed, chunk_number])
+        yield _make_dataframe(min(chunksize, rows - start), columns, random_state, start=start)
+
+
+def write_chunks(directory, rows, chunksize, columns=None, seed=0, file_format=CSV_FORMAT, label_separator='|'):
+    """
+    Write a synthetic dataset as one file per chunk: part-00000.csv, part-00001.csv...
+
+    In CSV files, labels of multi-label cells are joined with label_separator,
+    they can be read back with:
+        pd.read_csv(path, converters={column_name: lambda cell: cell.split('|') if cell else []})
+
+    :param directory: output directory, created if needed
+    :param rows: total row count
+    :param chunksize: row count of every file
+    :param columns: column specs, see make_dataset
+    :param seed: random seed
+    :param file_format: 'csv' or 'parquet' (needs pyarrow or fastparquet)
+    :param label_separator: (csv) separator of the labels of multi-label cells
+    :return: list of written file paths
+    """
+    if file_format not in (CSV_FORMAT, PARQUET_FORMAT):
+        raise ValueError("Unknown file format '%s', expecting '%s' or '%s'" % (file_format, CSV_FORMAT,
+                                                                             PARQUET_FORMAT))
+
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    columns = _resolve_columns(DEFAULT_COLUMNS if columns is None else columns, seed)
+    paths = []
+
+    for chunk_number, chunk in enumerate(iter_chunks(rows, chunksize, columns, seed)):
+        path = os.path.join(directory, 'part-%05d.%s' % (chunk_number, file_format))
+
+        if file_format == CSV_FORMAT:
+            multi_label_columns = [name for name, spec in columns.items() if spec['type'] == MULTI_LABEL_TYPE]
+            flatten_multi_label(chunk, multi_label_columns, label_separator).to_csv(path, index=False)
+        else:
+            chunk.to_parquet(path, index=False)
+        paths.append(path)
+
+    return paths
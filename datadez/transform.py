@@ -2,14 +2,39 @@ from __future__ import unicode_literals, print_function
 
 # Python 2 and 3 compatibility
 from builtins import dict
+from past.builtins import basestring
+
+import itertools
+import json
+import numbers
+import os
+import re
+
+from collections import Counter
 
 import nltk
 
+import numpy as np
 import pandas as pd
+import scipy.sparse
+
+from sklearn.feature_extraction.text import CountVectorizer
 
-from datadez.columns import detect_column_type
+from datadez.columnar import MultiLabelColumn
+from datadez.columns import get_column_type
+from datadez.columns import pack_column
 from datadez.columns import NUMERIC_TYPE, MONO_LABEL_TYPE, MULTI_LABEL_TYPE, TEXT_TYPE
 
+from datadez.parallel import PROCESS_BACKEND
+from datadez.parallel import effective_n_jobs
+from datadez.parallel import get_shared
+from datadez.parallel import map_jobs
+from datadez.parallel import shares_memory
+from datadez.profiling import stage
+from datadez.storage import CSR_FORMAT
+from datadez.storage import MatrixWriter
+from datadez.storage import load_matrix
+from datadez.vectorize import SparseVectors
 from datadez.vectorize import vectorize_text
 from datadez.vectorize import vectorize_mono_label
 from datadez.vectorize import vectorize_multi_label
@@ -22,62 +47,620 @@ COLUMN_VECTORIZER = {
 }
 
 
-def tokenize(dataset, column):
+REGEX_TOKENIZER = 'regex'
+NLTK_TOKENIZER = 'nltk'
+
+# Words, and punctuation signs on their own
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+TOKENIZE_CHUNK_SIZE = 10000
+
+
+def _regex_tokenize(text):
+    return TOKEN_PATTERN.findall(text)
+
+
+TOKENIZERS = {
+    REGEX_TOKENIZER: _regex_tokenize,
+    NLTK_TOKENIZER: nltk.word_tokenize,
+}
+
+
+def _tokenize_chunk(task):
+    tokenizer, texts = task
+    tokenizer = TOKENIZERS.get(tokenizer, tokenizer)
+
+    return [tokenizer(text) for text in texts]
+
+
+def _tokenize_distinct(column, tokenizer, n_jobs, chunksize):
+    """
+    :return: code of the distinct text of every row (null entries get the last code),
+        tokens of every distinct text (the last one, for null entries, being empty)
+    """
+    codes, texts = pd.factorize(column)
+
+    tasks = [(tokenizer, texts[start:start + chunksize].tolist()) for start in range(0, len(texts), chunksize)]
+    tokens = [text_tokens for chunk in map_jobs(_tokenize_chunk, tasks, n_jobs=n_jobs, backend=PROCESS_BACKEND)
+              for text_tokens in chunk]
+
+    return np.where(codes < 0, len(texts), codes), tokens + [[]]
+
+
+def tokenize_column(column, tokenizer=NLTK_TOKENIZER, n_jobs=1, chunksize=TOKENIZE_CHUNK_SIZE):
+    """
+    Tokenize a text column, every distinct text being tokenized once.
+    Null entries get no token.
+
+    :param column: text column
+    :param tokenizer: 'nltk' (nltk.word_tokenize), 'regex' (words and punctuation signs, several
+        times faster, but contractions are split differently: "don't" gives 'don', "'", 't'),
+        or a function text -> list of tokens (defined at module level if n_jobs > 1)
+    :param n_jobs: number of worker processes tokenizing distinct texts, -1 for all CPUs
+    :param chunksize: number of distinct texts sent at once to a worker
+    :return: MultiLabelColumn of tokens
+    """
+    codes, tokens = _tokenize_distinct(column, tokenizer, n_jobs, chunksize)
+
+    tokenized = MultiLabelColumn.from_series(pd.Series(tokens, dtype=object)).take(codes, index=column.index)
+    tokenized.name = column.name
+
+    return tokenized
+
+
+def tokenize(dataset, column, tokenizer=NLTK_TOKENIZER, n_jobs=1, chunksize=TOKENIZE_CHUNK_SIZE):
     """
     Text column to list of words column (multi-label like).
 
     :param dataset: dataset where data are stored
     :param column: which column should be tokenized
+    :param tokenizer: 'nltk', 'regex' or a function text -> list of tokens, see tokenize_column
+    :param n_jobs: number of worker processes, -1 for all CPUs
+    :param chunksize: number of distinct texts sent at once to a worker
 
     :return: modified dataset
     """
-    dataset[column] = dataset[column].apply(lambda row: nltk.word_tokenize(row[column]), axis=1)
+    codes, tokens = _tokenize_distinct(dataset[column], tokenizer, n_jobs, chunksize)
+
+    # One new list per row, copied from the tokens of its distinct text
+    dataset[column] = pd.Series([list(tokens[code]) for code in codes.tolist()], index=dataset.index, dtype=object)
 
     return dataset
 
 
-def vectorize_dataset(dataset):
+def _vectorize_column(task):
+    column_type, column_name, column, sparse, hashing = task
+    if column is None:
+        column = get_shared('dataset')[column_name]
+
+    # Hashers read columnar multi-label columns as they are
+    if isinstance(column, MultiLabelColumn) and not hashing:
+        column = column.to_series()
+
+    with stage('fit_transform', column.name, rows=len(column)) as current_stage:
+        vectorizer_fn = COLUMN_VECTORIZER[column_type]
+        if vectorizer_fn is not None:
+            vectorized_column, vectorizer = vectorizer_fn(column, sparse=sparse, **hashing)
+        elif sparse:
+            values = np.asarray(column, dtype=float).reshape(-1, 1)
+            vectorized_column, vectorizer = SparseVectors(scipy.sparse.csr_matrix(values), pd.Index(["value"])), None
+        else:
+            vectorized_column, vectorizer = pd.DataFrame({"value": np.asarray(column)}), None
+
+        current_stage.set(labels=len(vectorized_column.columns))
+
+    return vectorized_column, vectorizer
+
+
+def vectorize_dataset(dataset, sparse=False, schema=None, n_jobs=1, n_features=None, alternate_sign=True,
+                      top_tokens=0):
     """
     Fully vectorize a dataset (text, mono-label and multi-label columns).
 
+    In sparse mode, every column is kept as a CSR matrix and the result is a
+    SparseVectors whose matrix is the column-wise concatenation of those
+    matrices, and whose columns is the (column, sub-label) MultiIndex the dense
+    mode would have built.
+
+    Columns are vectorized independently, possibly by a pool of worker processes,
+    and written side by side into a single preallocated output (in dense mode,
+    an array of the common dtype of the vectorized columns). Forked worker
+    processes read the columns of the dataset directly, others are sent packed
+    columns (see pack_column).
+
+    In hashing mode (n_features set), words and labels of every column are
+    hashed to n_features columns (see TokenHasher): nothing is fitted, and
+    chunks of a dataset vectorized separately get the same output columns.
+
     :param dataset: dataset to vectorize
+    :param sparse: If True, return a SparseVectors instead of a dataframe
+    :param schema: column types (see infer_schema), detected if not given
+    :param n_jobs: number of worker processes, -1 for all CPUs
+    :param n_features: If set, hashing mode, number of output columns of every non numeric column
+    :param alternate_sign: hashing mode, if True half of the tokens count negatively
+    :param top_tokens: hashing mode, number of most frequent tokens every hasher records
 
     :return: vectorized dataset, vectorizers
     """
-    series = {}
-    vectorizers = {}
+    pack = effective_n_jobs(n_jobs) > 1 and not shares_memory(PROCESS_BACKEND)
 
-    # Vectorize on column at a time
-    for column in dataset.columns:
-        column_type = detect_column_type(dataset[column])
+    hashing = {}
+    if n_features is not None:
+        hashing = {'n_features': n_features, 'alternate_sign': alternate_sign, 'top_tokens': top_tokens}
 
-        vectorizer_fn = COLUMN_VECTORIZER[column_type]
-        if vectorizer_fn is not None:
-            vectorized_columns, vectorizer = vectorizer_fn(dataset[column])
+    columns = list(dataset.columns)
+    with stage('vectorize_dataset', rows=len(dataset), columns=len(columns)):
+        tasks = []
+        for column in columns:
+            column_type = get_column_type(dataset, column, schema)
+            if column_type not in COLUMN_VECTORIZER:
+                raise NotImplementedError("Can't vectorize column '%s' of type %s" % (column, column_type))
 
-            series[column] = vectorized_columns
-            vectorizers[column] = vectorizer
-        else:
-            series[column] = dataset[column].to_frame()
-            vectorizers[column] = None
+            column_hashing = hashing if column_type != NUMERIC_TYPE else {}
+            if pack:
+                with stage('pack', column, rows=len(dataset)):
+                    packed_column = pack_column(dataset[column], column_type)
+                tasks.append((column_type, column, packed_column, sparse, column_hashing))
+            else:
+                tasks.append((column_type, column, None, sparse, column_hashing))
 
-    # Put everything back together
-    output_dataset = None
-    for column in series.keys():
-        vectorized_columns = series[column]
-        vectorizer = vectorizers[column]
+        results = map_jobs(_vectorize_column, tasks, n_jobs=n_jobs, shared={'dataset': dataset} if not pack else None)
 
-        if vectorizer is not None:
-            sub_index = vectorized_columns.columns
-        else:
-            sub_index = ["value"]
+        series = [vectorized_columns for vectorized_columns, _ in results]
+        vectorizers = {column: vectorizer for column, (_, vectorizer) in zip(columns, results)}
 
-        # Add one level of index
-        vectorized_columns.columns = pd.MultiIndex.from_product([[column], sub_index])
+        # Vectorized columns are only referenced by series: they are released as they are assembled
+        del results
+        with stage('assembly', rows=len(dataset), columns=len(columns)):
+            # Put everything back together, adding one level of index
+            output_columns = _output_columns(columns, series)
+            if sparse:
+                series = [vectorized_columns.matrix for vectorized_columns in series]
+                return SparseVectors(_hstack_csr(series, len(dataset)), output_columns), vectorizers
 
-        if output_dataset is not None:
-            output_dataset = output_dataset.join(vectorized_columns)
-        else:
-            output_dataset = vectorized_columns
+            output_dataset = _stack_dense(series, len(dataset), dataset.index, output_columns)
 
     return output_dataset, vectorizers
+
+
+def _output_columns(columns, series):
+    # (column, sub-label) MultiIndex, whose first level keeps the order of columns
+    widths = [len(vectorized_columns.columns) for vectorized_columns in series]
+    sub_labels = [sub_label for vectorized_columns in series for sub_label in vectorized_columns.columns]
+    sub_label_codes, sub_label_levels = pd.factorize(pd.Index(sub_labels, dtype=object))
+
+    return pd.MultiIndex(levels=[pd.Index(columns, dtype=object), sub_label_levels],
+                         codes=[np.repeat(np.arange(len(columns)), widths), sub_label_codes])
+
+
+def _stack_dense(frames, rows, index, columns):
+    """
+    Write frames side by side into a single preallocated array, of their common dtype.
+    Frames are released (removed from the list) as soon as they are written.
+    """
+    dtype = np.result_type(*[frame.values.dtype for frame in frames]) if frames else np.float64
+    values = np.empty((rows, len(columns)), dtype=dtype, order='F')
+
+    start = 0
+    for i in range(len(frames)):
+        width = frames[i].shape[1]
+        values[:, start:start + width] = frames[i].values
+        frames[i] = None
+        start += width
+
+    return pd.DataFrame(values, index=index, columns=columns, copy=False)
+
+
+def _hstack_csr(matrices, rows):
+    """
+    Column-wise concatenation of CSR matrices, written into preallocated
+    data, indices and indptr arrays (scipy.sparse.hstack goes through
+    intermediate copies). Matrices are released (removed from the list) as
+    soon as they are written.
+    """
+    row_nnz = np.zeros(rows, dtype=np.int64)
+    for matrix in matrices:
+        row_nnz += np.diff(matrix.indptr)
+    indptr = np.concatenate([[0], np.cumsum(row_nnz)])
+
+    width = sum(matrix.shape[1] for matrix in matrices)
+    index_dtype = np.int32 if max(indptr[-1], width) <= np.iinfo(np.int32).max else np.int64
+    dtype = np.result_type(*[matrix.dtype for matrix in matrices]) if matrices else np.float64
+
+    data = np.empty(indptr[-1], dtype=dtype)
+    indices = np.empty(indptr[-1], dtype=index_dtype)
+
+    # Next free position of every row, and first column of the current matrix
+    row_starts = indptr[:-1].copy()
+    start = 0
+    for i in range(len(matrices)):
+        matrix = matrices[i]
+        matrix_row_nnz = np.diff(matrix.indptr)
+        positions = np.repeat(row_starts - matrix.indptr[:-1], matrix_row_nnz) + np.arange(matrix.nnz)
+
+        data[positions] = matrix.data
+        indices[positions] = matrix.indices + start
+
+        row_starts += matrix_row_nnz
+        start += matrix.shape[1]
+        matrices[i] = None
+
+    return scipy.sparse.csr_matrix((data, indices, indptr.astype(index_dtype)), shape=(rows, width), copy=False)
+
+
+def _indicator_matrix(row_codes, offsets, width):
+    # Binary (row, code) matrix, entries with a negative code are skipped
+    known = row_codes >= 0
+    kept_before = np.concatenate([[0], np.cumsum(known)])
+
+    matrix = scipy.sparse.csr_matrix((np.ones(np.count_nonzero(known), dtype=np.int64),
+                                      row_codes[known],
+                                      kept_before[offsets]),
+                                     shape=(len(offsets) - 1, width))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+
+    return matrix
+
+
+class DatasetVectorizer(object):
+    """
+    Fit once, transform many: vectorize datasets with the column types and
+    vocabularies learnt on a reference dataset, so every batch gets the
+    same output columns.
+
+    Labels unseen at fit time are either ignored (no column set for them)
+    or raise a ValueError. Unseen words of text columns are always ignored.
+
+    Mono-label columns get one indicator column per label, two-label columns
+    included, as in vectorize_dataset.
+    """
+
+    HANDLE_UNKNOWN = ('ignore', 'error')
+
+    def __init__(self, sparse=False, handle_unknown='ignore', min_df=1, max_df=1.0, binary=False):
+        """
+        :param sparse: If True, transform returns a SparseVectors instead of a dataframe
+        :param handle_unknown: 'ignore' or 'error', what to do with labels unseen at fit time
+        :param min_df: text columns min_df, see vectorize_text
+        :param max_df: text columns max_df, see vectorize_text
+        :param binary: text columns binary, see vectorize_text
+        """
+        if handle_unknown not in self.HANDLE_UNKNOWN:
+            raise ValueError("handle_unknown should be one of %s" % (self.HANDLE_UNKNOWN,))
+
+        self.sparse = sparse
+        self.handle_unknown = handle_unknown
+        self.min_df = min_df
+        self.max_df = max_df
+        self.binary = binary
+
+        self.columns_ = None
+        self.schema_ = None
+        self.vocabularies_ = None
+        self._indexes = None
+
+        # partial_fit state: rows seen, column -> labels seen, or document frequency of words
+        self._fit_rows = 0
+        self._seen = None
+        self._stale = False
+
+    def _text_vectorizer(self, vocabulary=None):
+        # Text columns are split into words by this vectorizer, at fit and transform time
+        return CountVectorizer(vocabulary=vocabulary, binary=self.binary)
+
+    def _set_vocabularies(self, columns, schema, vocabularies):
+        self.columns_ = columns
+        self.schema_ = schema
+        self.vocabularies_ = vocabularies
+        self._indexes = {column: pd.Index(vocabulary) for column, vocabulary in vocabularies.items()
+                         if vocabulary is not None}
+
+    def _update_seen(self, column, column_type, seen):
+        if column_type == NUMERIC_TYPE:
+            return
+        elif column_type == MONO_LABEL_TYPE:
+            seen.update(column.dropna().unique().tolist())
+        elif column_type == MULTI_LABEL_TYPE:
+            if not isinstance(column, MultiLabelColumn):
+                column = MultiLabelColumn.from_series(column)
+            seen.update(column.labels[column.occurrences() > 0].tolist())
+        elif column_type == TEXT_TYPE:
+            # Document frequency of every word, as the CountVectorizer of transform counts it for min_df / max_df
+            analyzer = self._text_vectorizer().build_analyzer()
+            seen.update(itertools.chain.from_iterable(set(analyzer(text)) for text in column))
+        else:
+            raise NotImplementedError("Can't vectorize column '%s' of type %s" % (column.name, column_type))
+
+    def _vocabulary(self, column_type, seen):
+        if column_type == NUMERIC_TYPE:
+            return None
+        elif column_type != TEXT_TYPE:
+            return sorted(seen)
+
+        min_count = self.min_df if isinstance(self.min_df, numbers.Integral) else self.min_df * self._fit_rows
+        max_count = self.max_df if isinstance(self.max_df, numbers.Integral) else self.max_df * self._fit_rows
+
+        return sorted(word for word, count in seen.items() if min_count <= count <= max_count)
+
+    def _build_vocabularies(self):
+        vocabularies = {column: self._vocabulary(self.schema_[column], self._seen[column]) for column in self.columns_}
+        self._set_vocabularies(self.columns_, self.schema_, vocabularies)
+        self._stale = False
+
+    def partial_fit(self, chunk, schema=None):
+        """
+        Learn column types and vocabularies chunk by chunk, for reference
+        datasets that don't fit in memory: vocabularies are the ones fit
+        would learn on all the chunks. Column types are detected on the first chunk.
+
+        :param chunk: dataframe, next rows of the reference dataset
+        :param schema: column types (see infer_schema), detected if not given
+        :return: self
+        """
+        if self._seen is None:
+            self.columns_ = list(chunk.columns)
+            self.schema_ = {column: get_column_type(chunk, column, schema) for column in self.columns_}
+            self._seen = {column: Counter() if self.schema_[column] == TEXT_TYPE else set()
+                          for column in self.columns_}
+
+        for column in self.columns_:
+            with stage('fit', column, rows=len(chunk)) as current_stage:
+                self._update_seen(chunk[column], self.schema_[column], self._seen[column])
+                current_stage.set(labels=len(self._seen[column]))
+
+        self._fit_rows += len(chunk)
+
+        # Vocabularies are sorted once, when first needed
+        self._stale = True
+
+        return self
+
+    def fit(self, dataset, schema=None):
+        """
+        Learn column types and vocabularies.
+
+        :param dataset: reference dataset
+        :param schema: column types (see infer_schema), detected if not given
+        :return: self
+        """
+        self._fit_rows = 0
+        self._seen = None
+        self.partial_fit(dataset, schema=schema)
+        self._build_vocabularies()
+
+        return self
+
+    @property
+    def output_columns(self):
+        """
+        (column, sub-label) MultiIndex of the vectorized datasets.
+        """
+        self._check_fitted()
+
+        index = []
+        for column in self.columns_:
+            vocabulary = self.vocabularies_[column]
+            index.extend((column, sub_label) for sub_label in (vocabulary if vocabulary is not None else ["value"]))
+
+        return pd.MultiIndex.from_tuples(index)
+
+    @property
+    def is_fitted(self):
+        """
+        True once fit, partial_fit or load has been called.
+        """
+        return self.vocabularies_ is not None or self._stale
+
+    def _check_fitted(self):
+        if self._stale:
+            self._build_vocabularies()
+
+        if not self.is_fitted:
+            raise ValueError("This DatasetVectorizer is not fitted yet, call fit first")
+
+    def _check_unknown(self, column_name, labels, codes):
+        if self.handle_unknown == 'error' and np.any(codes < 0):
+            unknown = pd.Series(labels)[codes < 0]
+            raise ValueError("Unknown labels in column '%s': %s" % (column_name, unknown.unique()[:10].tolist()))
+
+    def _transform_column(self, column_name, column):
+        column_type = self.schema_[column_name]
+
+        if column_type == NUMERIC_TYPE:
+            return scipy.sparse.csr_matrix(np.asarray(column, dtype=float).reshape(-1, 1))
+        elif column_type == MONO_LABEL_TYPE:
+            codes = self._indexes[column_name].get_indexer(column)
+            self._check_unknown(column_name, column[column.notnull()], codes[np.asarray(column.notnull())])
+            return _indicator_matrix(codes, np.arange(len(column) + 1), len(self._indexes[column_name]))
+        elif column_type == MULTI_LABEL_TYPE:
+            if not isinstance(column, MultiLabelColumn):
+                column = MultiLabelColumn.from_series(column)
+            label_codes = self._indexes[column_name].get_indexer(column.labels)
+            self._check_unknown(column_name, column.labels, label_codes)
+            return _indicator_matrix(label_codes[column.codes], column.offsets, len(self._indexes[column_name]))
+        elif column_type == TEXT_TYPE:
+            vectorizer = self._text_vectorizer(vocabulary=self.vocabularies_[column_name])
+            return scipy.sparse.csr_matrix(vectorizer.transform(column))
+
+        raise NotImplementedError("Can't vectorize column '%s' of type %s" % (column_name, column_type))
+
+    def _transform_columns(self, dataset):
+        self._check_fitted()
+
+        matrices = []
+        for column in self.columns_:
+            with stage('transform', column, rows=len(dataset)) as current_stage:
+                matrices.append(self._transform_column(column, dataset[column]))
+                current_stage.set(labels=matrices[-1].shape[1])
+
+        return matrices
+
+    def transform_matrix(self, dataset):
+        """
+        :param dataset: dataset to vectorize
+        :return: CSR matrix of the vectorized dataset, whose columns are output_columns
+        """
+        matrices = self._transform_columns(dataset)
+
+        with stage('assembly', rows=len(dataset), columns=len(self.columns_)):
+            return _hstack_csr(matrices, len(dataset))
+
+    def transform(self, dataset):
+        """
+        Vectorize a dataset having the columns seen at fit time.
+
+        :param dataset: dataset to vectorize
+        :return: vectorized dataset (dataframe, or SparseVectors in sparse mode)
+        """
+        matrices = self._transform_columns(dataset)
+
+        with stage('assembly', rows=len(dataset), columns=len(self.columns_)):
+            matrix = _hstack_csr(matrices, len(dataset))
+
+            if self.sparse:
+                return SparseVectors(matrix, self.output_columns)
+
+            return pd.DataFrame(matrix.toarray(), index=dataset.index, columns=self.output_columns)
+
+    def fit_transform(self, dataset, schema=None):
+        return self.fit(dataset, schema=schema).transform(dataset)
+
+    def save(self, directory):
+        """
+        Save the fitted state (parameters, columns, schema, vocabularies) as
+        JSON. Labels must be strings.
+
+        :param directory: output directory, created if needed
+        """
+        self._check_fitted()
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        for column in self.columns_:
+            vocabulary = self.vocabularies_[column]
+            if vocabulary is not None and not all(isinstance(label, basestring) for label in vocabulary):
+                raise ValueError("Can't save column '%s': only string labels can be saved" % column)
+
+        metadata = {
+            'params': {
+                'sparse': self.sparse,
+                'handle_unknown': self.handle_unknown,
+                'min_df': self.min_df,
+                'max_df': self.max_df,
+                'binary': self.binary,
+            },
+            'columns': self.columns_,
+            'schema': [self.schema_[column] for column in self.columns_],
+            'vocabularies': [self.vocabularies_[column] for column in self.columns_],
+        }
+
+        with open(os.path.join(directory, 'vectorizer.json'), 'w') as f:
+            json.dump(metadata, f)
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Load a vectorizer saved with save.
+
+        :param directory: directory the vectorizer was saved in
+        :return: fitted DatasetVectorizer
+        """
+        with open(os.path.join(directory, 'vectorizer.json')) as f:
+            metadata = json.load(f)
+
+        vectorizer = cls(**metadata['params'])
+
+        # Tuple column names come back from JSON as lists
+        columns = [tuple(column) if isinstance(column, list) else column for column in metadata['columns']]
+        vectorizer._set_vocabularies(columns, dict(zip(columns, metadata['schema'])),
+                                     dict(zip(columns, metadata['vocabularies'])))
+
+        return vectorizer
+
+
+def _chunk_source(chunks, passes):
+    if callable(chunks):
+        return chunks
+    elif passes > 1 and iter(chunks) is chunks:
+        raise ValueError("chunks can only be read once, give a function returning them instead")
+
+    return lambda: chunks
+
+
+def vectorize_to_disk(chunks, directory, vectorizer=None, schema=None, file_format=CSR_FORMAT, dtype=np.float64,
+                      n_features=None, alternate_sign=True, top_tokens=0):
+    """
+    Out-of-core vectorize_dataset: vectorize a dataset given as chunks of rows,
+    straight to files that training jobs can memory-map (see datadez.storage.load_matrix).
+    Only one chunk is held in memory at once.
+
+    Vocabularies are fit in a first pass over the chunks (see DatasetVectorizer.partial_fit),
+    unless a fitted vectorizer is given. In hashing mode (n_features set), there is no fit.
+
+    :param chunks: function returning a new iterable of dataframes every time it is called, like
+        lambda: pd.read_csv(path, chunksize=100000), or a list of dataframes. Any iterable
+        of dataframes if the chunks are read once (hashing mode, fitted vectorizer)
+    :param directory: output directory, created if needed
+    :param vectorizer: fitted DatasetVectorizer, or a DatasetVectorizer (its parameters are
+        used) to fit on chunks, default to DatasetVectorizer()
+    :param schema: column types (see infer_schema), detected on the first chunk if not given
+    :param file_format: 'csr' (data, indices and indptr files) or 'dense' (a row-major matrix file)
+    :param dtype: dtype of the stored values
+    :param n_features: If set, hashing mode, number of output columns of every non numeric column
+    :param alternate_sign: hashing mode, if True half of the tokens count negatively
+    :param top_tokens: hashing mode, number of most frequent tokens every hasher records
+
+    :return: memory-mapped vectors (SparseVectors or DenseVectors), fitted vectorizer
+        (dict column -> merged TokenHasher in hashing mode)
+    """
+    if n_features is not None:
+        return _hash_to_disk(_chunk_source(chunks, passes=1)(), directory, schema, file_format, dtype,
+                             {'n_features': n_features, 'alternate_sign': alternate_sign, 'top_tokens': top_tokens})
+
+    if vectorizer is None:
+        vectorizer = DatasetVectorizer()
+
+    fit = not vectorizer.is_fitted
+    chunks = _chunk_source(chunks, passes=2 if fit else 1)
+
+    if fit:
+        with stage('fit_pass'):
+            for chunk in chunks():
+                vectorizer.partial_fit(chunk, schema=schema)
+
+    with MatrixWriter(directory, vectorizer.output_columns, file_format, dtype) as writer:
+        for chunk in chunks():
+            matrix = vectorizer.transform_matrix(chunk)
+            with stage('write', rows=matrix.shape[0]):
+                writer.write(matrix)
+
+    return load_matrix(directory), vectorizer
+
+
+def _hash_to_disk(chunks, directory, schema, file_format, dtype, hashing):
+    chunks = iter(chunks)
+    chunk = next(chunks, None)
+    if chunk is None:
+        raise ValueError("No chunk to vectorize")
+
+    # Hashed columns are known from the first chunk
+    schema = {column: get_column_type(chunk, column, schema) for column in chunk.columns}
+    vectors, hashers = vectorize_dataset(chunk, sparse=True, schema=schema, **hashing)
+
+    with MatrixWriter(directory, vectors.columns, file_format, dtype) as writer:
+        while True:
+            with stage('write', rows=vectors.matrix.shape[0]):
+                writer.write(vectors.matrix)
+
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+
+            vectors, chunk_hashers = vectorize_dataset(chunk, sparse=True, schema=schema, **hashing)
+            for column, hasher in chunk_hashers.items():
+                if hasher is not None:
+                    hashers[column].merge(hasher)
+
+    return load_matrix(directory), hashers
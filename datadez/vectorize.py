@@ -1,85 +1,285 @@
 from __future__ import unicode_literals, print_function
 
+# Python 2 and 3 compatibility
+from builtins import str
+
+import itertools
 import operator
 
+from collections import Counter
+from collections import namedtuple
+
 import numpy as np
 import pandas as pd
+import scipy.sparse
 
+from sklearn.feature_extraction import FeatureHasher
 from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer
 from sklearn.preprocessing import LabelBinarizer
 from sklearn.preprocessing import MultiLabelBinarizer
 
+from datadez.columnar import MultiLabelColumn
+from datadez.columns import MONO_LABEL_TYPE, MULTI_LABEL_TYPE, TEXT_TYPE
+from datadez.sketch import SpaceSaving
+
+
+# Sparse counterpart of a vectorized dataframe: a CSR matrix and its column index
+SparseVectors = namedtuple('SparseVectors', ['matrix', 'columns'])
+
+HASHING_N_FEATURES = 2 ** 20
+
+# Rows of a text column read at once when counting its words
+_WORD_COUNT_BATCH_SIZE = 65536
+
+
+class TokenHasher(object):
+    """
+    Fit-free vectorizer: every token (word of a text column, label of a label
+    column) is hashed to one of n_features columns, the same whatever the chunk
+    or process it is seen in. Chunks can be vectorized independently, with an
+    output width that does not grow with the corpus.
+
+    Labels are hashed on their string representation.
+
+    The most frequent tokens seen can be recorded, to tell which tokens a
+    hashed column stands for. Records of hashers are mergeable.
+    """
+
+    def __init__(self, column_type=TEXT_TYPE, n_features=HASHING_N_FEATURES, alternate_sign=True, binary=False,
+                 top_tokens=0):
+        """
+        :param column_type: 'text', 'mono-label' or 'multi-label'
+        :param n_features: number of output columns
+        :param alternate_sign: If True, half of the tokens count negatively, so that
+            collisions cancel out on average instead of adding up
+        :param binary: text columns only, if True all non zero counts are set to 1
+        :param top_tokens: number of most frequent tokens to record (0 to record none)
+        """
+        if column_type not in (TEXT_TYPE, MONO_LABEL_TYPE, MULTI_LABEL_TYPE):
+            raise ValueError("Can't hash columns of type %s" % column_type)
+
+        self.column_type = column_type
+        self.n_features = n_features
+        self.alternate_sign = alternate_sign
+        self.binary = binary
+        self.token_counts = SpaceSaving(top_tokens) if top_tokens else None
+
+        self._hasher = FeatureHasher(n_features=n_features, input_type='string', alternate_sign=alternate_sign)
+        self._text_hasher = HashingVectorizer(n_features=n_features, alternate_sign=alternate_sign, binary=binary,
+                                              norm=None)
+
+    def hash_tokens(self, tokens):
+        """
+        :param tokens: tokens (words or labels)
+        :return: output column of every token, sign of every token (1 or -1)
+        """
+        hashed = self._hasher.transform([[str(token)] for token in tokens])
+
+        return hashed.indices, hashed.data
+
+    def _label_column(self, series):
+        if isinstance(series, MultiLabelColumn):
+            return series
+        elif self.column_type == MULTI_LABEL_TYPE:
+            return MultiLabelColumn.from_series(series)
+
+        # Mono-label: one label per row, none for null entries
+        codes, labels = pd.factorize(series)
+        known = codes >= 0
+
+        return MultiLabelColumn(np.concatenate([[0], np.cumsum(known)]), codes[known], labels, index=series.index)
+
+    def _count_words(self, series):
+        analyzer = self._text_hasher.build_analyzer()
+        texts = series.dropna()
+
+        for start in range(0, len(texts), _WORD_COUNT_BATCH_SIZE):
+            batch = texts.iloc[start:start + _WORD_COUNT_BATCH_SIZE]
+            counts = Counter(itertools.chain.from_iterable(analyzer(text) for text in batch))
+            if counts:
+                self.token_counts.update(list(counts.keys()), list(counts.values()))
+
+    def transform(self, series):
+        """
+        :param series: column to vectorize (MultiLabelColumn allowed for multi-label columns)
+        :return: CSR matrix of shape (row count, n_features)
+        """
+        if self.column_type == TEXT_TYPE:
+            if self.token_counts is not None:
+                self._count_words(series)
+            return scipy.sparse.csr_matrix(self._text_hasher.transform(series))
+
+        column = self._label_column(series)
+
+        occurrences = column.occurrences()
+        if self.token_counts is not None and occurrences.any():
+            seen = occurrences > 0
+            self.token_counts.update(column.labels[seen], occurrences[seen])
+
+        # Every distinct label is hashed once
+        features, signs = self.hash_tokens(column.labels)
+        matrix = scipy.sparse.csr_matrix((signs[column.codes], features[column.codes], column.offsets),
+                                         shape=(len(column), self.n_features))
+        matrix.sum_duplicates()
+        matrix.eliminate_zeros()
+
+        return matrix
+
+    def merge(self, other):
+        """
+        Merge the tokens recorded by a hasher of the same parameters.
+        """
+        if (other.n_features, other.alternate_sign) != (self.n_features, self.alternate_sign):
+            raise ValueError("Can't merge TokenHasher of different parameters")
+
+        if self.token_counts is not None and other.token_counts is not None:
+            self.token_counts.merge(other.token_counts)
+
+        return self
 
-def _vectorize(vectorizer, series):
+    def feature_tokens(self):
+        """
+        :return: pd.Series output column -> recorded tokens hashed to it, most frequent first
+        """
+        if self.token_counts is None:
+            raise ValueError("No token recorded, set top_tokens to record some")
+
+        tokens = self.token_counts.top()
+        features, _ = self.hash_tokens(tokens.index)
+
+        return pd.Series(list(tokens.index), index=features, dtype=object).groupby(level=0).agg(list)
+
+
+def _vectorize(vectorizer, series, sparse=False):
     vectorizer.fit(series)
 
     # Vectorize the input
     vector = vectorizer.transform(series)
 
-    try:
-        vector = vector.todense()
-        vector = list(np.squeeze(vector))
-        vector = list(map(lambda x: np.array(x)[0], vector))
-    except AttributeError:
-        pass
+    vocabulary = get_vocabulary(vectorizer)
+
+    if isinstance(vectorizer, LabelBinarizer) and len(vocabulary) == 2:
+        # A LabelBinarizer gives two classes a single column: one indicator column per class instead
+        vector = _densify(vector)
+        vector = np.hstack([1 - vector, vector])
+
+    if vector.shape[1] != len(vocabulary):
+        raise ValueError("Vectorized column has %d columns, but its vocabulary has %d words"
+                         % (vector.shape[1], len(vocabulary)))
+
+    if sparse:
+        return SparseVectors(scipy.sparse.csr_matrix(vector), pd.Index(vocabulary))
+
+    vector = _densify(vector)
+
+    # Encapsulate new columns inside a meta column, and put each word to its own column
+    new_columns = pd.DataFrame(vector)
+    new_columns.columns = pd.Series(vocabulary)
+
+    return new_columns
+
 
+def _hash(hasher, series, sparse=False):
+    matrix = hasher.transform(series)
+    columns = pd.RangeIndex(hasher.n_features)
+
+    if sparse:
+        return SparseVectors(matrix, columns)
+
+    index = series.index if isinstance(series, (pd.Series, MultiLabelColumn)) else None
+    return pd.DataFrame(matrix.toarray(), index=index, columns=columns)
+
+
+def _densify(vector):
+    if scipy.sparse.issparse(vector):
+        return vector.toarray()
+
+    return np.asarray(vector)
+
+
+def get_vocabulary(vectorizer):
     # Get vocabulary, ordered by id
     if hasattr(vectorizer, 'vocabulary_'):
         vocabulary = sorted(vectorizer.vocabulary_.items(), key=operator.itemgetter(1))
         vocabulary = [word[0] for word in vocabulary]
     elif hasattr(vectorizer, 'classes_'):
         vocabulary = vectorizer.classes_
+    elif isinstance(vectorizer, TokenHasher):
+        vocabulary = list(range(vectorizer.n_features))
     else:
-        raise ValueError("Wrong type of vectorizer given! Excepting one with attribute 'vocabulary_' or 'classes_'")
+        raise ValueError("Wrong type of vectorizer given! Excepting one with attribute 'vocabulary_' or 'classes_', "
+                         "or a TokenHasher")
 
-    # Encapsulate new columns inside a meta column, and put each word to its own column
-    new_columns = pd.DataFrame(vector)
-    new_columns.columns = pd.Series(vocabulary)
-
-    return new_columns
+    return vocabulary
 
 
-def vectorize_text(series, min_df=1, max_df=1.0, binary=False):
+def vectorize_text(series, min_df=1, max_df=1.0, binary=False, sparse=False,
+                   n_features=None, alternate_sign=True, top_tokens=0):
     """
     Vectorize a text column.
 
     Tokenization of the input and vectorization is done
-    through a CountVectorizer.
+    through a CountVectorizer, or a HashingVectorizer in hashing mode.
 
     :param series: series to vectorize
-    :param min_df: float in range [0.0, 1.0] or int, default=1
-    :param max_df: float in range [0.0, 1.0] or int, default=1.0
+    :param min_df: float in range [0.0, 1.0] or int, default=1 (ignored in hashing mode)
+    :param max_df: float in range [0.0, 1.0] or int, default=1.0 (ignored in hashing mode)
     :param binary: If True, all non zero counts are set to 1, else to count.
+    :param sparse: If True, return a SparseVectors (CSR matrix, columns) instead of a dataframe
+    :param n_features: If set, hashing mode: words are hashed to n_features columns, without fit (see TokenHasher)
+    :param alternate_sign: hashing mode, if True half of the words count negatively
+    :param top_tokens: hashing mode, number of most frequent words to record
 
     :return: vectorized series as a dataframe, vectorizer
     """
+    if n_features is not None:
+        hasher = TokenHasher(TEXT_TYPE, n_features, alternate_sign, binary=binary, top_tokens=top_tokens)
+        return _hash(hasher, series, sparse=sparse), hasher
+
     vectorizer = CountVectorizer(min_df=min_df, max_df=max_df, binary=binary)
-    dataframe = _vectorize(vectorizer, series)
+    vectorized = _vectorize(vectorizer, series, sparse=sparse)
 
-    return dataframe, vectorizer
+    return vectorized, vectorizer
 
 
-def vectorize_mono_label(series):
+def vectorize_mono_label(series, sparse=False, n_features=None, alternate_sign=True, top_tokens=0):
     """
     Vectorize a mono-label column.
 
     :param series: series to vectorize
+    :param sparse: If True, return a SparseVectors (CSR matrix, columns) instead of a dataframe
+    :param n_features: If set, hashing mode: labels are hashed to n_features columns, without fit (see TokenHasher)
+    :param alternate_sign: hashing mode, if True half of the labels count negatively
+    :param top_tokens: hashing mode, number of most frequent labels to record
     :return: vectorized series as a dataframe, vectorizer
     """
-    vectorizer = LabelBinarizer()
-    dataframe = _vectorize(vectorizer, series)
+    if n_features is not None:
+        hasher = TokenHasher(MONO_LABEL_TYPE, n_features, alternate_sign, top_tokens=top_tokens)
+        return _hash(hasher, series, sparse=sparse), hasher
+
+    vectorizer = LabelBinarizer(sparse_output=sparse)
+    vectorized = _vectorize(vectorizer, series, sparse=sparse)
 
-    return dataframe, vectorizer
+    return vectorized, vectorizer
 
 
-def vectorize_multi_label(series):
+def vectorize_multi_label(series, sparse=False, n_features=None, alternate_sign=True, top_tokens=0):
     """
     Vectorize a multi-label column.
 
     :param series: series to vectorize
+    :param sparse: If True, return a SparseVectors (CSR matrix, columns) instead of a dataframe
+    :param n_features: If set, hashing mode: labels are hashed to n_features columns, without fit (see TokenHasher)
+    :param alternate_sign: hashing mode, if True half of the labels count negatively
+    :param top_tokens: hashing mode, number of most frequent labels to record
     :return: vectorized series as a dataframe, vectorizer
     """
-    vectorizer = MultiLabelBinarizer()
-    dataframe = _vectorize(vectorizer, series)
+    if n_features is not None:
+        hasher = TokenHasher(MULTI_LABEL_TYPE, n_features, alternate_sign, top_tokens=top_tokens)
+        return _hash(hasher, series, sparse=sparse), hasher
+
+    vectorizer = MultiLabelBinarizer(sparse_output=sparse)
+    vectorized = _vectorize(vectorizer, series, sparse=sparse)
 
-    return dataframe, vectorizer
+    return vectorized, vectorizer
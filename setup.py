@@ -19,7 +19,7 @@ setup(
     download_url='https://github.com/dezounet/datadez/archive/0.1.tar.gz',
     install_requires=[
         "numpy>=1.13.3",
-        "pandas>=0.21.0",
+        "pandas>=0.24.0",
         "future",
         "nltk",
         "sklearn",
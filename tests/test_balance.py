@@ -0,0 +1,118 @@
+from __future__ import unicode_literals, print_function
+
+import unittest
+
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from datadez.balance import oversample
+from datadez.balance import stratified_split
+from datadez.balance import undersample
+
+
+class _RecordingRandomState(np.random.RandomState):
+    """
+    Record the rows shuffled by stratified_split: the rows of every visited label, in order.
+    """
+
+    def __init__(self, seed):
+        super(_RecordingRandomState, self).__init__(seed)
+        self.shuffled = []
+
+    def shuffle(self, x):
+        self.shuffled.append(sorted(x.tolist()))
+        return super(_RecordingRandomState, self).shuffle(x)
+
+
+def _occurrences(column):
+    return Counter(label for labels in column for label in labels)
+
+
+class TestBalance(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'mono-label': ['A'] * 8 + ['B'] * 4 + ['C'] * 2 + [np.nan] * 2,
+            'multi-label': [['A']] * 6 + [['A', 'B']] * 2 + [['B']] * 2 + [['C']] * 2 + [['A', 'C']] * 2 + [[]] * 2,
+        })
+
+    def test_undersample_mono_label(self):
+        df = undersample(self.df, 'mono-label', max_imbalance_ratio=1.5, random_state=0)
+
+        occurrences = df['mono-label'].value_counts()
+        self.assertDictEqual(occurrences.to_dict(), {'A': 3, 'B': 3, 'C': 2})
+
+        # Rows without label are kept, in their original order
+        self.assertEqual(df['mono-label'].isnull().sum(), 2)
+        self.assertTrue(df.index.is_monotonic_increasing)
+
+    def test_undersample_multi_label(self):
+        df = undersample(self.df, 'multi-label', random_state=0)
+
+        # C is the rarest label (4), A co-occurs with C twice
+        occurrences = _occurrences(df['multi-label'])
+        self.assertDictEqual(dict(occurrences), {'A': 4, 'B': 4, 'C': 4})
+        self.assertEqual(sum(1 for labels in df['multi-label'] if not labels), 2)
+
+    def test_oversample_mono_label(self):
+        df = oversample(self.df, 'mono-label', max_imbalance_ratio=2., random_state=0)
+
+        occurrences = df['mono-label'].value_counts()
+        self.assertDictEqual(occurrences.to_dict(), {'A': 8, 'B': 4, 'C': 4})
+
+        # Original rows come first, followed by duplicates of C rows
+        self.assertListEqual(df.index[:len(self.df)].tolist(), self.df.index.tolist())
+        self.assertTrue(set(df.index[len(self.df):]) <= {12, 13})
+
+    def test_oversample_multi_label(self):
+        df = oversample(self.df, 'multi-label', max_imbalance_ratio=1.5, random_state=0)
+
+        # A occurs 10 times: other labels are brought to 7 at least,
+        # duplicated rows holding A and a rarer label also make A more frequent
+        occurrences = _occurrences(df['multi-label'])
+        self.assertGreaterEqual(min(occurrences.values()), 7)
+        self.assertGreater(occurrences['A'], 10)
+
+    def test_stratified_split(self):
+        rng = np.random.RandomState(1)
+        labels = np.array(list('ABCDEFGH'))
+        df = pd.DataFrame({
+            'multi-label': [list(labels[rng.rand(len(labels)) < 0.5 / (1 + i % 4)]) for i in range(1000)],
+        })
+
+        train, test = stratified_split(df, 'multi-label', test_size=0.25, random_state=0)
+
+        self.assertEqual(len(test), 250)
+        self.assertEqual(len(train) + len(test), len(df))
+        self.assertEqual(len(train.index.intersection(test.index)), 0)
+
+        occurrences = _occurrences(df['multi-label'])
+        test_occurrences = _occurrences(test['multi-label'])
+        for label, occurrence in occurrences.items():
+            self.assertLessEqual(abs(test_occurrences[label] - 0.25 * occurrence), 3)
+
+    def test_stratified_split_order(self):
+        df = pd.DataFrame({
+            'multi-label': [['r', 'big']] * 9 + [['big']] * 3 + [['mid']] * 10,
+        })
+
+        random_state = _RecordingRandomState(0)
+        stratified_split(df, 'multi-label', test_size=0.5, random_state=random_state)
+
+        # Once the rows of r are assigned, big has 3 rows left: it is rarer than mid
+        self.assertListEqual(random_state.shuffled[:3], [list(range(9)), [9, 10, 11], list(range(12, 22))])
+
+    def test_stratified_split_mono_label(self):
+        train, test = stratified_split(self.df, 'mono-label', test_size=0.5, random_state=0)
+
+        self.assertDictEqual(test['mono-label'].value_counts().to_dict(), {'A': 4, 'B': 2, 'C': 1})
+        self.assertEqual(len(test), 8)
+
+    def test_invalid_ratio(self):
+        with self.assertRaises(ValueError):
+            undersample(self.df, 'mono-label', max_imbalance_ratio=0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
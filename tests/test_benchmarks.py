@@ -0,0 +1,49 @@
+from __future__ import unicode_literals, print_function
+
+import unittest
+
+from benchmarks.data import make_dataset
+from benchmarks.run import compare
+from benchmarks.run import run
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_make_dataset(self):
+        dataset = make_dataset(1000, label_count=50, list_length=3)
+
+        self.assertEqual(len(dataset), 1000)
+        self.assertLessEqual(dataset['mono-label'].nunique(), 50)
+        self.assertTrue(dataset['multi-label'].map(len).mean() > 2)
+
+    def test_run(self):
+        results = run(sizes=['200'], cases=['summarize', 'filter_empty'], profiles=[(10, 2)], repeat=1, verbose=False)
+
+        self.assertListEqual(sorted(results['results']),
+                             ['filter_empty/200/labels=10,length=2', 'summarize/200/labels=10,length=2'])
+        for result in results['results'].values():
+            self.assertEqual(result['rows'], 200)
+            self.assertIn('seconds', result)
+
+    def test_compare(self):
+        baseline = {'results': {
+            'a': {'seconds': 1., 'peak_bytes': 100},
+            'b': {'seconds': 1., 'peak_bytes': 100},
+            'c': {'seconds': 0.001, 'peak_bytes': 100},
+            'd': {'seconds': 1., 'peak_bytes': 100},
+        }}
+        current = {'results': {
+            'a': {'seconds': 1.1, 'peak_bytes': 100},
+            'b': {'seconds': 2., 'peak_bytes': 200},
+            'c': {'seconds': 0.005, 'peak_bytes': 100},
+            'd': {'error': 'ValueError: oops'},
+        }}
+
+        self.assertListEqual(compare(baseline, current, threshold=0.2), [
+            ('b', 'seconds', 1., 2.),
+            ('b', 'peak_bytes', 100, 200),
+            ('d', 'error', None, 'ValueError: oops'),
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+from __future__ import unicode_literals, print_function
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from datadez.columnar import MultiLabelColumn
+from datadez.columns import MULTI_LABEL_TYPE
+from datadez.columns import detect_column_type
+from datadez.columns import get_multi_label_occurrence
+from datadez.filter import filter_small_occurrence
+from datadez.summary import multi_label_summary
+
+
+class TestColumnar(unittest.TestCase):
+    def setUp(self):
+        self.series = pd.Series([['A'], ['A', 'B'], ['B'], [], ['A', 'C', 'D']], name='multi-label')
+        self.column = MultiLabelColumn.from_series(self.series)
+
+    def test_from_series(self):
+        self.assertEqual(len(self.column), 5)
+        self.assertEqual(self.column.offsets.dtype, np.int32)
+        self.assertEqual(self.column.codes.dtype, np.int32)
+        self.assertListEqual(self.column.labels.tolist(), ['A', 'B', 'C', 'D'])
+        self.assertListEqual(self.column.offsets.tolist(), [0, 1, 3, 4, 4, 7])
+        self.assertListEqual(self.column.codes.tolist(), [0, 0, 1, 1, 0, 2, 3])
+
+    def test_to_series(self):
+        self.assertListEqual(self.column.to_series().tolist(), self.series.tolist())
+
+    def test_null_entries_are_empty(self):
+        column = MultiLabelColumn.from_series(pd.Series([['A'], np.nan, ['B']]))
+        self.assertListEqual(column.to_series().tolist(), [['A'], [], ['B']])
+
+    def test_occurrences(self):
+        self.assertListEqual(self.column.occurrences().tolist(), [3, 2, 1, 1])
+        self.assertListEqual(self.column.cardinalities().tolist(), [1, 2, 1, 0, 3])
+
+    def test_filter_labels(self):
+        column = self.column.filter_labels([True, False, True, False])
+        self.assertListEqual(column.labels.tolist(), ['A', 'C'])
+        self.assertListEqual(column.to_series().tolist(), [['A'], ['A'], [], [], ['A', 'C']])
+
+    def test_take(self):
+        column = self.column.take([4, 0, 0, 3])
+
+        self.assertListEqual(column.to_series().tolist(), [['A', 'C', 'D'], ['A'], ['A'], []])
+        self.assertListEqual(column.index.tolist(), [4, 0, 0, 3])
+
+    def test_partition_keys(self):
+        column = MultiLabelColumn.from_series(pd.Series([['A', 'B'], ['B', 'A'], ['A'], [], ['C', 'A']]))
+        other = MultiLabelColumn.from_series(pd.Series([['C', 'A'], ['A', 'B']]))
+
+        keys = column.partition_keys()
+        self.assertEqual(keys[0], keys[1])
+        self.assertEqual(len(set(keys.tolist())), 4)
+
+        # Keys don't depend on the label dictionary of the column
+        self.assertListEqual(other.partition_keys().tolist(), [keys[4], keys[0]])
+
+        ordered_keys = column.partition_keys(ordered=True)
+        self.assertNotEqual(ordered_keys[0], ordered_keys[1])
+        self.assertEqual(len(set(ordered_keys.tolist())), 5)
+
+    def test_partition_summary(self):
+        series = pd.Series([['A', 'B'], ['B', 'A'], ['A'], ['A', 'B']])
+
+        self.assertEqual(multi_label_summary(series)['partitions']['labels'], 2)
+        self.assertEqual(multi_label_summary(series)['partitions']['occurrence_max'], 3)
+        self.assertEqual(multi_label_summary(series, ordered=True)['partitions']['labels'], 3)
+
+    def test_accepted_by_multi_label_functions(self):
+        self.assertEqual(detect_column_type(self.column), MULTI_LABEL_TYPE)
+
+        occurrences, cardinalities = get_multi_label_occurrence(self.column)
+        self.assertDictEqual(occurrences.to_dict(), {'A': 3, 'B': 2, 'C': 1, 'D': 1})
+        self.assertListEqual(list(cardinalities), [1, 2, 1, 0, 3])
+
+        self.assertDictEqual(multi_label_summary(self.column), multi_label_summary(self.series))
+
+        dataset = filter_small_occurrence({'multi-label': self.column}, 'multi-label', 3)
+        self.assertListEqual(dataset['multi-label'].to_series().tolist(), [['A'], ['A'], [], [], ['A']])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+from __future__ import unicode_literals, print_function
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from datadez.columns import NUMERIC_TYPE, MONO_LABEL_TYPE, MULTI_LABEL_TYPE, TEXT_TYPE
+from datadez.columns import detect_column_type
+from datadez.columns import infer_schema
+from datadez.filter import filter_empty
+from datadez.filter import filter_small_occurrence
+from datadez.summarize import summarize
+
+
+class TestColumns(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'numeric': [1, 2, 3, 4, 5],
+            'mono-label': ['A', 'A', 'B', np.nan, 'C'],
+            'multi-label': [['A'], ['A', 'B'], ['B'], [], ['A', 'C', 'D']],
+            'text': ["aa bb", "aa", "bb cc", "cc", ""],
+        })
+
+    def test_detect_column_type(self):
+        self.assertEqual(detect_column_type(self.df['numeric']), NUMERIC_TYPE)
+        self.assertEqual(detect_column_type(self.df['mono-label']), MONO_LABEL_TYPE)
+        self.assertEqual(detect_column_type(self.df['multi-label']), MULTI_LABEL_TYPE)
+        self.assertEqual(detect_column_type(self.df['text']), TEXT_TYPE)
+
+    def test_detect_column_type_from_dtype(self):
+        self.assertEqual(detect_column_type(self.df['mono-label'].astype('category')), MONO_LABEL_TYPE)
+        self.assertEqual(detect_column_type(pd.Series([np.nan, np.nan, 1.])), NUMERIC_TYPE)
+        self.assertIsNone(detect_column_type(pd.Series([np.nan, np.nan])))
+
+    def test_detect_column_type_with_leading_nan(self):
+        column = pd.Series([np.nan] * 100000 + [['A']] * 10, dtype=object)
+        self.assertEqual(detect_column_type(column, sample_size=5), MULTI_LABEL_TYPE)
+
+    def test_detect_column_type_with_multi_word_labels(self):
+        # A few multi-word labels don't make a mono-label column text
+        df = pd.DataFrame({'city': ['paris', 'london', 'berlin'] * 333 + ['new york']})
+        self.assertEqual(detect_column_type(df['city']), MONO_LABEL_TYPE)
+
+        df = filter_small_occurrence(df, 'city', 2)
+        self.assertEqual(df['city'].isnull().sum(), 1)
+
+    def test_infer_schema(self):
+        schema = infer_schema(self.df)
+        self.assertDictEqual(schema, {
+            'numeric': NUMERIC_TYPE,
+            'mono-label': MONO_LABEL_TYPE,
+            'multi-label': MULTI_LABEL_TYPE,
+            'text': TEXT_TYPE,
+        })
+
+        self.assertDictEqual(summarize(self.df, schema=schema), summarize(self.df))
+
+        # Schema takes precedence over detection
+        df = filter_empty(self.df, ['text'], schema={'text': MONO_LABEL_TYPE})
+        self.assertEqual(len(df), len(self.df))
+
+
+if __name__ == "__main__":
+    unittest.main()
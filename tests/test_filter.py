@@ -7,8 +7,20 @@ from collections import defaultdict
 import numpy as np
 import pandas as pd
 
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+from datadez.columns import get_mono_label_occurrence
+from datadez.files import flatten_multi_label
+from datadez.files import read_chunks
 from datadez.filter import filter_small_occurrence
+from datadez.filter import filter_small_occurrence_file
 from datadez.filter import filter_empty
+from datadez.filter import filter_until_stable
+
+from tests import file_path
 
 
 class TestFilter(unittest.TestCase):
@@ -31,6 +43,20 @@ class TestFilter(unittest.TestCase):
         self.assertEqual(occurrences.loc[occurrences.index.isnull()].values, 3)
         self.assertListEqual(df['mono-label'].tolist(), ['A', 'A', np.nan, np.nan, np.nan])
 
+    def test_filter_occurrences_categorical_mono_label(self):
+        self.df['mono-label'] = self.df['mono-label'].astype('category')
+        df = filter_small_occurrence(self.df, 'mono-label', 2)
+
+        self.assertIsInstance(df['mono-label'].dtype, pd.api.types.CategoricalDtype)
+        self.assertListEqual(list(df['mono-label'].cat.categories), ['A', 'B', 'C'])
+        self.assertListEqual(df['mono-label'].tolist(), ['A', 'A', np.nan, np.nan, np.nan])
+        self.assertListEqual(self.df['mono-label'].tolist(), ['A', 'A', 'B', np.nan, 'C'])
+
+        occurrences = get_mono_label_occurrence(df['mono-label'])
+        self.assertListEqual(occurrences.tolist(), [3, 2])
+        self.assertTrue(np.isnan(occurrences.index[0]))
+        self.assertEqual(occurrences.index[1], 'A')
+
     def test_filter_occurrences_multi_label(self):
         df = filter_small_occurrence(self.df, 'multi-label', 3)
 
@@ -47,6 +73,103 @@ class TestFilter(unittest.TestCase):
         self.assertEqual(occurrences['A'], 3)
         self.assertListEqual(df['multi-label'].tolist(), [['A'], ['A'], [], [], ['A']])
 
+    def test_filter_occurrences_does_not_modify_input(self):
+        df = filter_small_occurrence(self.df, ['mono-label', 'multi-label'], {'mono-label': 2, 'multi-label': 3})
+
+        self.assertListEqual(df['mono-label'].tolist(), ['A', 'A', np.nan, np.nan, np.nan])
+        self.assertListEqual(df['multi-label'].tolist(), [['A'], ['A'], [], [], ['A']])
+
+        self.assertListEqual(self.df['mono-label'].tolist(), ['A', 'A', 'B', np.nan, 'C'])
+        self.assertListEqual(self.df['multi-label'].tolist(), [['A'], ['A', 'B'], ['B'], [], ['A', 'C', 'D']])
+
+    def test_filter_occurrences_tuple_column_name(self):
+        # Tuple column names (MultiIndex columns) are a single column, not a list of columns
+        df = self.df.copy()
+        df.columns = pd.MultiIndex.from_tuples([('values', name) for name in self.df.columns])
+
+        df = filter_small_occurrence(df, ('values', 'mono-label'), 2)
+        self.assertListEqual(df[('values', 'mono-label')].tolist(), ['A', 'A', np.nan, np.nan, np.nan])
+
+    def test_filter_occurrences_file(self):
+        flatten_multi_label(self.df, ['multi-label']).to_csv(file_path('filter_input.csv'), index=False)
+        schema = {'numeric': 'numeric', 'mono-label': 'mono-label', 'multi-label': 'multi-label'}
+        min_occurrence = {'mono-label': 2, 'multi-label': 3}
+
+        for n_jobs in (1, 2):
+            occurrences = filter_small_occurrence_file(file_path('filter_input.csv'), file_path('filter_output.csv'),
+                                                       ['mono-label', 'multi-label'], min_occurrence, schema=schema,
+                                                       chunksize=2, n_jobs=n_jobs)
+
+            df = pd.concat(read_chunks(file_path('filter_output.csv'), multi_label_columns=['multi-label']),
+                           ignore_index=True)
+            self.assertListEqual(df['numeric'].tolist(), [1, 2, 3, 4, 5])
+            self.assertListEqual(df['mono-label'].tolist(), ['A', 'A', np.nan, np.nan, np.nan])
+            self.assertListEqual(df['multi-label'].tolist(), [['A'], ['A'], [], [], ['A']])
+
+        self.assertEqual(occurrences['mono-label']['A'], 2)
+        self.assertDictEqual(occurrences['multi-label'].to_dict(), {'A': 3, 'B': 2, 'C': 1, 'D': 1})
+
+    @unittest.skipUnless(pyarrow, "pyarrow is needed to write Parquet files")
+    def test_filter_occurrences_parquet_file(self):
+        flatten_multi_label(self.df, ['multi-label']).to_csv(file_path('filter_input.csv'), index=False)
+        schema = {'numeric': 'numeric', 'mono-label': 'mono-label', 'multi-label': 'multi-label'}
+
+        # Once filtered, the second chunk (rows 2 and 3) has no label left in both columns
+        filter_small_occurrence_file(file_path('filter_input.csv'), file_path('filter_output.parquet'),
+                                     ['mono-label', 'multi-label'], {'mono-label': 2, 'multi-label': 3},
+                                     schema=schema, chunksize=2)
+
+        df = pd.read_parquet(file_path('filter_output.parquet'))
+        self.assertListEqual(df['numeric'].tolist(), [1, 2, 3, 4, 5])
+        self.assertListEqual(df['mono-label'].iloc[:2].tolist(), ['A', 'A'])
+        self.assertListEqual(df['mono-label'].isnull().tolist(), [False, False, True, True, True])
+        self.assertListEqual([list(labels) for labels in df['multi-label']], [['A'], ['A'], [], [], ['A']])
+
+    @unittest.skipUnless(pyarrow, "pyarrow is needed to write Parquet files")
+    def test_filter_occurrences_parquet_file_without_schema(self):
+        # Parquet list cells are read as arrays: multi-label columns are detected without schema
+        self.df.to_parquet(file_path('filter_input.parquet'))
+
+        occurrences = filter_small_occurrence_file(file_path('filter_input.parquet'),
+                                                   file_path('filter_output.parquet'),
+                                                   ['mono-label', 'multi-label'], {'mono-label': 2, 'multi-label': 3},
+                                                   chunksize=2)
+
+        df = pd.read_parquet(file_path('filter_output.parquet'))
+        self.assertListEqual(df['mono-label'].isnull().tolist(), [False, False, True, True, True])
+        self.assertListEqual([list(labels) for labels in df['multi-label']], [['A'], ['A'], [], [], ['A']])
+        self.assertDictEqual(occurrences['multi-label'].to_dict(), {'A': 3, 'B': 2, 'C': 1, 'D': 1})
+
+    def test_filter_until_stable(self):
+        df = pd.DataFrame({
+            'numeric': [1, 2, 3, 4, 5, 6],
+            'mono-label': ['A', 'A', 'B', 'B', 'B', np.nan],
+            'multi-label': [['X'], ['Y'], ['Y'], ['Z'], ['Z'], ['X', 'Y']],
+        })
+        thresholds = {'mono-label': 2, 'multi-label': 2}
+
+        # Running both filters until nothing changes
+        expected = df
+        for _ in range(len(df)):
+            expected = filter_empty(filter_small_occurrence(expected, list(thresholds), thresholds),
+                                    list(thresholds))
+
+        filtered = filter_until_stable(df, thresholds)
+        self.assertListEqual(filtered.index.tolist(), expected.index.tolist())
+        self.assertListEqual(filtered.index.tolist(), [3, 4])
+        self.assertListEqual(filtered['mono-label'].tolist(), ['B', 'B'])
+        self.assertListEqual(filtered['multi-label'].tolist(), [['Z'], ['Z']])
+
+        # Removing rare labels without dropping rows needs no second round
+        filtered = filter_until_stable(df, thresholds, drop_empty=False)
+        self.assertListEqual(filtered.index.tolist(), df.index.tolist())
+        self.assertListEqual(filtered['mono-label'].tolist(), ['A', 'A', 'B', 'B', 'B', np.nan])
+
+        df['mono-label'] = df['mono-label'].astype('category')
+        filtered = filter_until_stable(df, thresholds, drop_empty=['multi-label'])
+        self.assertIsInstance(filtered['mono-label'].dtype, pd.api.types.CategoricalDtype)
+        self.assertListEqual(filtered['multi-label'].tolist(), df['multi-label'].tolist())
+
     def test_filter_empty_mono_label(self):
         df = filter_empty(self.df, ['mono-label'])
 
@@ -61,6 +184,16 @@ class TestFilter(unittest.TestCase):
         self.assertEqual(len(df), 4)
         self.assertListEqual(df['multi-label'].tolist(), [['A'], ['A', 'B'], ['B'], ['A', 'C', 'D']])
 
+    def test_filter_empty_multiple_columns(self):
+        self.df.loc[1, 'mono-label'] = np.nan
+        self.df.loc[4, 'multi-label'] = np.nan
+
+        df = filter_empty(self.df, ['mono-label', 'multi-label'])
+        self.assertListEqual(df.index.tolist(), [0, 2])
+
+        filter_empty(self.df, ['mono-label', 'multi-label'], inplace=True)
+        self.assertListEqual(self.df.index.tolist(), [0, 2])
+
 
 if __name__ == "__main__":
     unittest.main()
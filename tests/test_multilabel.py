@@ -0,0 +1,50 @@
+from __future__ import unicode_literals, print_function
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from datadez.multilabel import multilabel_intersection_matrix
+
+
+class TestMultilabel(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'multi-label': [['A'], ['A', 'B'], ['B', 'B'], [], ['A', 'C', 'D']],
+        })
+
+    def test_intersection_matrix(self):
+        labels, matrix = multilabel_intersection_matrix(self.df, 'multi-label')
+
+        # Labels are sorted by decreasing occurrence
+        self.assertListEqual(labels, ['A', 'B', 'C', 'D'])
+        self.assertListEqual(matrix.tolist(), [[3, 1, 1, 1],
+                                               [1, 5, 0, 0],
+                                               [1, 0, 1, 1],
+                                               [1, 0, 1, 1]])
+
+    def test_sparse_intersection_matrix(self):
+        labels, matrix = multilabel_intersection_matrix(self.df, 'multi-label')
+        sparse_labels, sparse_matrix = multilabel_intersection_matrix(self.df, 'multi-label',
+                                                                      dtype=np.int32, sparse=True)
+
+        self.assertListEqual(sparse_labels, labels)
+        self.assertEqual(sparse_matrix.dtype, np.int32)
+        self.assertTrue(np.array_equal(sparse_matrix.toarray(), matrix))
+
+    def test_top_k_intersection_matrix(self):
+        labels, matrix = multilabel_intersection_matrix(self.df, 'multi-label', top_k=2)
+
+        # C and D are merged into 'other', which counts samples: [A, C, D] holds 'other' once
+        self.assertListEqual(labels, ['A', 'B', 'other'])
+        self.assertListEqual(matrix.tolist(), [[3, 1, 1],
+                                               [1, 5, 0],
+                                               [1, 0, 1]])
+
+        labels, _ = multilabel_intersection_matrix(self.df, 'multi-label', top_k=10)
+        self.assertListEqual(labels, ['A', 'B', 'C', 'D'])
+
+
+if __name__ == "__main__":
+    unittest.main()
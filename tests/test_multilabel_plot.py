@@ -8,6 +8,10 @@ import pandas as pd
 from plotly.offline import plot
 
 from datadez.dataviz import multilabel_plot
+from datadez.dataviz.chord_diagram import chord_diagram
+from datadez.dataviz.chord_diagram import sample_arcs
+
+from datadez.synthetic import make_dataset
 
 from tests import file_path
 from tests.faker import get_random_dataframe
@@ -28,6 +32,48 @@ class TestMultilabelPlot(unittest.TestCase):
         # Uncomment to plot figure
         # plot(figure, filename=file_path('chord-diagram.html'))
 
+    def test_sample_arcs(self):
+        starts = np.array([0., 1., 3., 2.])
+        stops = np.array([1., 3., 1., 2.])
+        counts = np.array([5, 3, 12, 4])
+
+        angles, offsets = sample_arcs(starts, stops, counts)
+
+        self.assertListEqual(offsets.tolist(), [0, 5, 8, 20, 24])
+        for i in range(len(counts)):
+            expected = np.linspace(starts[i], stops[i], counts[i])
+            self.assertListEqual(angles[offsets[i]:offsets[i + 1]].tolist(), expected.tolist())
+
+    def test_chord_diagram(self):
+        matrix = np.array([[9, 2, 0, 1, 0],
+                           [2, 7, 3, 0, 0],
+                           [0, 3, 5, 0, 1],
+                           [1, 0, 0, 4, 0],
+                           [0, 0, 1, 0, 6]])
+        figure = chord_diagram(matrix, ['A', 'B', 'C', 'D', 'E'])
+
+        # One shape per ideogram, and per related pair of labels
+        self.assertEqual(len(figure.layout.shapes), 5 + 5 + 4)
+        # Ideogram lines, one marker per self relation, two per other relation
+        self.assertEqual(len(figure.data), 5 + 5 + 2 * 4)
+
+        for shape in figure.layout.shapes:
+            self.assertTrue(shape.path.startswith('M '))
+
+        # Light ribbons are dropped, arcs are sampled with fewer points
+        figure = chord_diagram(matrix, ['A', 'B', 'C', 'D', 'E'], min_weight=2, max_arc_points=4)
+        self.assertEqual(len(figure.layout.shapes), 5 + 5 + 2)
+        for trace in figure.data[-5:]:
+            self.assertLessEqual(len(trace.x), 4)
+
+    def test_level_of_detail(self):
+        df = make_dataset(2000, {'C': {'type': 'multi-label', 'label_count': 500, 'list_length': 3}}, seed=0)
+        figure = multilabel_plot.intersection_matrix(df, 'C', top_k=10, min_weight=5, max_arc_points=10)
+
+        ideograms = [trace for trace in figure.data if trace.mode == 'lines']
+        self.assertEqual(len(ideograms), 11)
+        self.assertTrue(ideograms[-1].text.startswith('label: other'))
+
 
 if __name__ == "__main__":
     unittest.main()
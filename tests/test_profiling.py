@@ -0,0 +1,113 @@
+from __future__ import unicode_literals, print_function
+
+import json
+import sys
+import unittest
+
+from datadez.filter import filter_empty
+from datadez.filter import filter_small_occurrence
+from datadez.profiling import Profiler
+from datadez.profiling import is_enabled
+from datadez.profiling import stage
+from datadez.profiling import subscribe
+from datadez.profiling import unsubscribe
+from datadez.summarize import summarize
+from datadez.transform import DatasetVectorizer
+from datadez.transform import vectorize_dataset
+
+from tests import file_path
+from tests.faker import get_random_dataframe
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.df = get_random_dataframe(200)
+
+    def test_no_subscriber(self):
+        self.assertFalse(is_enabled())
+
+        with stage('nothing', rows=10) as current_stage:
+            current_stage.set(labels=3)
+
+    def test_subscribe(self):
+        events = []
+        callback = subscribe(events.append)
+        try:
+            with stage('outer', column='B', rows=10) as current_stage:
+                with stage('inner'):
+                    pass
+                current_stage.set(labels=3)
+        finally:
+            unsubscribe(callback)
+
+        self.assertListEqual([event['name'] for event in events], ['inner', 'outer'])
+        self.assertEqual(events[1]['column'], 'B')
+        self.assertDictEqual(events[1]['counts'], {'rows': 10, 'labels': 3})
+        self.assertGreaterEqual(events[1]['duration'], events[0]['duration'])
+        self.assertFalse(is_enabled())
+
+    def test_summarize_stages(self):
+        with Profiler() as profiler:
+            summarize(self.df)
+
+        totals = profiler.totals()
+        self.assertEqual(totals['summarize']['calls'], 1)
+        self.assertEqual(totals['detect_type']['calls'], 4)
+        self.assertEqual(totals['summarize_column']['calls'], 3)
+        self.assertIn('count_occurrences', totals)
+        self.assertIn('count_partitions', totals)
+
+        events = [event for event in profiler.events if event['name'] == 'count_occurrences' and event['column'] == 'B']
+        self.assertEqual(events[0]['counts']['rows'], 200)
+        self.assertEqual(events[0]['counts']['labels'], self.df['B'].nunique())
+
+    def test_vectorize_stages(self):
+        with Profiler() as profiler:
+            vectorize_dataset(self.df)
+            DatasetVectorizer(sparse=True).fit_transform(self.df)
+
+        totals = profiler.totals()
+        self.assertEqual(totals['fit_transform']['calls'], 4)
+        self.assertEqual(totals['fit']['calls'], 4)
+        self.assertEqual(totals['transform']['calls'], 4)
+        self.assertEqual(totals['assembly']['calls'], 2)
+
+    def test_filter_stages(self):
+        with Profiler() as profiler:
+            df = filter_small_occurrence(self.df, ['B', 'C'], 2)
+            filter_empty(df, ['B', 'C'])
+
+        totals = profiler.totals()
+        self.assertEqual(totals['filter_small_occurrence']['calls'], 2)
+        self.assertEqual(totals['filter_empty']['calls'], 1)
+
+        events = [event for event in profiler.events if event['name'] == 'filter_empty']
+        self.assertEqual(events[0]['counts']['rows'], 200)
+        self.assertEqual(events[0]['counts']['removed'], 200 - len(filter_empty(df, ['B', 'C'])))
+
+    @unittest.skipIf(sys.version_info < (3, 9), "tracemalloc.reset_peak needs Python >= 3.9")
+    def test_memory(self):
+        with Profiler(memory=True) as profiler:
+            with stage('allocate'):
+                data = bytearray(10 ** 6)
+                del data
+
+        self.assertGreaterEqual(profiler.events[0]['peak_bytes'], 10 ** 6)
+
+    def test_export(self):
+        with Profiler() as profiler:
+            summarize(self.df)
+
+        profiler.save_json(file_path('profile.json'))
+        with open(file_path('profile.json')) as f:
+            self.assertEqual(len(json.load(f)['events']), len(profiler.events))
+
+        profiler.save_chrome_trace(file_path('profile.trace.json'))
+        with open(file_path('profile.trace.json')) as f:
+            trace_events = json.load(f)['traceEvents']
+        self.assertEqual(len(trace_events), len(profiler.events))
+        self.assertTrue(all(event['ph'] == 'X' and event['dur'] >= 0 for event in trace_events))
+
+
+if __name__ == "__main__":
+    unittest.main()
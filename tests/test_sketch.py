@@ -0,0 +1,65 @@
+from __future__ import unicode_literals, print_function
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from datadez.hashing import hash_labels
+from datadez.sketch import HyperLogLog
+from datadez.sketch import SpaceSaving
+from datadez.summary import mono_label_summary
+from datadez.summary import multi_label_summary
+
+
+class TestSketch(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'mono-label': ['A', 'A', 'B', np.nan, 'C'],
+            'multi-label': [['A'], ['A', 'B'], ['B'], [], ['A', 'C', 'D']],
+        })
+
+    def test_hyperloglog(self):
+        sketch = HyperLogLog(relative_error=0.02)
+        labels = np.arange(100000).astype(str)
+        sketch.update(hash_labels(labels[:60000]))
+        sketch.merge(HyperLogLog(relative_error=0.02).update(hash_labels(labels[40000:])))
+
+        self.assertAlmostEqual(sketch.estimate() / len(labels), 1., delta=4 * sketch.relative_error)
+
+    def test_space_saving(self):
+        sketch = SpaceSaving(capacity=3)
+        sketch.update(['A', 'B', 'C'], [10, 5, 1])
+        sketch.update(['A', 'D'], [10, 2])
+
+        self.assertFalse(sketch.exact)
+        self.assertListEqual(sketch.top(2).index.tolist(), ['A', 'B'])
+        self.assertEqual(sketch.top(1).iloc[0], 20)
+
+        # Counts are overestimated by at most the error bound
+        self.assertLessEqual(sketch.top()['D'] - 2, sketch.error_bound)
+
+    def test_approximate_summaries_of_small_columns_are_exact(self):
+        for summarizer, column in ((mono_label_summary, 'mono-label'), (multi_label_summary, 'multi-label')):
+            summary = summarizer(self.df[column])
+            approximate_summary = summarizer(self.df[column], approximate=True)
+
+            self.assertTrue(approximate_summary.pop('approximation')['exact'])
+            approximate_summary.get('partitions', {}).pop('approximation', None)
+            self.assertDictEqual(approximate_summary, summary)
+
+    def test_approximate_summary(self):
+        column = pd.Series(np.random.RandomState(0).zipf(1.5, 100000).astype(str))
+        summary = mono_label_summary(column)
+        approximate_summary = mono_label_summary(column, approximate=True, occurrence_error=0.01)
+
+        approximation = approximate_summary['approximation']
+        self.assertFalse(approximation['exact'])
+        self.assertAlmostEqual(approximate_summary['labels'] / float(summary['labels']), 1.,
+                               delta=4 * approximation['labels_relative_error'])
+        self.assertLessEqual(approximate_summary['occurrence_max'] - summary['occurrence_max'],
+                             approximation['occurrence_error'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+from __future__ import unicode_literals, print_function
+
+import unittest
+
+import numpy as np
+import pandas as pd
+import scipy.sparse
+
+from datadez.storage import MatrixWriter
+from datadez.storage import load_matrix
+
+from tests import file_path
+
+
+def _is_mapped(array):
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, 'base', None)
+
+    return False
+
+
+class TestStorage(unittest.TestCase):
+    def setUp(self):
+        self.matrix = scipy.sparse.random(50, 6, density=0.3, format='csr', random_state=0)
+        self.columns = pd.MultiIndex.from_tuples([('A', 'value')] + [('B', label) for label in 'abcde'])
+
+    def test_csr_matrix(self):
+        with MatrixWriter(file_path('csr_matrix'), self.columns) as writer:
+            writer.write(self.matrix[:20])
+            writer.write(self.matrix[20:20])
+            writer.write(self.matrix[20:])
+
+        vectors = load_matrix(file_path('csr_matrix'))
+        self.assertListEqual(list(vectors.columns), list(self.columns))
+        self.assertTrue(np.array_equal(vectors.matrix.toarray(), self.matrix.toarray()))
+
+        # Arrays are used as they are mapped, without copy
+        for array in (vectors.matrix.data, vectors.matrix.indices, vectors.matrix.indptr):
+            self.assertTrue(_is_mapped(array))
+
+        in_memory = load_matrix(file_path('csr_matrix'), mmap_mode=None)
+        self.assertTrue(np.array_equal(in_memory.matrix.toarray(), self.matrix.toarray()))
+
+    def test_dense_matrix(self):
+        with MatrixWriter(file_path('dense_matrix'), self.columns, file_format='dense', dtype=np.float32) as writer:
+            writer.write(self.matrix[:20])
+            writer.write(self.matrix[20:].toarray())
+
+        vectors = load_matrix(file_path('dense_matrix'))
+        self.assertIsInstance(vectors.matrix, np.memmap)
+        self.assertEqual(vectors.matrix.dtype, np.float32)
+        self.assertTrue(np.allclose(vectors.matrix, self.matrix.toarray()))
+
+        writer = MatrixWriter(file_path('dense_matrix'), self.columns, file_format='dense')
+        self.assertRaises(ValueError, writer.write, np.zeros((2, 3)))
+        writer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
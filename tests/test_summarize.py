@@ -0,0 +1,121 @@
+from __future__ import unicode_literals, print_function
+
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:  # Python 2
+    import mock
+
+import numpy as np
+import pandas as pd
+
+from datadez.accumulators import LabelCounter
+from datadez.files import flatten_multi_label
+from datadez.summarize import IncrementalSummary
+from datadez.summarize import summarize
+from datadez.summarize import summarize_chunks
+from datadez.summarize import summarize_csv
+
+from tests import file_path
+from tests.faker import get_random_dataframe
+
+
+class TestSummarize(unittest.TestCase):
+    def setUp(self):
+        self.df = get_random_dataframe(100)
+        self.df.loc[[3, 50], 'A'] = np.nan
+        self.df.loc[[7, 60, 61], 'B'] = np.nan
+
+    def assertSummariesAlmostEqual(self, first, second):
+        self.assertSetEqual(set(first.keys()), set(second.keys()))
+        for key in first:
+            if isinstance(first[key], dict):
+                self.assertSummariesAlmostEqual(first[key], second[key])
+            elif isinstance(first[key], float):
+                self.assertAlmostEqual(first[key], second[key])
+            else:
+                self.assertEqual(first[key], second[key])
+
+    def test_parallel_summarize(self):
+        summaries = summarize(self.df)
+
+        self.assertSummariesAlmostEqual(summarize(self.df, n_jobs=2), summaries)
+        self.assertSummariesAlmostEqual(summarize(self.df, n_jobs=2, backend='thread'), summaries)
+
+        # Worker processes not started by fork get packed columns
+        with mock.patch('datadez.summarize.shares_memory', return_value=False):
+            self.assertSummariesAlmostEqual(summarize(self.df, n_jobs=2), summaries)
+
+    def test_summarize_chunks(self):
+        chunks = [self.df.iloc[start:start + 30] for start in range(0, len(self.df), 30)]
+
+        self.assertSummariesAlmostEqual(summarize_chunks(chunks), summarize(self.df))
+
+    def test_incremental_summary(self):
+        incremental_summary = IncrementalSummary()
+        incremental_summary.update(self.df.iloc[:60])
+        incremental_summary.update(self.df.iloc[60:])
+        incremental_summary.retract(self.df.iloc[20:40])
+        incremental_summary.retract(self.df.iloc[80:])
+
+        rows = pd.concat([self.df.iloc[:20], self.df.iloc[40:80]])
+        self.assertSummariesAlmostEqual(incremental_summary.summary(), summarize(rows))
+
+    def test_summarize_chunks_empty_first_chunk(self):
+        df = pd.DataFrame({'m': [None, None, 'a', 'b', 'a', None]})
+        chunks = [df.iloc[:2], df.iloc[2:]]
+
+        summaries = summarize_chunks(chunks)
+        self.assertSummariesAlmostEqual(summaries, summarize(df))
+        self.assertEqual(summaries['m']['occurrence_max'], 3)
+
+    def test_incremental_summary_empty_first_rows(self):
+        # Null entries seen before the column type is known are counted, and can be retracted
+        incremental_summary = IncrementalSummary()
+        incremental_summary.update(self.df.iloc[:2].assign(B=np.nan, C=np.nan))
+        incremental_summary.update(self.df.iloc[2:])
+        incremental_summary.retract(self.df.iloc[:2].assign(B=np.nan, C=np.nan))
+
+        self.assertSummariesAlmostEqual(incremental_summary.summary(), summarize(self.df.iloc[2:]))
+
+        # Null entries retracted before the column type is known
+        incremental_summary = IncrementalSummary()
+        incremental_summary.update(self.df.iloc[:2].assign(B=np.nan))
+        incremental_summary.retract(self.df.iloc[:1].assign(B=np.nan))
+        incremental_summary.update(self.df.iloc[2:])
+
+        rows = pd.concat([self.df.iloc[1:2].assign(B=np.nan), self.df.iloc[2:]])
+        self.assertSummariesAlmostEqual(incremental_summary.summary(), summarize(rows))
+
+    def test_ordered_partitions(self):
+        df = pd.DataFrame({'multi-label': [['A', 'B'], ['B', 'A'], ['A', 'B'], ['C']]})
+
+        self.assertEqual(summarize(df)['multi-label']['partitions']['labels'], 2)
+        self.assertEqual(summarize(df, ordered=True)['multi-label']['partitions']['labels'], 3)
+
+        chunks = [df.iloc[:2], df.iloc[2:]]
+        self.assertSummariesAlmostEqual(summarize_chunks(chunks, ordered=True), summarize(df, ordered=True))
+
+    def test_label_counter_heaps(self):
+        counter = LabelCounter()
+        for _ in range(20000):
+            counter.add(['a', 'b'], [1, 1])
+        counter.add(['a'], [-5])
+
+        self.assertEqual(counter.max, 20000)
+        self.assertEqual(counter.min, 19995)
+
+        # Stale occurrences don't pile up in the heaps
+        self.assertLessEqual(len(counter._max_heap), 2 * len(counter._histogram) + 16)
+        self.assertLessEqual(len(counter._min_heap), 2 * len(counter._histogram) + 16)
+
+    def test_summarize_csv(self):
+        flatten_multi_label(self.df, ['C']).to_csv(file_path('summarize.csv'), index=False)
+
+        summaries = summarize_csv(file_path('summarize.csv'), chunksize=7, multi_label_columns=['C'])
+        self.assertSummariesAlmostEqual(summaries, summarize(self.df))
+
+
+if __name__ == "__main__":
+    unittest.main()
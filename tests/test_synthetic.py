@@ -0,0 +1,92 @@
+from __future__ import unicode_literals, print_function
+
+import glob
+import os
+import shutil
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from datadez.columnar import MultiLabelColumn
+from datadez.columns import infer_schema
+from datadez.summarize import summarize
+from datadez.summarize import summarize_chunks
+from datadez.synthetic import iter_chunks
+from datadez.synthetic import label_probabilities
+from datadez.synthetic import make_dataset
+from datadez.synthetic import write_chunks
+
+from tests import file_path
+
+
+class TestSynthetic(unittest.TestCase):
+    def test_label_probabilities(self):
+        probabilities = label_probabilities(4, 'zipf', exponent=1.)
+        np.testing.assert_allclose(probabilities, np.array([12, 6, 4, 3]) / 25.)
+
+        np.testing.assert_allclose(label_probabilities(4, 'uniform'), [0.25] * 4)
+        self.assertRaises(ValueError, label_probabilities, 4, 'normal')
+
+    def test_make_dataset(self):
+        dataset = make_dataset(2000, seed=0)
+
+        self.assertEqual(len(dataset), 2000)
+        self.assertDictEqual(infer_schema(dataset), {
+            'numeric': 'numeric',
+            'mono-label': 'mono-label',
+            'multi-label': 'multi-label',
+            'text': 'text',
+        })
+
+        # Zipf distributed: first labels are the most frequent ones
+        occurrences = dataset['mono-label'].value_counts()
+        self.assertEqual(occurrences.index[0], 'label_0')
+
+        # Labels of a row are distinct
+        self.assertTrue(dataset['multi-label'].map(lambda labels: len(labels) == len(set(labels))).all())
+
+        pd.testing.assert_frame_equal(dataset, make_dataset(2000, seed=0))
+
+    def test_columns(self):
+        columns = {
+            'tags': {'type': 'multi-label', 'label_count': 10, 'list_length': 4, 'length_distribution': 'geometric',
+                     'max_length': 6, 'null_rate': 0.5},
+            'label': {'type': 'mono-label', 'label_count': 3, 'distribution': 'uniform', 'null_rate': 0.5},
+        }
+        dataset = make_dataset(1000, columns, seed=1)
+
+        self.assertLessEqual(dataset['tags'].map(len).max(), 6)
+        self.assertTrue(0.4 < dataset['label'].isnull().mean() < 0.6)
+        self.assertEqual(dataset['label'].nunique(), 3)
+
+        columnar = make_dataset(1000, columns, seed=1, columnar=True)
+        self.assertIsInstance(columnar['tags'], MultiLabelColumn)
+        self.assertListEqual(columnar['tags'].to_series().tolist(), dataset['tags'].tolist())
+
+    def test_iter_chunks(self):
+        chunks = list(iter_chunks(25, 10, seed=2))
+
+        self.assertListEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        self.assertListEqual(pd.concat(chunks).index.tolist(), list(range(25)))
+        self.assertEqual(summarize_chunks(chunks)['mono-label']['labels'],
+                         summarize(pd.concat(chunks))['mono-label']['labels'])
+
+    def test_write_chunks(self):
+        directory = file_path('synthetic')
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+
+        paths = write_chunks(directory, 25, 10, seed=3)
+        self.assertListEqual(paths, sorted(glob.glob(os.path.join(directory, '*.csv'))))
+
+        converters = {'multi-label': lambda cell: cell.split('|') if cell else []}
+        dataset = pd.concat([pd.read_csv(path, converters=converters) for path in paths], ignore_index=True)
+        expected = pd.concat(iter_chunks(25, 10, seed=3))
+
+        self.assertListEqual(dataset['multi-label'].tolist(), expected['multi-label'].tolist())
+        self.assertListEqual(dataset['text'].tolist(), expected['text'].tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
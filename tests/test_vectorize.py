@@ -2,9 +2,38 @@ from __future__ import unicode_literals, print_function
 
 import unittest
 
+try:
+    from unittest import mock
+except ImportError:  # Python 2
+    import mock
+
+import nltk
+import numpy as np
 import pandas as pd
+import scipy.sparse
+
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer
 
+from datadez.transform import DatasetVectorizer
+from datadez.transform import _hstack_csr
+from datadez.transform import tokenize
+from datadez.transform import tokenize_column
 from datadez.transform import vectorize_dataset
+from datadez.transform import vectorize_to_disk
+from datadez.vectorize import TokenHasher
+
+from tests import file_path
+
+
+def _has_nltk_tokenizer():
+    try:
+        nltk.word_tokenize("a")
+    except LookupError:
+        return False
+
+    return True
 
 
 class TestVectorize(unittest.TestCase):
@@ -43,6 +72,220 @@ class TestVectorize(unittest.TestCase):
         self.assertListEqual(df['text']['bb'].tolist(), [1, 0, 1, 0, 0])
         self.assertListEqual(df['text']['cc'].tolist(), [0, 0, 1, 1, 0])
 
+    def test_sparse_vectorization(self):
+        self.df['numeric'] = [1., 2., 3., 4., 5.]
+
+        dense_df, _ = vectorize_dataset(self.df)
+        sparse_vectors, vectorizers = vectorize_dataset(self.df, sparse=True)
+
+        self.assertEqual(sparse_vectors.matrix.format, 'csr')
+        self.assertListEqual(list(sparse_vectors.columns), list(dense_df.columns))
+        self.assertTrue(np.array_equal(sparse_vectors.matrix.toarray(), dense_df.values))
+        self.assertIsNone(vectorizers['numeric'])
+
+        # Dense output is a single array, of the common dtype of the vectorized columns
+        self.assertTrue((dense_df.dtypes == np.float64).all())
+
+    def test_binary_mono_label_vectorization(self):
+        # A LabelBinarizer gives two classes a single column: both get one
+        self.df['mono-label'] = ['A', 'B', 'A', 'B', 'B']
+
+        dense_df, _ = vectorize_dataset(self.df)
+        sparse_vectors, _ = vectorize_dataset(self.df, sparse=True)
+
+        self.assertListEqual(dense_df['mono-label']['A'].tolist(), [1, 0, 1, 0, 0])
+        self.assertListEqual(dense_df['mono-label']['B'].tolist(), [0, 1, 0, 1, 1])
+        self.assertEqual(sparse_vectors.matrix.shape[1], len(sparse_vectors.columns))
+        self.assertTrue(np.array_equal(sparse_vectors.matrix.toarray(), dense_df.values))
+
+    def test_hstack_csr(self):
+        rng = np.random.RandomState(0)
+        matrices = [scipy.sparse.random(20, width, density=0.3, format='csr', random_state=rng)
+                    for width in (3, 1, 0, 7)]
+        matrices[1] = matrices[1].astype(np.int64)
+        expected = scipy.sparse.hstack(matrices, format='csr')
+
+        matrix = _hstack_csr(list(matrices), 20)
+        self.assertEqual(matrix.shape, expected.shape)
+        self.assertEqual(matrix.dtype, expected.dtype)
+        self.assertTrue(np.array_equal(matrix.toarray(), expected.toarray()))
+
+    def test_parallel_vectorization(self):
+        self.df['numeric'] = [1., 2., 3., 4., 5.]
+        self.df.index = [10, 20, 30, 40, 50]
+
+        df, _ = vectorize_dataset(self.df)
+        parallel_df, _ = vectorize_dataset(self.df, n_jobs=2)
+
+        self.assertListEqual(df['numeric']['value'].tolist(), [1., 2., 3., 4., 5.])
+        self.assertListEqual(list(df.index), list(self.df.index))
+        pd.testing.assert_frame_equal(parallel_df, df)
+
+        # Worker processes not started by fork get packed columns
+        with mock.patch('datadez.transform.shares_memory', return_value=False):
+            parallel_df, _ = vectorize_dataset(self.df, n_jobs=2)
+        pd.testing.assert_frame_equal(parallel_df, df)
+
+    def test_hashing_vectorization(self):
+        self.df['numeric'] = [1., 2., 3., 4., 5.]
+
+        vectors, hashers = vectorize_dataset(self.df, sparse=True, n_features=32, top_tokens=10)
+        self.assertEqual(vectors.matrix.shape, (5, 3 * 32 + 1))
+        self.assertListEqual(vectors.columns[:2].tolist(), [('text', 0), ('text', 1)])
+
+        # Same hashes as scikit-learn hashers
+        text = HashingVectorizer(n_features=32, norm=None).transform(self.df['text'])
+        self.assertTrue(np.array_equal(vectors.matrix[:, :32].toarray(), text.toarray()))
+        labels = FeatureHasher(n_features=32, input_type='string').transform(self.df['multi-label'])
+        self.assertTrue(np.array_equal(vectors.matrix[:, 64:96].toarray(), labels.toarray()))
+
+        # Chunks vectorized separately stack up to the whole dataset
+        head, _ = vectorize_dataset(self.df.iloc[:2], sparse=True, n_features=32, n_jobs=2)
+        tail, _ = vectorize_dataset(self.df.iloc[2:], sparse=True, n_features=32)
+        stacked = scipy.sparse.vstack([head.matrix, tail.matrix])
+        self.assertTrue(np.array_equal(stacked.toarray(), vectors.matrix.toarray()))
+
+        # Recorded tokens tell which tokens a column stands for
+        feature_tokens = hashers['mono-label'].feature_tokens()
+        self.assertListEqual(sorted(feature_tokens.sum()), ['A', 'B', 'C'])
+        for feature, tokens in feature_tokens.items():
+            rows = np.flatnonzero(self.df['mono-label'].isin(tokens))
+            self.assertTrue(np.all(vectors.matrix[rows, 32 + feature].toarray() != 0))
+
+        hasher = TokenHasher(n_features=32, top_tokens=10)
+        hasher.transform(self.df['text'].iloc[:2])
+        other_hasher = TokenHasher(n_features=32, top_tokens=10)
+        other_hasher.transform(self.df['text'].iloc[2:])
+        self.assertDictEqual(hasher.merge(other_hasher).token_counts.top().to_dict(),
+                             hashers['text'].token_counts.top().to_dict())
+
+        df, _ = vectorize_dataset(self.df, n_features=8, alternate_sign=False)
+        self.assertListEqual(list(df['text'].columns), list(range(8)))
+        self.assertTrue((df.drop(columns='numeric').values >= 0).all())
+
+    def test_tokenize(self):
+        df = pd.DataFrame({'text': ["Hello, world!", "a b", np.nan, "Hello, world!"]}, index=[3, 4, 5, 6])
+        tokens = [['Hello', ',', 'world', '!'], ['a', 'b'], [], ['Hello', ',', 'world', '!']]
+
+        df = tokenize(df, 'text', tokenizer='regex')
+        self.assertListEqual(df['text'].tolist(), tokens)
+        self.assertListEqual(df['text'].index.tolist(), [3, 4, 5, 6])
+
+        # Rows sharing a text don't share their list
+        self.assertIsNot(df['text'][3], df['text'][6])
+
+        column = tokenize_column(pd.Series(["Hello, world!", "a b", np.nan, "Hello, world!"]), tokenizer='regex',
+                                 n_jobs=2, chunksize=1)
+        self.assertListEqual(column.to_series().tolist(), tokens)
+        self.assertListEqual(sorted(column.labels.tolist()), ['!', ',', 'Hello', 'a', 'b', 'world'])
+
+        column = tokenize_column(pd.Series(["a-b c"]), tokenizer=str.split)
+        self.assertListEqual(column.to_series().tolist(), [['a-b', 'c']])
+
+    @unittest.skipUnless(_has_nltk_tokenizer(), "NLTK punkt_tab data is needed to tokenize with NLTK")
+    def test_tokenize_nltk(self):
+        df = pd.DataFrame({'text': ["I don't know.", np.nan]})
+
+        # NLTK is the default tokenizer
+        self.assertListEqual(tokenize(df.copy(), 'text')['text'].tolist(), [['I', 'do', "n't", 'know', '.'], []])
+        self.assertListEqual(tokenize(df.copy(), 'text', tokenizer='regex')['text'].tolist(),
+                             [['I', 'don', "'", 't', 'know', '.'], []])
+
+    def test_dataset_vectorizer(self):
+        self.df['numeric'] = [1., 2., 3., 4., 5.]
+
+        df, _ = vectorize_dataset(self.df)
+        vectorizer = DatasetVectorizer()
+        vectorized_df = vectorizer.fit_transform(self.df)
+
+        self.assertListEqual(list(vectorized_df.columns), list(df.columns))
+        self.assertTrue(np.array_equal(vectorized_df.values, df.values))
+
+    def test_dataset_vectorizer_unknown_labels(self):
+        vectorizer = DatasetVectorizer(sparse=True).fit(self.df)
+
+        batch = pd.DataFrame({
+            'text': ["aa dd"],
+            'mono-label': ['Z'],
+            'multi-label': [['A', 'Z']],
+        })
+        vectors = vectorizer.transform(batch)
+
+        self.assertListEqual(list(vectors.columns), list(vectorizer.output_columns))
+        self.assertListEqual(vectors.columns[vectors.matrix.indices].tolist(), [('text', 'aa'), ('multi-label', 'A')])
+
+        vectorizer = DatasetVectorizer(handle_unknown='error').fit(self.df)
+        self.assertRaises(ValueError, vectorizer.transform, batch)
+
+    def test_dataset_vectorizer_partial_fit(self):
+        self.df['numeric'] = [1., 2., 3., 4., 5.]
+        self.df['text'] = ["aa bb", "AA", "bb CC aa", "cc", ""]
+
+        vectorizer = DatasetVectorizer(min_df=2, max_df=0.5).fit(self.df)
+        chunked_vectorizer = DatasetVectorizer(min_df=2, max_df=0.5)
+        self.assertFalse(chunked_vectorizer.is_fitted)
+        for start in range(0, len(self.df), 2):
+            chunked_vectorizer.partial_fit(self.df.iloc[start:start + 2])
+        self.assertTrue(chunked_vectorizer.is_fitted)
+
+        self.assertListEqual(list(chunked_vectorizer.output_columns), list(vectorizer.output_columns))
+
+        # Words are counted as transform splits them (lowercased)
+        self.assertListEqual(chunked_vectorizer.transform(self.df)['text'].sum().tolist(), [2, 2])
+
+        # Same vocabulary as a CountVectorizer fit on the whole column
+        text_vectorizer = CountVectorizer(min_df=2, max_df=0.5).fit(self.df['text'])
+        self.assertListEqual(chunked_vectorizer.vocabularies_['text'], sorted(text_vectorizer.vocabulary_))
+        self.assertListEqual(chunked_vectorizer.vocabularies_['text'], ['bb', 'cc'])
+
+    def test_vectorize_to_disk(self):
+        self.df['numeric'] = [1., 2., 3., 4., 5.]
+        chunks = [self.df.iloc[:2], self.df.iloc[2:]]
+
+        vectors, vectorizer = vectorize_to_disk(chunks, file_path('vectorized'))
+        expected = DatasetVectorizer(sparse=True).fit_transform(self.df)
+        self.assertListEqual(list(vectors.columns), list(expected.columns))
+        self.assertTrue(np.array_equal(vectors.matrix.toarray(), expected.matrix.toarray()))
+
+        # A fitted vectorizer reads chunks once
+        vectors, _ = vectorize_to_disk(iter(chunks), file_path('vectorized'), vectorizer=vectorizer,
+                                       file_format='dense')
+        self.assertTrue(np.array_equal(vectors.matrix, expected.matrix.toarray()))
+        self.assertRaises(ValueError, vectorize_to_disk, iter(chunks), file_path('vectorized'))
+
+        vectors, hashers = vectorize_to_disk(iter(chunks), file_path('vectorized'), n_features=16, top_tokens=10)
+        expected, _ = vectorize_dataset(self.df, sparse=True, n_features=16)
+        self.assertTrue(np.array_equal(vectors.matrix.toarray(), expected.matrix.toarray()))
+        self.assertEqual(hashers['multi-label'].token_counts.top()['A'], 3)
+
+    def test_dataset_vectorizer_save_load(self):
+        self.df['mono-label'] = ['A', 'A', 'B' * 1000, 'C', 'C']
+
+        vectorizer = DatasetVectorizer().fit(self.df)
+        vectorizer.save(file_path('dataset_vectorizer'))
+        loaded_vectorizer = DatasetVectorizer.load(file_path('dataset_vectorizer'))
+
+        self.assertDictEqual(loaded_vectorizer.vocabularies_, vectorizer.vocabularies_)
+        pd.testing.assert_frame_equal(loaded_vectorizer.transform(self.df), vectorizer.transform(self.df))
+
+    def test_dataset_vectorizer_save_load_tuple_columns(self):
+        self.df.columns = pd.MultiIndex.from_tuples([('values', name) for name in self.df.columns])
+
+        vectorizer = DatasetVectorizer().fit(self.df)
+        vectorizer.save(file_path('dataset_vectorizer'))
+        loaded_vectorizer = DatasetVectorizer.load(file_path('dataset_vectorizer'))
+
+        self.assertListEqual(loaded_vectorizer.columns_, vectorizer.columns_)
+        pd.testing.assert_frame_equal(loaded_vectorizer.transform(self.df), vectorizer.transform(self.df))
+
+    def test_dataset_vectorizer_binary_mono_label(self):
+        # One indicator column per label, even with two labels
+        df = pd.DataFrame({'mono-label': ['A', 'B', 'A', np.nan]})
+        vectorized_df = DatasetVectorizer().fit_transform(df)
+
+        self.assertListEqual(list(vectorized_df.columns), [('mono-label', 'A'), ('mono-label', 'B')])
+        self.assertListEqual(vectorized_df.values.tolist(), [[1, 0], [0, 1], [1, 0], [0, 0]])
+
 
 if __name__ == "__main__":
     unittest.main()